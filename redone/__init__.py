@@ -6,28 +6,221 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
+from . import ahocorasick
+from . import bitparallel
+from . import cache
+from . import constants
 from . import conv
+from . import dfa
+from . import lazy
+from . import nfa
 from . import parser
+from . import prefilter
+from . import program
 from . import regex
+from . import regexset
+from . import simplify
+from . import syntax
+
+from .constants import ENGINE_AUTO, ENGINE_NFA, ENGINE_DFA, ENGINE_LAZY, ENGINE_BITPARALLEL, ENGINE_LITERAL
+from .regexset import RegexSet
+
+__all__ = ["compile", "parse", "match", "fullmatch", "search", "purge", "cache_info", "set_cache_size",
+           "RegexSet", "ENGINE_AUTO", "ENGINE_NFA", "ENGINE_DFA", "ENGINE_LAZY", "ENGINE_BITPARALLEL",
+           "ENGINE_LITERAL"]
+
+# Largest reverse DFA which is determinised when compiling a pattern.
+REVERSE_MAX_STATES = 4096
+
+# Limits used by ENGINE_AUTO to pick an engine. NFAs of at most
+# AUTO_DFA_MAX_NFA_STATES states are determinised (as long as their DFA has at
+# most AUTO_DFA_MAX_STATES states), patterns of at most
+# AUTO_BITPARALLEL_MAX_POSITIONS positions are simulated bit-parallel and NFAs of
+# at most AUTO_LAZY_MAX_NFA_STATES states are determinised lazily. Anything
+# larger is simulated as an NFA.
+AUTO_DFA_MAX_NFA_STATES = 256
+AUTO_DFA_MAX_STATES = 2048
+AUTO_BITPARALLEL_MAX_POSITIONS = 256
+AUTO_LAZY_MAX_NFA_STATES = 8192
+
+# Process-wide cache of compiled patterns, shared by compile and the on-the-fly
+# functions so that hot patterns are only ever parsed once.
+_cache = cache.LRUCache()
+
+def _automata(engine, tree, graph, nodes, reverse, binary, max_states=None):
+	"""
+	Builds the automata used by the given engine from the given simplified tree,
+	NFA graph (whose nodes are given) and reverse NFA graph, returning the
+	(graph, reverse) tuple. If the DFA of the pattern would have more than
+	max_states states, a DFAStateLimitException is raised. Reverse graphs which
+	aren't determinised up-front are returned as they are, and are only
+	determinised (lazily) once the pattern is searched.
+	"""
+
+	if engine == ENGINE_DFA:
+		classes = nfa._classes(graph, nodes)
+		graph = conv.nfa2table(graph, classes=classes, max_states=max_states)
+
+		# Reversing can make the DFA blow up, so only determinise the reverse
+		# automaton up-front if it is reasonably small.
+		try:
+			reverse = conv.nfa2table(reverse, classes=classes, max_states=REVERSE_MAX_STATES)
+		except dfa.DFAStateLimitException:
+			pass
+
+		return graph, reverse
+
+	if engine == ENGINE_LAZY:
+		return lazy.LazyDFA(program.Program(graph, nodes=nodes)), reverse
+
+	# The bit-parallel automaton is built from the tree, not the graph.
+	if engine == ENGINE_BITPARALLEL:
+		return bitparallel.BitParallel(tree, binary=binary), reverse
+
+	return program.Program(graph, nodes=nodes), reverse
+
+def _matcher(engine, tree, graph, nodes, binary, max_states=None):
+	"""
+	Builds the RegexMatcher of the given simplified tree and its NFA graph (whose
+	nodes are given), which uses the given engine. If the DFA of the pattern would
+	have more than max_states states, a DFAStateLimitException is raised.
+	"""
+
+	reverse = nfa._reverse(graph, nodes)
+	automaton, reverse = _automata(engine, tree, graph, nodes, reverse, binary, max_states=max_states)
+
+	# The reverse automaton is used to find where matches start when searching,
+	# the prefilter to skip the parts of the string where none can start and the
+	# required literals to reject strings which cannot match at all.
+	skip = prefilter.prefilter(graph)
+	required = prefilter.required_literals(graph)
+
+	return regex.RegexMatcher(automaton, reverse=reverse, prefilter=skip, required=required, binary=binary, engine=engine)
+
+def _literals(words, binary):
+	"""
+	Builds the RegexMatcher of a union of the given literal words, which matches and
+	searches for them with an Aho-Corasick automaton (or, for a single literal,
+	with the string's own methods) rather than any NFA or DFA.
+	"""
+
+	if len(words) == 1:
+		literals = ahocorasick.SingleLiteral(*words)
+	else:
+		literals = ahocorasick.AhoCorasick(words)
+
+	return regex.RegexMatcher(literals, required=prefilter.common_literals(words), binary=binary, engine=ENGINE_LITERAL)
+
+def _select(tree, binary):
+	"""
+	Picks the engine for the given (unsimplified) syntax tree (see ENGINE_AUTO),
+	returning the RegexMatcher which uses it. Unions of literals (found in the tree,
+	so they are never built into an NFA at all) are matched by a literal automaton.
+	Small automata are fully determinised, unless their DFA turns out to be too
+	large. Otherwise patterns with few enough positions are simulated
+	bit-parallel, larger ones use a lazy DFA and NFAs whose sets of states are too
+	large to cache are simulated directly.
+	"""
+
+	words = prefilter.union_words(tree, binary)
+
+	if words:
+		return _literals(words, binary)
 
-__all__ = ["compile", "match", "fullmatch", "search"]
+	tree = simplify.simplify(tree)
+	graph = parser._build(tree, binary)
+	nodes = graph._get_nodes()
+	states = len(nodes)
 
-def _compile(pattern, _convert=False):
-	graph = parser._parse(pattern)
+	if states <= AUTO_DFA_MAX_NFA_STATES:
+		try:
+			return _matcher(ENGINE_DFA, tree, graph, nodes, binary, max_states=AUTO_DFA_MAX_STATES)
+		except dfa.DFAStateLimitException:
+			pass
 
-	if _convert:
-		graph = conv.nfa2dfa(graph)
+	if bitparallel.count_positions(tree) <= AUTO_BITPARALLEL_MAX_POSITIONS:
+		engine = ENGINE_BITPARALLEL
+	elif states <= AUTO_LAZY_MAX_NFA_STATES:
+		engine = ENGINE_LAZY
+	else:
+		engine = ENGINE_NFA
+
+	return _matcher(engine, tree, graph, nodes, binary)
+
+def _compile(pattern, engine=ENGINE_AUTO):
+	if engine not in constants.ENGINES:
+		raise ValueError("Unknown matching engine: %r." % (engine,))
+
+	# Byte patterns match bytes-like strings. Mutable byte patterns are copied, so
+	# they can be cached. Syntax trees are always text patterns.
+	binary = parser._binary(pattern)
+	if binary:
+		pattern = bytes(pattern)
+
+	key = (type(pattern), pattern, engine)
+	reo = _cache.get(key)
+
+	if reo is not None:
+		return reo
+
+	tree = pattern
+	if not isinstance(tree, syntax.Node):
+		tree = parser.parse(pattern)
+
+	if engine == ENGINE_AUTO:
+		reo = _select(tree, binary)
+	else:
+		tree = simplify.simplify(tree)
+		graph = parser._build(tree, binary)
+		reo = _matcher(engine, tree, graph, graph._get_nodes(), binary)
+
+	_cache.put(key, reo)
+	return reo
+
+def purge():
+	"""
+	Clears the cache of compiled patterns.
+	"""
+
+	_cache.purge()
+
+def cache_info():
+	"""
+	Returns a CacheInfo(hits, misses, maxsize, currsize) describing the usage of
+	the cache of compiled patterns.
+	"""
+
+	return _cache.info()
+
+def set_cache_size(maxsize):
+	"""
+	Sets the maximum number of compiled patterns kept in the cache. The least
+	recently used patterns are evicted first, and a size of 0 disables caching.
+	"""
+
+	_cache.resize(maxsize)
+
+def parse(pattern):
+	"""
+	Parses the given regular expression into its syntax tree (see redone.syntax),
+	which can be given to compile and friends in place of the pattern.
+	"""
 
-	return regex.RegexMatcher(graph)
+	return parser.parse(pattern)
 
-def compile(pattern):
+def compile(pattern, engine=ENGINE_AUTO):
 	"""
 	Compile the given regular expression into a RegexMatcher which can be used to
 	run regex operations on any given string without needing to recompile the
-	expression.
+	expression. By default the engine is picked for the pattern (the engine of
+	the RegexMatcher says which one was), but any of ENGINE_DFA (which fully
+	determinises the pattern), ENGINE_LAZY (which only determinises the states
+	used while matching), ENGINE_BITPARALLEL (which simulates the NFA of the
+	pattern's positions with bitwise operations) or ENGINE_NFA can be used.
+	Patterns which are just unions of literals always use ENGINE_LITERAL.
 	"""
 
-	return _compile(pattern, _convert=True)
+	return _compile(pattern, engine=engine)
 
 def match(pattern, string):
 	"""
@@ -38,8 +231,9 @@ def match(pattern, string):
 	if isinstance(pattern, regex.RegexMatcher):
 		return pattern.match(string)
 
-	# Avoid overhead of converting the NFA (one-time use only).
-	reo = _compile(pattern, _convert=False)
+	# Avoid the overhead of determinising one-off patterns up-front (hot patterns
+	# are still cached, and warm up their lazy DFA as they are used).
+	reo = _compile(pattern, engine=ENGINE_LAZY)
 
 	# Forward to RegexMatcher.
 	return reo.match(string)
@@ -53,8 +247,9 @@ def fullmatch(pattern, string):
 	if isinstance(pattern, regex.RegexMatcher):
 		return pattern.fullmatch(string)
 
-	# Avoid overhead of converting the NFA (one-time use only).
-	reo = _compile(pattern, _convert=False)
+	# Avoid the overhead of determinising one-off patterns up-front (hot patterns
+	# are still cached, and warm up their lazy DFA as they are used).
+	reo = _compile(pattern, engine=ENGINE_LAZY)
 
 	# Forward to RegexMatcher.
 	return reo.fullmatch(string)
@@ -68,8 +263,9 @@ def search(pattern, string):
 	if isinstance(pattern, regex.RegexMatcher):
 		return pattern.search(string)
 
-	# Avoid overhead of converting the NFA (one-time use only).
-	reo = _compile(pattern, _convert=False)
+	# Avoid the overhead of determinising one-off patterns up-front (hot patterns
+	# are still cached, and warm up their lazy DFA as they are used).
+	reo = _compile(pattern, engine=ENGINE_LAZY)
 
 	# Forward to RegexMatcher.
 	return reo.search(string)
@@ -83,8 +279,9 @@ def finditer(pattern, string):
 	if isinstance(pattern, regex.RegexMatcher):
 		return pattern.finditer(string)
 
-	# Avoid overhead of converting the NFA (one-time use only).
-	reo = _compile(pattern, _convert=False)
+	# Avoid the overhead of determinising one-off patterns up-front (hot patterns
+	# are still cached, and warm up their lazy DFA as they are used).
+	reo = _compile(pattern, engine=ENGINE_LAZY)
 
 	# Forward to RegexMatcher.
 	return reo.finditer(string)
@@ -98,8 +295,9 @@ def findall(pattern, string):
 	if isinstance(pattern, regex.RegexMatcher):
 		return pattern.finditer(string)
 
-	# Avoid overhead of converting the NFA (one-time use only).
-	reo = _compile(pattern, _convert=False)
+	# Avoid the overhead of determinising one-off patterns up-front (hot patterns
+	# are still cached, and warm up their lazy DFA as they are used).
+	reo = _compile(pattern, engine=ENGINE_LAZY)
 
 	# Forward to RegexMatcher.
 	return reo.findall(string)
@@ -113,8 +311,9 @@ def sub(pattern, replace, string):
 	if isinstance(pattern, regex.RegexMatcher):
 		return pattern.sub(replace, string)
 
-	# Avoid overhead of converting the NFA (one-time use only).
-	reo = _compile(pattern, _convert=False)
+	# Avoid the overhead of determinising one-off patterns up-front (hot patterns
+	# are still cached, and warm up their lazy DFA as they are used).
+	reo = _compile(pattern, engine=ENGINE_LAZY)
 
 	# Forward to RegexMatcher.
 	return reo.sub(replace, string)
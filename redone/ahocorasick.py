@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# redone: A correct regex implementation in Python
+# Copyright (C) 2014 Aleksa Sarai
+
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import collections
+
+from . import fsa
+
+ROOT_STATE = 0
+
+
+class AhoCorasick(fsa.FSA):
+	"""
+	Represents an Aho-Corasick automaton, which finds occurrences of any of a set
+	of literal strings in a single pass over a string. As an automaton it accepts
+	precisely the given literals, so a pattern which is just a union of literals
+	can be matched and searched for without building an NFA or DFA at all.
+	"""
+
+	def __init__(self, literals):
+		literals = sorted(set(literals))
+
+		if not literals or not all(literals):
+			raise ValueError("Aho-Corasick automata need a non-empty set of non-empty literals.")
+
+		self._literals = literals
+		self._maxlen = max(len(literal) for literal in literals)
+
+		# Trie of the literals, where words[state] is the length of the literal
+		# ending at state (or 0 if there is no such literal).
+		self._goto = [{}]
+		self._words = [0]
+
+		for literal in literals:
+			state = ROOT_STATE
+
+			for token in literal:
+				next_state = self._goto[state].get(token)
+
+				if next_state is None:
+					next_state = self._goto[state][token] = len(self._goto)
+					self._goto.append({})
+					self._words.append(0)
+
+				state = next_state
+
+			self._words[state] = len(literal)
+
+		self._build_links()
+
+	def __repr__(self):
+		return "<AhoCorasick(literals=%d, states=%d) at 0x%x>" % (len(self._literals), len(self._goto), id(self))
+
+	def _build_links(self):
+		# The failure link of each state is the state of its longest proper suffix in
+		# the trie, and longest[state] is the length of the longest literal which is
+		# a suffix of the state (or 0 if there is no such literal).
+		self._fail = [ROOT_STATE] * len(self._goto)
+		self._longest = list(self._words)
+
+		todo = collections.deque(self._goto[ROOT_STATE].values())
+
+		while todo:
+			state = todo.popleft()
+
+			for token, next_state in self._goto[state].items():
+				fail = self._fail[state]
+
+				while fail != ROOT_STATE and token not in self._goto[fail]:
+					fail = self._fail[fail]
+
+				fail = self._goto[fail].get(token, ROOT_STATE)
+				self._fail[next_state] = fail
+
+				if not self._longest[next_state]:
+					self._longest[next_state] = self._longest[fail]
+
+				todo.append(next_state)
+
+	def accepts(self, string, pos=0):
+		"""
+		Returns the right-most index of the given string such that string[pos:index]
+		is one of the literals. If no such index exists, accepts returns -1.
+		"""
+
+		goto = self._goto
+		words = self._words
+
+		state = ROOT_STATE
+		end = -1
+
+		for index in range(pos, min(len(string), pos + self._maxlen)):
+			state = goto[state].get(string[index])
+
+			if state is None:
+				break
+
+			if words[state]:
+				end = index + 1
+
+		return end
+
+	def search(self, string, pos=0):
+		"""
+		Returns the (start, end) indices of the left-most longest occurrence of any
+		of the literals in the given string starting at or after index pos, or None
+		if there is no such occurrence.
+		"""
+
+		goto = self._goto
+		fail = self._fail
+		longest = self._longest
+
+		state = ROOT_STATE
+		found = None
+
+		for index in range(pos, len(string)):
+			token = string[index]
+
+			while state != ROOT_STATE and token not in goto[state]:
+				state = fail[state]
+
+			state = goto[state].get(token, ROOT_STATE)
+			size = longest[state]
+
+			# The longest literal ending here starts further left than any other.
+			if size:
+				start = index + 1 - size
+
+				if found is None or start <= found[0]:
+					found = (start, index + 1)
+
+			# Nothing which starts at (or before) the match can end this far right.
+			if found is not None and index + 1 >= found[0] + self._maxlen:
+				break
+
+		return found
+
+	def finditer(self, string, pos=0):
+		"""
+		Yields the (start, end) indices of every non-overlapping left-most longest
+		occurrence of any of the literals in the given string, starting at index pos.
+		"""
+
+		while pos < len(string):
+			found = self.search(string, pos)
+
+			if found is None:
+				break
+
+			yield found
+			_, pos = found
+
+
+class SingleLiteral(AhoCorasick):
+	"""
+	Aho-Corasick automaton of a single literal, which is matched and searched for
+	with the string's own startswith and find methods (which are far faster than
+	walking the automaton token by token). Memory views have neither method, so
+	they are still matched by the automaton.
+	"""
+
+	def __init__(self, literal):
+		super().__init__([literal])
+		self._literal = literal
+
+	def __repr__(self):
+		return "<SingleLiteral(%r) at 0x%x>" % (self._literal, id(self))
+
+	def accepts(self, string, pos=0):
+		"""
+		Returns the index of the given string after the literal, if the literal
+		starts at index pos. Otherwise, accepts returns -1.
+		"""
+
+		if isinstance(string, memoryview):
+			return super().accepts(string, pos)
+
+		if string.startswith(self._literal, pos):
+			return pos + len(self._literal)
+
+		return -1
+
+	def search(self, string, pos=0):
+		"""
+		Returns the (start, end) indices of the first occurrence of the literal in the
+		given string starting at or after index pos, or None if there is no such
+		occurrence.
+		"""
+
+		if isinstance(string, memoryview):
+			return super().search(string, pos)
+
+		start = string.find(self._literal, pos)
+
+		if start < 0:
+			return None
+
+		return start, start + len(self._literal)
@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+# redone: A correct regex implementation in Python
+# Copyright (C) 2014 Aleksa Sarai
+
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+from . import constants
+from . import fsa
+from . import syntax
+
+# Width (in positions) of the chunks of a set of positions which are looked up in
+# the tables of follow masks.
+CHUNK_BITS = 8
+CHUNK_MASK = (1 << CHUNK_BITS) - 1
+
+
+def _bits(mask):
+	# Yields the positions in the given mask.
+	while mask:
+		low = mask & -mask
+		mask ^= low
+
+		yield low.bit_length() - 1
+
+def _expand(tree):
+	"""
+	Returns a tree equivalent to the given Repeat, which only repeats its item
+	with "*", "+" or "?" -- x{2,4} is xx(x(x)?)? and x{3,} is xxx+. Positions are
+	numbered as the tree is walked, so each copy of the item gets its own.
+	"""
+
+	item, minimum, maximum = tree.item, tree.minimum, tree.maximum
+
+	if (minimum, maximum) in [(0, None), (1, None), (0, 1)]:
+		return tree
+
+	items = [item] * minimum
+
+	if maximum is None:
+		items[-1] = syntax.Repeat(item, 1)
+	elif maximum > minimum:
+		tail = syntax.Repeat(item, 0, 1)
+
+		for _ in range(maximum - minimum - 1):
+			tail = syntax.Repeat(syntax.Concat(item, tail), 0, 1)
+
+		items.append(tail)
+
+	if not items:
+		return syntax.Empty()
+
+	if len(items) == 1:
+		return items[0]
+
+	return syntax.Concat(*items)
+
+
+def count_positions(tree):
+	"""
+	Returns the number of positions (excluding the start) of the bit-parallel
+	automaton of the given syntax tree, without building it.
+	"""
+
+	counts = []
+	todo = [(tree, False)]
+
+	while todo:
+		node, ready = todo.pop()
+		children = node._children()
+
+		# Count the children first.
+		if children and not ready:
+			todo.append((node, True))
+			todo.extend((child, False) for child in reversed(children))
+			continue
+
+		parts = counts[len(counts) - len(children):]
+		del counts[len(counts) - len(children):]
+
+		if isinstance(node, syntax.Literal):
+			counts.append(len(node.text))
+		elif isinstance(node, syntax.Set):
+			counts.append(1)
+		elif isinstance(node, syntax.Repeat):
+			copies = node.maximum if node.maximum is not None else max(node.minimum, 1)
+			counts.append(parts[0] * copies)
+		else:
+			counts.append(sum(parts))
+
+	return counts.pop()
+
+
+class BitParallel(fsa.FSA):
+	"""
+	Simulates the Glushkov (position) automaton of a syntax tree with bitwise
+	operations on Python ints. Every token of the pattern is a position (numbered
+	from 1 in the order they appear, with position 0 as the start) and a set of
+	positions is an int whose bit i is position i, so the whole set of NFA states
+	is updated at once for each token, without ever determinising it.
+
+	A position can only be entered by consuming a token it matches, so the states
+	occupied after a token are the positions following any current position, masked
+	with the positions matching the token (one mask per TokenClasses class).
+	Following the next position (as in a run of literal tokens) is a shift of the
+	whole set. The few positions followed by anything else are looked up,
+	CHUNK_BITS positions at a time, in tables of their follow masks.
+	"""
+
+	__slots__ = ("classes", "start", "_accept", "_masks", "_shift", "_exceptional", "_tables")
+
+	def __init__(self, tree, binary=False):
+		if not isinstance(tree, syntax.Node):
+			raise TypeError("Invalid tree type for a bit-parallel automaton.")
+
+		alphabet = fsa.Ranges(constants.BYTE_ALPHABET if binary else constants.ALPHABET)
+
+		labels = [None]
+		follow = [0]
+
+		nullable, first, last = self._positions(tree, alphabet, labels, follow)
+
+		# The start is followed by the first positions of the tree.
+		follow[0] = first
+
+		self.start = 1
+		self._accept = last | int(nullable)
+
+		# Positions which are followed by the next position are entered by shifting,
+		# every other follow edge is an exception.
+		self._shift = 0
+		self._exceptional = 0
+		exceptions = [0] * len(follow)
+
+		for position, mask in enumerate(follow):
+			following = 1 << (position + 1)
+
+			if mask & following:
+				self._shift |= following
+				mask ^= following
+
+			if mask:
+				self._exceptional |= 1 << position
+				exceptions[position] = mask
+
+		self._tables = []
+
+		for offset in range(0, len(follow), CHUNK_BITS):
+			chunk = (self._exceptional >> offset) & CHUNK_MASK
+
+			if not chunk:
+				continue
+
+			table = [0] * (1 << CHUNK_BITS)
+
+			for index in range(1, len(table)):
+				low = index & -index
+				position = offset + low.bit_length() - 1
+
+				if position < len(exceptions):
+					table[index] = table[index ^ low] | exceptions[position]
+				else:
+					table[index] = table[index ^ low]
+
+			self._tables.append((offset, table))
+
+		self.classes, self._masks = self._classes(labels, binary)
+
+	def __repr__(self):
+		return "<BitParallel(positions=%d) at 0x%x>" % (self._accept.bit_length(), id(self))
+
+	@staticmethod
+	def _positions(tree, alphabet, labels, follow):
+		"""
+		Numbers the positions of the given tree, appending the Ranges of tokens each
+		one matches to labels and filling in the follow mask of each one. Returns
+		whether the tree matches the empty string, and the masks of the positions
+		which can be the first and the last of its matches. The tree is walked in
+		post-order with an explicit stack, so deep trees don't recurse.
+		"""
+
+		results = []
+		todo = [(tree, False)]
+
+		while todo:
+			node, ready = todo.pop()
+
+			if isinstance(node, syntax.Repeat) and not ready:
+				node = _expand(node)
+
+			children = node._children()
+
+			# Walk the children first.
+			if children and not ready:
+				todo.append((node, True))
+				todo.extend((child, False) for child in reversed(children))
+				continue
+
+			parts = results[len(results) - len(children):]
+			del results[len(results) - len(children):]
+
+			if isinstance(node, syntax.Empty):
+				results.append((True, 0, 0))
+
+			elif isinstance(node, syntax.Literal):
+				position = len(labels)
+
+				for token in node.text:
+					labels.append(fsa.Ranges([(ord(token), ord(token))]))
+					follow.append(0)
+
+				# Each token of the literal follows the one before it.
+				for index in range(position, len(labels) - 1):
+					follow[index] = 1 << (index + 1)
+
+				results.append((False, 1 << position, 1 << (len(labels) - 1)))
+
+			elif isinstance(node, syntax.Set):
+				tokens = node.ranges
+
+				# We want the inverse of the given character set.
+				if node.negated:
+					tokens = alphabet.difference(tokens)
+
+				position = len(labels)
+				labels.append(tokens)
+				follow.append(0)
+
+				results.append((False, 1 << position, 1 << position))
+
+			elif isinstance(node, syntax.Concat):
+				nullable, first, last = True, 0, 0
+
+				for item_nullable, item_first, item_last in parts:
+					for position in _bits(last):
+						follow[position] |= item_first
+
+					if nullable:
+						first |= item_first
+
+					if item_nullable:
+						last |= item_last
+					else:
+						last = item_last
+
+					nullable = nullable and item_nullable
+
+				results.append((nullable, first, last))
+
+			elif isinstance(node, syntax.Union):
+				nullable, first, last = False, 0, 0
+
+				for item_nullable, item_first, item_last in parts:
+					nullable = nullable or item_nullable
+					first |= item_first
+					last |= item_last
+
+				results.append((nullable, first, last))
+
+			elif isinstance(node, syntax.Repeat):
+				(nullable, first, last), = parts
+
+				# The last positions can start another repetition.
+				if node.maximum is None:
+					for position in _bits(last):
+						follow[position] |= first
+
+				if not node.minimum:
+					nullable = True
+
+				results.append((nullable, first, last))
+
+			else:
+				raise TypeError("Cannot build a bit-parallel automaton from %r." % (node,))
+
+		return results.pop()
+
+	@staticmethod
+	def _classes(labels, binary):
+		"""
+		Partitions the tokens into classes of tokens which are matched by precisely the
+		same positions, returning the TokenClasses and the mask of the positions
+		matching each class. The alphabet is split at the bounds of every label, as
+		in nfa._classes.
+		"""
+
+		bounds = {0: 0}
+
+		for position, label in enumerate(labels):
+			if not label:
+				continue
+
+			for first, last in label:
+				bounds[first] = bounds.get(first, 0) ^ (1 << position)
+				bounds[last + 1] = bounds.get(last + 1, 0) ^ (1 << position)
+
+		# Number the classes by their smallest token, so they are stable.
+		ids = {0: 0}
+		representatives = [None]
+		starts = []
+		classes = []
+
+		mask = 0
+
+		for ordinal in sorted(bounds):
+			mask ^= bounds[ordinal]
+
+			if mask not in ids:
+				ids[mask] = len(ids)
+				representatives.append(fsa._token(ordinal, binary))
+
+			# Adjacent segments in the same class are merged.
+			if not classes or classes[-1] != ids[mask]:
+				starts.append(ordinal)
+				classes.append(ids[mask])
+
+		masks = [0] * len(ids)
+		for mask, cls in ids.items():
+			masks[cls] = mask
+
+		return fsa.TokenClasses(starts, classes, representatives), masks
+
+	def step(self, states, cls):
+		"""
+		Returns the set of positions occupied after consuming a token of the given
+		class from the given set of positions.
+		"""
+
+		following = (states << 1) & self._shift
+		exceptional = states & self._exceptional
+
+		if exceptional:
+			for offset, table in self._tables:
+				following |= table[(exceptional >> offset) & CHUNK_MASK]
+
+		return following & self._masks[cls]
+
+	def accepting(self, states):
+		"""
+		Returns whether any of the given positions accepts.
+		"""
+
+		return bool(states & self._accept)
+
+	def _run(self, blocks, index, step):
+		"""
+		Simulates the automaton from the start, consuming the given blocks of classes
+		and moving index by step after every token. Returns the last index at which
+		the simulation was in an accepting set of positions, or -1 if there is no
+		such index.
+		"""
+
+		masks = self._masks
+		shift = self._shift
+		exceptional = self._exceptional
+		tables = self._tables
+		accept = self._accept
+
+		states = self.start
+		found = -1
+
+		for block in blocks:
+			for cls in block:
+				following = (states << 1) & shift
+				exceptions = states & exceptional
+
+				if exceptions:
+					for offset, table in tables:
+						following |= table[(exceptions >> offset) & CHUNK_MASK]
+
+				states = following & masks[cls]
+				index += step
+
+				# Landed on an accepting set of positions.
+				if states & accept:
+					found = index
+
+				# If there are no positions left, we cannot proceed further.
+				if not states:
+					return found
+
+		return found
+
+	def accepts(self, string, pos=0):
+		"""
+		Returns the right-most index of the given string which, when consumed by the
+		automaton (starting from index pos), ends on an accepting position. If no
+		such index exists, accepts returns -1.
+		"""
+
+		return self._run(self.classes.blocks(string, pos), pos, 1)
+
+	def accepts_reversed(self, string, end, pos=0):
+		"""
+		Returns the left-most index of the given string which, when the tokens of
+		string[index:end] are consumed from right to left by the automaton, ends on
+		an accepting position. If no such index (no smaller than pos) exists,
+		accepts_reversed returns -1.
+		"""
+
+		tokens = reversed(self.classes.translate(string[pos:end]))
+		return self._run([tokens], end, -1)
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# redone: A correct regex implementation in Python
+# Copyright (C) 2014 Aleksa Sarai
+
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import collections
+import threading
+
+DEFAULT_MAXSIZE = 512
+
+CacheInfo = collections.namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+
+class LRUCache(object):
+	"""
+	A size-bounded mapping which evicts the least recently used entry once more
+	than maxsize entries are stored. A maxsize of 0 disables caching entirely. All
+	operations are safe to use from multiple threads.
+	"""
+
+	def __init__(self, maxsize=DEFAULT_MAXSIZE):
+		self._lock = threading.Lock()
+		self._data = collections.OrderedDict()
+
+		self._hits = 0
+		self._misses = 0
+
+		self._maxsize = 0
+		self.resize(maxsize)
+
+	def get(self, key, default=None):
+		"""
+		Returns the entry stored with the given key (marking it as the most recently
+		used entry), or default if there is no such entry.
+		"""
+
+		with self._lock:
+			if key not in self._data:
+				self._misses += 1
+				return default
+
+			self._hits += 1
+			self._data.move_to_end(key)
+
+			return self._data[key]
+
+	def put(self, key, value):
+		"""
+		Stores the given value with the given key, evicting the least recently used
+		entries if the cache is full.
+		"""
+
+		with self._lock:
+			if not self._maxsize:
+				return
+
+			self._data[key] = value
+			self._data.move_to_end(key)
+
+			self._evict()
+
+	def resize(self, maxsize):
+		"""
+		Changes the maximum number of entries stored in the cache, evicting the least
+		recently used entries if there are now too many.
+		"""
+
+		if not isinstance(maxsize, int) or maxsize < 0:
+			raise ValueError("Cache size must be a non-negative integer.")
+
+		with self._lock:
+			self._maxsize = maxsize
+			self._evict()
+
+	def purge(self):
+		"""
+		Removes all entries from the cache and resets the statistics.
+		"""
+
+		with self._lock:
+			self._data.clear()
+			self._hits = 0
+			self._misses = 0
+
+	def info(self):
+		"""
+		Returns a CacheInfo describing the current usage of the cache.
+		"""
+
+		with self._lock:
+			return CacheInfo(self._hits, self._misses, self._maxsize, len(self._data))
+
+	def _evict(self):
+		# Drop the least recently used entries (at the front).
+		while len(self._data) > self._maxsize:
+			self._data.popitem(last=False)
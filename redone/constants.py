@@ -6,8 +6,25 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
-import string
+import sys
 
-ALPHABET = set(string.printable)
+# Alphabets of text patterns (every code point) and of byte patterns (every byte
+# value), as inclusive ranges of ordinals. Byte patterns are parsed as latin-1
+# text, so their tokens are the characters with those ordinals.
+ALPHABET = ((0, sys.maxunicode),)
+BYTE_ALPHABET = ((0, 0xff),)
 METACHARS = {"^", ".", "*", "+", "?", "(", ")", "[", "]", "{", "}", "|", "\\"}
 SETMETA = {"[", "]", "\\"}
+
+# Matching engines which can be used by compiled patterns. ENGINE_AUTO picks one
+# of the others for each pattern.
+ENGINE_AUTO = "auto"
+ENGINE_NFA = "nfa"
+ENGINE_DFA = "dfa"
+ENGINE_LAZY = "lazy"
+ENGINE_BITPARALLEL = "bitparallel"
+ENGINES = {ENGINE_AUTO, ENGINE_NFA, ENGINE_DFA, ENGINE_LAZY, ENGINE_BITPARALLEL}
+
+# Engine picked by ENGINE_AUTO for patterns which are just unions of literals (it
+# can't be asked for by hand).
+ENGINE_LITERAL = "literal"
@@ -8,38 +8,98 @@
 
 from . import nfa
 from . import dfa
-from . import constants
+from . import program
 
-def _all_edges(states):
-	"Get all edges from all states."
+def _class_label(classes, cls):
+	# Label of the edges of the given class, for DFAs which aren't labelled with
+	# classes.
+	ranges = classes.ranges(cls)
 
-	tokens = set()
+	if ranges.size() == 1:
+		return classes.representatives[cls]
+
+	return ranges
+
+def _bits(states):
+	# Bitset of the given states of an NFA program.
+	mask = 0
 
 	for state in states:
-		tokens |= set(key for key, value in state._edges.items() if key != nfa.EPSILON_EDGE)
+		mask |= 1 << state
+
+	return mask
+
+def _move_masks(nfa_program):
+	"""
+	Returns, for each state of the given NFA program, a mapping from each class
+	which labels its edges to the bitset of the (epsilon closed) states occupied
+	after consuming a token of that class. Bit i of a bitset is the program's
+	state i, so the moves of a set of states are the unions of their masks.
+	"""
+
+	current, following = nfa_program._take()
+	closures = []
+
+	for state in range(len(nfa_program._accept)):
+		nfa_program._load(current, [state])
+		closures.append(_bits(current.dense[:current.size]))
 
-	return tokens
+	nfa_program._give(current, following)
 
-def nfa2dfa(graph):
+	masks = []
+	edge_first = nfa_program._edge_first
+
+	for state in range(len(nfa_program._accept)):
+		moves = {}
+
+		for edge in range(edge_first[state], edge_first[state + 1]):
+			cls = nfa_program._edge_classes[edge]
+			moves[cls] = moves.get(cls, 0) | closures[nfa_program._edge_targets[edge]]
+
+		masks.append(moves)
+
+	return masks
+
+def nfa2dfa(graph, classes=None, max_states=None):
 	"""
 	Converts an NFA graph to a DFA graph using the NFA deterministation algorithm.
 	The returned graph is a DFA graph which will accept *precisely* the same
 	languages. This massively improves the run-time performance of evaluation (at
 	some 'compile-time' cost when running this function), since there is no need to
 	emulate multiple states or recursively evaluate epsilon edges.
+
+	Only one token of each of the TokenClasses of the graph needs to be
+	determinised. If the classes are given, the edges of the DFA are labelled with
+	the classes. Otherwise they are labelled with the tokens (or the disjoint
+	Ranges of tokens) of each class, since ranges labelling the edges of the NFA
+	may overlap. If the DFA would have more than max_states states, a
+	DFAStateLimitException is raised.
+
+	The graph is first compiled into an NFA program (see redone.program), so sets
+	of NFA states are bitsets of the numbered program states. Every state has a
+	precomputed move mask for each class, so all of the transitions out of a set
+	of states are found in a single pass over its states, and hashing and
+	comparing sets is cheap.
 	"""
 
 	if not isinstance(graph, nfa.NFANode):
 		raise TypeError("Invalid graph type for NFA determinisation algorithm.")
 
+	labelled = classes is not None
+	if classes is None:
+		classes = nfa._classes(graph)
+
+	nfa_program = program.Program(graph, classes=classes)
+	masks = _move_masks(nfa_program)
+	accepting = _bits(state for state, accept in enumerate(nfa_program._accept) if accept)
+
 	# Get the set of initial states and the initial DFA node.
-	states = frozenset(graph._epsilon_closure())
-	new_graph = dfa.DFANode(tag=states, accept=nfa._accepts(states))
+	states = _bits(nfa_program.start)
+	new_graph = dfa.DFANode(tag=states, accept=bool(states & accepting))
 
 	# Sink -- where all edges go to die.
 	sink = dfa.DFANode(tag="sink", accept=False)
-	for token in constants.ALPHABET:
-		sink.add_edge(token, sink)
+	sink._sink = sink
 
 	seen = {states: new_graph}
 	todo = [new_graph]
@@ -52,20 +112,30 @@ def nfa2dfa(graph):
 		# Add sink node.
 		todo_node._sink = sink
 
-		# Ensure that each node has an edge the is in on of each of the states.
-		for token in _all_edges(states):
-			# Get set of states which are occupied after consuming the token.
-			s = nfa._moves(states, token)
-			s = frozenset(nfa._epsilon_closures(s))
+		# Get the sets of states which are occupied after consuming each class, from
+		# the move masks of each state in the set. Classes without a move lead to
+		# the sink.
+		moves = {}
+		rest = states
 
-			# No states -- just forward to the sink.
-			if not s:
-				todo_node.add_edge(token, sink)
-				continue
+		while rest:
+			low = rest & -rest
+			rest ^= low
+
+			for cls, mask in masks[low.bit_length() - 1].items():
+				moves[cls] = moves.get(cls, 0) | mask
+
+		for cls, s in moves.items():
+			label = cls
+			if not labelled:
+				label = _class_label(classes, cls)
 
 			# New set of NFA states -- create a new DFA node to describe it.
 			if s not in seen:
-				node = dfa.DFANode(tag=s, accept=nfa._accepts(s))
+				if max_states is not None and len(seen) >= max_states:
+					raise dfa.DFAStateLimitException("DFA has more than %d states." % max_states)
+
+				node = dfa.DFANode(tag=s, accept=bool(s & accepting))
 				todo.append(node)
 				seen[s] = node
 
@@ -73,7 +143,157 @@ def nfa2dfa(graph):
 			else:
 				node = seen[s]
 
-			# Add edge for given token.
-			todo_node.add_edge(token, node)
+			# Add edge for given label.
+			todo_node.add_edge(label, node)
 
 	return new_graph
+
+def _dfa_states(graph):
+	"Get all states reachable from the given DFA node (including its sink)."
+
+	states = [graph]
+	seen = {graph}
+
+	for state in states:
+		nodes = list(state._edges.values())
+
+		if state._sink is not None:
+			nodes.append(state._sink)
+
+		for node in nodes:
+			if node not in seen:
+				seen.add(node)
+				states.append(node)
+
+	return states
+
+def minimise(graph):
+	"""
+	Minimises a DFA graph using Hopcroft's partition refinement algorithm. The
+	returned graph accepts *precisely* the same language as the given graph, but
+	has the fewest possible states (all of the states which cannot be told apart
+	by any input are merged into one state). Edges to the sink are left implicit.
+	"""
+
+	if not isinstance(graph, dfa.DFANode):
+		raise TypeError("Invalid graph type for DFA minimisation algorithm.")
+
+	states = _dfa_states(graph)
+	ids = {state: index for index, state in enumerate(states)}
+
+	tokens = set()
+	for state in states:
+		tokens |= set(state._edges)
+
+	# Inverse transitions: inverse[token][state] is the set of states which
+	# transition to state when consuming token.
+	inverse = {token: {} for token in tokens}
+	for state in states:
+		for token in tokens:
+			node = state._edges.get(token, state._sink)
+
+			# Missing edges in the sink are a self-loop.
+			if node is None:
+				node = state
+
+			inverse[token].setdefault(ids[node], set()).add(ids[state])
+
+	# Start with accepting and non-accepting states, then keep splitting blocks
+	# until no token can tell two states in the same block apart.
+	accepting = {ids[state] for state in states if state._accept}
+	rejecting = set(range(len(states))) - accepting
+	blocks = [block for block in (accepting, rejecting) if block]
+
+	block_of = {}
+	for index, block in enumerate(blocks):
+		for state in block:
+			block_of[state] = index
+
+	work = set(range(len(blocks)))
+
+	while work:
+		splitter = set(blocks[work.pop()])
+
+		for token in tokens:
+			# Get all states which transition into the splitter.
+			sources = set()
+			for state in splitter:
+				sources |= inverse[token].get(state, set())
+
+			# Group them by the block they are in.
+			touched = {}
+			for state in sources:
+				touched.setdefault(block_of[state], set()).add(state)
+
+			for index, inside in touched.items():
+				if len(inside) == len(blocks[index]):
+					continue
+
+				# Split the block into the states inside and outside the splitter.
+				outside = blocks[index] - inside
+				blocks[index] = inside
+
+				new_index = len(blocks)
+				blocks.append(outside)
+
+				for state in outside:
+					block_of[state] = new_index
+
+				# Only the smaller half needs to be used as a splitter, unless the block
+				# was already waiting to be used.
+				if index in work or len(outside) < len(inside):
+					work.add(new_index)
+				else:
+					work.add(index)
+
+	# Create a new node for each block, using the block of the old sink as the new sink.
+	nodes = [dfa.DFANode(tag=index, accept=bool(block & accepting)) for index, block in enumerate(blocks)]
+
+	sink = None
+	if graph._sink is not None:
+		sink = nodes[block_of[ids[graph._sink]]]
+
+	for index, block in enumerate(blocks):
+		node = nodes[index]
+		node._sink = sink or node
+
+		state = states[next(iter(block))]
+		for token in tokens:
+			target = state._edges.get(token, state._sink)
+
+			if target is None:
+				target = state
+
+			target = nodes[block_of[ids[target]]]
+
+			if target is not node._sink:
+				node.add_edge(token, target)
+
+	return nodes[block_of[ids[graph]]]
+
+def dfa2table(graph, classes=None):
+	"""
+	Converts a DFA graph into a DFATable, which stores the transitions of the
+	graph in a single flat array. The returned table accepts *precisely* the same
+	language as the graph, but matching no longer has to walk through node objects
+	and none of the nodes (or their tags) are kept alive by the table. If the graph
+	was determinised with TokenClasses, the same classes must be given.
+	"""
+
+	if not isinstance(graph, dfa.DFANode):
+		raise TypeError("Invalid graph type for DFA flattening.")
+
+	return dfa.DFATable.from_graph(graph, _dfa_states(graph), classes=classes)
+
+def nfa2table(graph, classes=None, max_states=None):
+	"""
+	Converts an NFA graph to the minimal DFA which accepts *precisely* the same
+	language, stored as a DFATable. If the (non-minimised) DFA would have more than
+	max_states states, a DFAStateLimitException is raised.
+	"""
+
+	if classes is None:
+		classes = nfa._classes(graph)
+
+	graph = nfa2dfa(graph, classes=classes, max_states=max_states)
+	return dfa2table(minimise(graph), classes=classes)
@@ -6,15 +6,39 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
+import array
 import collections
 
 from . import fsa
 
+SINK_STATE = 0
+
+def _typecode(size):
+	"Get the smallest array typecode which can hold integers in range(size)."
+
+	for typecode in ("B", "H", "I", "L"):
+		if size <= 1 << (8 * array.array(typecode).itemsize):
+			return typecode
+
+	return "Q"
+
+
+def _first_ordinal(label):
+	# Smallest ordinal of a token or Ranges edge label.
+	if isinstance(label, fsa.Ranges):
+		return label[0][0]
+
+	return fsa._ordinal(label)
+
 
 class DFAException(Exception):
 	pass
 
 
+class DFAStateLimitException(DFAException):
+	pass
+
+
 class DFANode(fsa.FSANode):
 	"""
 	Represents a node or state in a DFA graph. Due to the properties of directed
@@ -41,11 +65,22 @@ class DFANode(fsa.FSANode):
 		described and _move will raise a DFAException.
 		"""
 
+		node = self._edges.get(token)
+
+		# Edges labelled with ranges of tokens.
+		if node is None:
+			for label, target in self._edges.items():
+				if isinstance(label, fsa.Ranges) and token in label:
+					node = target
+					break
+			else:
+				node = self._sink
+
 		# Oops!
-		if self._edges[token] is None:
+		if node is None:
 			raise DFAException("Non-deterministic DFA node (missing edge '%s')." % token)
 
-		return self._edges[token]
+		return node
 
 	def add_edge(self, label, node):
 		"""
@@ -63,19 +98,20 @@ class DFANode(fsa.FSANode):
 
 		self._edges[label] = node
 
-	def accepts(self, string):
+	def accepts(self, string, pos=0):
 		"""
-		Returns true iff. the DFA graph (with the current node as the starting node)
-		will consume the entire string and the ending node is an accepting node. If
-		accepts detects that the DFA graph is not completely described, then it will
-		raise a DFAException.
+		Returns the right-most index of the given string which, when consumed by the
+		DFA graph (with the current node as the starting node and starting from index
+		pos), ends on an accepting node. If no such index exists, accepts returns -1.
+		If accepts detects that the DFA graph is not completely described, then it
+		will raise a DFAException.
 		"""
 
 		state = self
 		end = -1
 
-		for index, token in enumerate(string):
-			next_state = state.move(token)
+		for index in range(pos, len(string)):
+			next_state = state.move(string[index])
 
 			# Landed on an accepting state.
 			if next_state._accept:
@@ -84,3 +120,126 @@ class DFANode(fsa.FSANode):
 			state = next_state
 
 		return end
+
+
+class DFATable(fsa.FSA):
+	"""
+	Represents a frozen DFA as a flat transition table. States are integers (with
+	the sink always being state 0) and the transitions of every state are stored
+	in one contiguous array, indexed by state * nclasses + class. The class of a
+	token is given by the TokenClasses of the table, which strings are translated
+	with before being matched. Accepting states are stored as a byte map indexed
+	by state.
+	"""
+
+	def __init__(self, table, classes, accept, start):
+		self._table = table
+		self._classes = classes
+		self._accept = accept
+		self._start = start
+
+	def __repr__(self):
+		return "<DFATable(states=%d, classes=%d) at 0x%x>" % (len(self._accept), self._classes.nclasses, id(self))
+
+	@classmethod
+	def from_graph(cls, graph, states, classes=None):
+		"""
+		Flattens the DFA graph starting at the given node, where states is a list of
+		all of the nodes in the graph. Every label missing from a node's edges has to
+		lead to the sink. If classes is given, the edges of the graph are labelled
+		with classes rather than tokens.
+		"""
+
+		# The sink is always state zero.
+		sink = graph._sink or graph
+		states = [sink] + [state for state in states if state is not sink]
+		ids = {state: index for index, state in enumerate(states)}
+
+		# Each token (or range of tokens) is its own class, with class 0 for
+		# everything else.
+		if classes is None:
+			tokens = set()
+			for state in states:
+				tokens |= set(state._edges)
+
+			labels = {token: index + 1 for index, token in enumerate(sorted(tokens, key=_first_ordinal))}
+			classes = fsa.TokenClasses.from_labels(labels)
+
+		else:
+			labels = {cls: cls for cls in range(classes.nclasses)}
+
+		nclasses = classes.nclasses
+
+		table = array.array(_typecode(len(states)), [SINK_STATE]) * (len(states) * nclasses)
+		for state in states:
+			base = ids[state] * nclasses
+
+			for label, node in state._edges.items():
+				table[base + labels[label]] = ids[node]
+
+		accept = bytes(state._accept for state in states)
+		return cls(table, classes, accept, ids[graph])
+
+	def accepts(self, string, pos=0):
+		"""
+		Returns the right-most index of the given string which, when consumed by the
+		DFA (starting from index pos), ends on an accepting state. If no such index
+		exists, accepts returns -1.
+		"""
+
+		table = self._table
+		classes = self._classes
+		nclasses = classes.nclasses
+		accept = self._accept
+		sink = SINK_STATE
+
+		state = self._start
+		end = -1
+		index = pos
+
+		for block in classes.blocks(string, pos):
+			for cls in block:
+				state = table[state * nclasses + cls]
+				index += 1
+
+				# Nothing can be accepted from the sink.
+				if state == sink:
+					return end
+
+				# Landed on an accepting state.
+				if accept[state]:
+					end = index
+
+		return end
+
+	def accepts_reversed(self, string, end, pos=0):
+		"""
+		Returns the left-most index of the given string which, when the tokens of
+		string[index:end] are consumed from right to left by the DFA, ends on an
+		accepting state. If no such index (no smaller than pos) exists,
+		accepts_reversed returns -1.
+		"""
+
+		table = self._table
+		classes = self._classes
+		nclasses = classes.nclasses
+		accept = self._accept
+		sink = SINK_STATE
+
+		state = self._start
+		start = -1
+		index = end
+
+		for cls in reversed(classes.translate(string[pos:end])):
+			state = table[state * nclasses + cls]
+			index -= 1
+
+			# Nothing can be accepted from the sink.
+			if state == sink:
+				break
+
+			# Landed on an accepting state.
+			if accept[state]:
+				start = index
+
+		return start
@@ -6,13 +6,274 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
-class FSANode(object):
+import bisect
+
+# Number of tokens translated into classes at a time while matching, so that
+# matches which stop early don't need to translate the whole string.
+BLOCK_SIZE = 4096
+
+
+def _ordinal(token):
+	# Tokens of bytes-like strings are already ints.
+	if isinstance(token, int):
+		return token
+
+	return ord(token)
+
+
+def _token(ordinal, binary):
+	# Tokens of byte patterns are ints, and tokens of text patterns are characters.
+	if binary:
+		return ordinal
+
+	return chr(ordinal)
+
+
+class Ranges(tuple):
 	"""
-	Base class for both DFA and NFA nodes.
+	Edge label which matches a set of tokens, stored as a sorted tuple of disjoint
+	(first, last) ranges of ordinals (both inclusive). Large sets of tokens (such
+	as "." or negated sets over all of Unicode) only need one edge labelled with
+	their ranges, rather than one edge per token. Ranges of byte patterns are
+	binary, so their tokens are ints rather than characters.
 	"""
 
-	def accepts(self, string):
+	def __new__(cls, ranges=(), binary=False):
+		merged = []
+
+		# Merge overlapping and adjacent ranges.
+		for first, last in sorted(ranges):
+			if merged and first <= merged[-1][1] + 1:
+				merged[-1] = (merged[-1][0], max(merged[-1][1], last))
+			else:
+				merged.append((first, last))
+
+		self = super().__new__(cls, merged)
+		self.binary = binary
+
+		return self
+
+	@classmethod
+	def from_tokens(cls, tokens, binary=False):
+		"""
+		Returns the Ranges containing precisely the given tokens.
+		"""
+
+		return cls(((_ordinal(token), _ordinal(token)) for token in tokens), binary=binary)
+
+	def __repr__(self):
+		ranges = ("%r-%r" % (_token(first, self.binary), _token(last, self.binary)) for first, last in self)
+		return "Ranges(%s)" % (", ".join(ranges),)
+
+	def __contains__(self, token):
+		ordinal = _ordinal(token)
+
+		# The last range starting at or before the token.
+		index = bisect.bisect_right(self, (ordinal, float("inf"))) - 1
+		return index >= 0 and ordinal <= self[index][1]
+
+	def size(self):
+		"""
+		Returns the number of tokens in the ranges.
+		"""
+
+		return sum(last - first + 1 for first, last in self)
+
+	def tokens(self):
+		"""
+		Yields every token in the ranges, in order.
+		"""
+
+		for first, last in self:
+			for ordinal in range(first, last + 1):
+				yield _token(ordinal, self.binary)
+
+	def difference(self, other):
+		"""
+		Returns the Ranges of the tokens in these ranges but not in the other ranges.
+		"""
+
+		ranges = []
+
+		for first, last in self:
+			for other_first, other_last in other:
+				if other_last < first or other_first > last:
+					continue
+
+				if other_first > first:
+					ranges.append((first, other_first - 1))
+
+				first = other_last + 1
+
+			if first <= last:
+				ranges.append((first, last))
+
+		return Ranges(ranges, binary=self.binary)
+
+
+class TokenClasses(dict):
+	"""
+	Partition of the alphabet into classes of tokens which an automaton treats
+	identically. The alphabet is split into segments of consecutive ordinals,
+	where starts holds the first ordinal of each segment (starting from 0) and ids
+	holds the class of each segment. Tokens the automaton doesn't use at all are
+	class 0, which includes the last segment. The representatives list holds one
+	token of each class (None for class 0).
+
+	Classes are found by bisecting the segments, and are then memoised in the
+	dict, which is a translation table (for str.translate) from the ordinal of a
+	token to its class. Tokens of bytes-like strings are ints, which are their
+	own ordinals, so the same table also translates bytes (through a
+	bytes.translate table).
+	"""
+
+	def __init__(self, starts, ids, representatives):
+		super().__init__()
+
+		self._starts = starts
+		self._ids = ids
+
+		self.nclasses = len(representatives)
+		self.representatives = representatives
+
+		self._bytes = None
+		if self.nclasses <= 256:
+			self._bytes = bytes(self[byte] for byte in range(256))
+
+	@classmethod
+	def from_labels(cls, labels):
+		"""
+		Returns the TokenClasses where the tokens of each of the given (disjoint)
+		token or Ranges labels are in the class the label is mapped to.
+		"""
+
+		segments = []
+		representatives = [None] * (max(labels.values(), default=0) + 1)
+
+		for label, index in labels.items():
+			if isinstance(label, Ranges):
+				segments.extend((first, last, index) for first, last in label)
+			else:
+				segments.append((_ordinal(label), _ordinal(label), index))
+
+		starts = [0]
+		ids = [0]
+
+		for first, last, index in sorted(segments):
+			if representatives[index] is None:
+				representatives[index] = first
+
+			if first == starts[-1]:
+				ids[-1] = index
+			else:
+				starts.append(first)
+				ids.append(index)
+
+			starts.append(last + 1)
+			ids.append(0)
+
+		binary = any(isinstance(label, int) or getattr(label, "binary", False) for label in labels)
+		representatives = [None if first is None else _token(first, binary) for first in representatives]
+
+		return cls(starts, ids, representatives)
+
+	def __missing__(self, key):
+		cls = self._ids[bisect.bisect_right(self._starts, key) - 1]
+		self[key] = cls
+
+		return cls
+
+	def token_class(self, token):
+		"""
+		Returns the class of the given token.
+		"""
+
+		return self[_ordinal(token)]
+
+	def label_classes(self, label):
+		"""
+		Returns the set of classes of the tokens matched by the given token or Ranges
+		edge label.
+		"""
+
+		if not isinstance(label, Ranges):
+			return {self.token_class(label)}
+
+		classes = set()
+
+		for first, last in label:
+			index = bisect.bisect_right(self._starts, first) - 1
+
+			while index < len(self._starts) and self._starts[index] <= last:
+				classes.add(self._ids[index])
+				index += 1
+
+		return classes
+
+	def ranges(self, cls):
+		"""
+		Returns the Ranges of the tokens in the given (non-zero) class.
+		"""
+
+		ranges = []
+
+		# The last segment is always class 0.
+		for index in range(len(self._starts) - 1):
+			if self._ids[index] == cls:
+				ranges.append((self._starts[index], self._starts[index + 1] - 1))
+
+		return Ranges(ranges, binary=isinstance(self.representatives[cls], int))
+
+	def translate(self, string):
+		"""
+		Returns a sequence containing the class of each token in the given string.
+		"""
+
+		if not isinstance(string, str):
+			# Classes fit in a byte string (the common case).
+			if self._bytes is not None:
+				# Memory views don't have a translate method of their own.
+				if isinstance(string, memoryview):
+					string = bytes(string)
+
+				return string.translate(self._bytes)
+
+			# Byte values are the same as latin-1 code points.
+			string = str(string, "latin-1")
+
+		string = string.translate(self)
+
+		# Classes fit in a byte string (the common case).
+		if self.nclasses <= 256:
+			return string.encode("latin-1")
+
+		return memoryview(string.encode("utf-32-le")).cast("I")
+
+	def blocks(self, string, pos=0):
+		"""
+		Yields the classes of the tokens in the given string (starting at index pos),
+		translating BLOCK_SIZE tokens at a time.
+		"""
+
+		for block in range(pos, len(string), BLOCK_SIZE):
+			yield self.translate(string[block:block + BLOCK_SIZE])
+
+
+class FSA(object):
+	"""
+	Base class for all automata which can be used to match strings.
+	"""
+
+	__slots__ = ()
+
+	def accepts(self, string, pos=0):
 		raise NotImplementedError
 
+
+class FSANode(FSA):
+	"""
+	Base class for both DFA and NFA nodes.
+	"""
+
 	def add_edge(self, label, node):
 		raise NotImplementedError
@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+# redone: A correct regex implementation in Python
+# Copyright (C) 2014 Aleksa Sarai
+
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import threading
+
+from . import fsa
+from . import nfa
+from . import program
+
+DEFAULT_MAX_STATES = 4096
+
+# If fewer than this many tokens per cached state were consumed between two
+# flushes of the state cache, the cache is thrashing and matching falls back to
+# computing every transition without caching it.
+MIN_PROGRESS = 10
+
+UNKNOWN_STATE = -1
+
+# State flags.
+FLAG_ACCEPT = 1
+FLAG_STOP = 2
+
+
+class _Generation(object):
+	"""
+	One generation of the state cache of a LazyAutomaton. States are numbered by
+	the order they were added to the generation (the start state is always state
+	0), so a state number is meaningless in any other generation.
+	"""
+
+	__slots__ = ("ids", "keys", "flags", "table", "data")
+
+	def __init__(self):
+		self.ids = {}
+		self.keys = []
+		self.flags = []
+
+		# Flat transition table, indexed by state * nclasses + class. Transitions
+		# which haven't been determinised yet are UNKNOWN_STATE. Any extra data
+		# describing a transition is stored in data with the same index.
+		self.table = []
+		self.data = []
+
+
+class LazyAutomaton(fsa.FSA):
+	"""
+	Base class for deterministic automata whose states are only determinised when
+	the input being matched drives the automaton into them. States are described
+	by hashable keys, and subclasses define the automaton with _transition (which
+	returns the key of the next state and any extra data describing the
+	transition), _accepting and _stopping. Determinised states are cached, but
+	the cache holds at most max_states states -- if it fills up, it is flushed and
+	rebuilt from the states that are still needed.
+	"""
+
+	def __init__(self, classes, start_key, max_states=DEFAULT_MAX_STATES):
+		# We need room for the start state, as well as both sides of the transition
+		# being determinised.
+		if max_states < 4:
+			raise ValueError("Lazy automata must be able to hold at least four states.")
+
+		self._classes = classes
+		self._start_key = start_key
+		self._max_states = max_states
+		self._lock = threading.Lock()
+
+		# Statistics used to detect cache thrashing.
+		self._flushes = 0
+		self._consumed = 0
+		self._mark = 0
+
+		self._cache = self._new_cache()
+
+	def __repr__(self):
+		return "<%s(states=%d, max_states=%d) at 0x%x>" % (type(self).__name__, len(self._cache.keys), self._max_states, id(self))
+
+	def _transition(self, key, cls):
+		raise NotImplementedError
+
+	def _accepting(self, key):
+		raise NotImplementedError
+
+	def _stopping(self, key):
+		raise NotImplementedError
+
+	def _flag(self, key):
+		flag = 0
+
+		if self._accepting(key):
+			flag |= FLAG_ACCEPT
+
+		if self._stopping(key):
+			flag |= FLAG_STOP
+
+		return flag
+
+	def _new_cache(self):
+		cache = _Generation()
+		self._add(cache, self._start_key)
+
+		return cache
+
+	def _add(self, cache, key):
+		state = len(cache.keys)
+		nclasses = self._classes.nclasses
+
+		cache.ids[key] = state
+		cache.keys.append(key)
+		cache.flags.append(self._flag(key))
+		cache.table.extend([UNKNOWN_STATE] * nclasses)
+		cache.data.extend([None] * nclasses)
+
+		return state
+
+	def _next(self, cache, state, cls):
+		"""
+		Determinises the transition from the given state (in the given generation of
+		the cache) across the given class. Returns the current generation of the
+		cache, the next state in that generation and the transition's extra data.
+		If the cache is full it is flushed to make room, in which case the returned
+		generation will differ from the given one.
+		"""
+
+		key = cache.keys[state]
+		next_key, data = self._transition(key, cls)
+
+		with self._lock:
+			cache = self._cache
+			missing = {key, next_key}.difference(cache.ids)
+
+			# Out of room -- start again, keeping only the states we need.
+			if len(cache.keys) + len(missing) > self._max_states:
+				self._flushes += 1
+				cache = self._cache = self._new_cache()
+
+			for new_key in (key, next_key):
+				if new_key not in cache.ids:
+					self._add(cache, new_key)
+
+			state = cache.ids[key]
+			next_state = cache.ids[next_key]
+
+			index = state * self._classes.nclasses + cls
+			cache.table[index] = next_state
+			cache.data[index] = data
+
+		return cache, next_state, data
+
+	def _lookup(self, key):
+		"""
+		Returns the current generation of the cache and the state with the given key
+		in it, adding the state to the cache (flushing it if it is full) if it isn't
+		there already. Used to resume matching from a state of an older generation.
+		"""
+
+		with self._lock:
+			cache = self._cache
+
+			if key not in cache.ids:
+				if len(cache.keys) >= self._max_states:
+					self._flushes += 1
+					cache = self._cache = self._new_cache()
+
+				if key not in cache.ids:
+					self._add(cache, key)
+
+			return cache, cache.ids[key]
+
+	def _thrashing(self, consumed):
+		"""
+		Returns whether too little progress was made since the last flush of the
+		state cache, where consumed is the number of tokens consumed by the current
+		match so far.
+		"""
+
+		consumed += self._consumed
+		progress = consumed - self._mark
+		self._mark = consumed
+
+		return progress < MIN_PROGRESS * self._max_states
+
+
+class LazyDFA(LazyAutomaton):
+	"""
+	Represents a DFA which is determinised lazily from an NFA graph. Each DFA
+	state (a set of NFA program states, see redone.program) is only created when
+	the input being matched drives the automaton into it, and is then cached so
+	later matches run at DFA speed. If the cache thrashes, matching falls back to
+	simulating the NFA program.
+	"""
+
+	def __init__(self, graph, max_states=DEFAULT_MAX_STATES, classes=None):
+		if isinstance(graph, nfa.NFANode):
+			graph = program.Program(graph, classes=classes)
+
+		if not isinstance(graph, program.Program):
+			raise TypeError("Invalid graph type for lazy NFA determinisation.")
+
+		self._program = graph
+		super().__init__(graph.classes, graph.start, max_states)
+
+	def _transition(self, key, cls):
+		# Class 0 tokens aren't used by the graph at all.
+		if not cls:
+			return frozenset(), None
+
+		return self._program.step(key, cls), None
+
+	def _accepting(self, key):
+		return self._program.accepting(key)
+
+	def _stopping(self, key):
+		# Nothing can be accepted once there are no states left.
+		return not key
+
+	def accepts(self, string, pos=0):
+		"""
+		Returns the right-most index of the given string which, when consumed by the
+		DFA (starting from index pos), ends on an accepting state. If no such index
+		exists, accepts returns -1.
+		"""
+
+		end, index = self._accepts(string, self._classes.blocks(string, pos), pos, 1)
+		self._consumed += index - pos
+
+		return end
+
+	def accepts_reversed(self, string, end, pos=0):
+		"""
+		Returns the left-most index of the given string which, when the tokens of
+		string[index:end] are consumed from right to left by the DFA, ends on an
+		accepting state. If no such index (no smaller than pos) exists,
+		accepts_reversed returns -1.
+		"""
+
+		tokens = reversed(self._classes.translate(string[pos:end]))
+		start, index = self._accepts(string, [tokens], end, -1, pos)
+		self._consumed += end - index
+
+		return start
+
+	def _accepts(self, string, blocks, index, step, bound=0):
+		# Consumes the given blocks of classes, moving index by step after every
+		# token. Returns the last index at which the DFA was accepting (or -1) and
+		# the index where it stopped.
+
+		classes = self._classes
+		nclasses = classes.nclasses
+
+		cache = self._cache
+		table = cache.table
+		flags = cache.flags
+
+		state = 0
+		found = -1
+		start = index
+
+		for block in blocks:
+			for cls in block:
+				next_state = table[state * nclasses + cls]
+
+				if next_state == UNKNOWN_STATE:
+					old_cache = cache
+					cache, next_state, _ = self._next(cache, state, cls)
+
+					# The cache was flushed, so refresh our view of it.
+					if cache is not old_cache:
+						table = cache.table
+						flags = cache.flags
+
+						# Determinising isn't paying off, just simulate the NFA.
+						if self._thrashing(abs(index - start)):
+							return self._accepts_uncached(string, cache.keys[next_state], index, step, bound, found), index
+
+				index += step
+				flag = flags[next_state]
+
+				if flag:
+					# Landed on an accepting state.
+					if flag & FLAG_ACCEPT:
+						found = index
+
+					# Nothing can be accepted from here.
+					if flag & FLAG_STOP:
+						return found, index
+
+				state = next_state
+
+		return found, index
+
+	def _accepts_uncached(self, string, key, index, step, bound, found):
+		"""
+		Continues matching from the state with the given key (which was reached by
+		consuming the token at the given index) by simulating the NFA program.
+		"""
+
+		classes = self._classes
+
+		if self._program.accepting(key):
+			found = index + step
+
+		if step > 0:
+			end = self._program._run(key, classes.blocks(string, index + 1), index + 1, 1)
+			return max(found, end)
+
+		tokens = reversed(classes.translate(string[bound:index - 1]))
+		start = self._program._run(key, [tokens], index - 1, -1)
+		if start >= 0:
+			found = start
+
+		return found
@@ -8,36 +8,49 @@
 
 import collections
 from . import fsa
+from . import syntax
 
 EPSILON_EDGE = ""
 
-CACHE_MOVE = 0
+# Most edges the epsilon-free form of a graph may have, per edge of the graph
+# itself. Past this, the graph is kept as it is rather than quadratically
+# blowing up (as (ab|cd|...|yz)* would).
+EPSILON_FREE_GROWTH = 4
 
 def _epsilon_closures(states):
 	"""
 	For a given set of NFA node states, return a set that describes the epsilon
-	closure of all of the given states.
+	closure of all of the given states. The closures are found with a single walk
+	over the graph, so nodes shared by the closures are only visited once.
 	"""
 
-	epsilons = set()
+	closure = set(states)
+	todo = [state for state in closure if EPSILON_EDGE in state._edges]
 
-	for state in states:
-		epsilons |= state._epsilon_closure()
+	while todo:
+		for node in todo.pop()._edges[EPSILON_EDGE]:
+			if node not in closure:
+				closure.add(node)
+
+				if EPSILON_EDGE in node._edges:
+					todo.append(node)
 
-	return epsilons
+	return closure
 
 def _moves(states, token):
 	"""
-	For a given set of NFA node states, return a set that describes the states
-	occupied after transitioning across all edges labeled with the given token.
+	For a given set of (epsilon closed) NFA node states, return the (epsilon
+	closed) set of states occupied after transitioning across all edges labeled
+	with the given token. Only the consuming edges of the given states are
+	followed, since their epsilon edges lead to states which are already given.
 	"""
 
 	moved = set()
 
 	for state in states:
-		moved |= state.move(token)
+		moved |= state._step(token)
 
-	return moved
+	return _epsilon_closures(moved)
 
 def _accepts(states):
 	"""
@@ -47,6 +60,381 @@ def _accepts(states):
 
 	return any(state._accept for state in states)
 
+def _reverse(graph, nodes=None):
+	"""
+	Returns a new NFA graph which accepts precisely the reverse of every string
+	accepted by the given NFA graph, by reversing every edge. The new graph starts
+	at every accepting node of the given graph and accepts at its starting node.
+	The nodes of the graph (see NFANode._get_nodes) can be given if they are
+	already known.
+	"""
+
+	if nodes is None:
+		nodes = graph._get_nodes()
+	mirrors = {node: NFANode(tag=node._tag, accept=False) for node in nodes}
+	start = NFANode(tag="reverse_start", accept=False)
+
+	for node in nodes:
+		for label, targets in node._edges.items():
+			for target in targets:
+				mirrors[target].add_edge(label, mirrors[node])
+
+		if node._accept:
+			start.add_edge(EPSILON_EDGE, mirrors[node])
+
+	mirrors[graph]._accept = True
+	return start
+
+def _link(exits, node):
+	# Connects the exits of a fragment to the given node.
+	for last in exits:
+		last.add_edge(EPSILON_EDGE, node)
+
+def _copy(start, exits):
+	"""
+	Returns a copy of the fragment with the given start node and list of exits (as
+	a (start, exits) tuple). Edge labels (including Ranges) are shared with the
+	given fragment, only the nodes and their sets of targets are copied.
+	"""
+
+	nodes = start._get_nodes()
+	copies = {node: NFANode(tag=node._tag, accept=node._accept) for node in nodes}
+
+	for node in nodes:
+		copy = copies[node]
+		copy._edges = {label: {copies[target] for target in targets} for label, targets in node._edges.items()}
+		copy._ranges = list(node._ranges)
+
+	# Exits which can't be reached (such as the end of an empty set) have no edges
+	# yet, so they are copied as they are.
+	for node in exits:
+		if node not in copies:
+			copies[node] = NFANode(tag=node._tag, accept=node._accept)
+
+	return copies[start], [copies[node] for node in exits]
+
+def _repeat(fragment, minimum, maximum):
+	"""
+	Returns the fragment matching between minimum and maximum (or, if maximum is
+	None, any number of) repetitions of the given fragment. Each repetition is a
+	copy of the fragment, chained to the next through its exits. The optional
+	repetitions are nested -- x{0,3} is built as (x(x(x)?)?)? rather than x?x?x?
+	-- so the epsilon closure of any state only reaches one of them.
+	"""
+
+	start = NFANode(tag=("repeat", "start"), accept=False)
+	end = NFANode(tag=("repeat", "end"), accept=False)
+
+	count = minimum
+	if maximum is not None:
+		count = maximum
+	elif not minimum:
+		count = 1
+
+	# Copy the fragment before the original is linked into the chain. The original
+	# is the last repetition.
+	copies = [_copy(*fragment) for _ in range(count - 1)]
+	if count:
+		copies.append(fragment)
+
+	# The nodes which the next repetition follows.
+	exits = [start]
+
+	for index, (first, lasts) in enumerate(copies):
+		_link(exits, first)
+
+		# The remaining repetitions are optional.
+		if index >= minimum:
+			_link(exits, end)
+
+		exits = lasts
+
+	# The last repetition can be repeated any number of times.
+	if maximum is None:
+		first, lasts = copies[-1]
+		_link(lasts, first)
+
+	_link(exits, end)
+	return start, [end]
+
+def _fragment(tree, parts, alphabet):
+	"""
+	Returns the fragment of the given syntax tree node, given the fragments of its
+	children. A fragment is a (start, exits) tuple, where exits is the list of
+	nodes which any path through the fragment ends on. The exits don't have any
+	edges leaving the fragment yet, so fragments are joined by linking the exits
+	of one to the start of the next, without searching either of them.
+	"""
+
+	if isinstance(tree, syntax.Empty):
+		node = NFANode(tag="empty", accept=False)
+		return node, [node]
+
+	if isinstance(tree, syntax.Literal):
+		start = node = NFANode(tag=("literal", "start"), accept=False)
+
+		for token in tree.text:
+			target = NFANode(tag=("literal", token), accept=False)
+			node.add_edge(token, target)
+			node = target
+
+		return start, [node]
+
+	if isinstance(tree, syntax.Set):
+		start = NFANode(tag=("set", "start"), accept=False)
+		end = NFANode(tag=("set", "end"), accept=False)
+
+		tokens = tree.ranges
+
+		# We want the inverse of the given character set.
+		if tree.negated:
+			tokens = alphabet.difference(tokens)
+
+		# Sets of one token are just that token, anything else needs one edge
+		# labelled with the ranges of the set.
+		if tokens.size() == 1:
+			start.add_edge(chr(tokens[0][0]), end)
+		elif tokens:
+			start.add_edge(tokens, end)
+
+		return start, [end]
+
+	if isinstance(tree, syntax.Concat):
+		if not parts:
+			node = NFANode(tag="empty", accept=False)
+			return node, [node]
+
+		start, exits = parts[0]
+
+		# Concatinate fragments.
+		for first, lasts in parts[1:]:
+			_link(exits, first)
+			exits = lasts
+
+		return start, exits
+
+	if isinstance(tree, syntax.Union):
+		start = NFANode(tag=("union", "start"), accept=False)
+		end = NFANode(tag=("union", "end"), accept=False)
+
+		# Add links to every side, and link every side to the new end.
+		for first, lasts in parts:
+			start.add_edge(EPSILON_EDGE, first)
+			_link(lasts, end)
+
+		return start, [end]
+
+	if isinstance(tree, syntax.Repeat):
+		fragment, = parts
+		return _repeat(fragment, tree.minimum, tree.maximum)
+
+	raise NFAException("Cannot build an NFA graph from %r." % (tree,))
+
+def _build(tree, alphabet):
+	"""
+	Builds the NFA graph of the given syntax tree, where the tokens of negated sets
+	are taken from the given alphabet (Ranges). This is Thompson's construction,
+	building the fragment of every node of the tree (in post-order, with an
+	explicit stack so deep trees don't recurse) from the fragments of its
+	children. Each step only touches the exits of the fragments it joins, so
+	building the graph takes linear time.
+	"""
+
+	fragments = []
+	todo = [(tree, False)]
+
+	while todo:
+		node, ready = todo.pop()
+		children = node._children()
+
+		# Build the children first.
+		if children and not ready:
+			todo.append((node, True))
+			todo.extend((child, False) for child in reversed(children))
+			continue
+
+		parts = fragments[len(fragments) - len(children):]
+		del fragments[len(fragments) - len(children):]
+
+		fragments.append(_fragment(node, parts, alphabet))
+
+	start, exits = fragments.pop()
+
+	for node in exits:
+		node._accept = True
+
+	return start
+
+def _encode(graph):
+	"""
+	Relabels every edge of the given NFA graph (which was parsed from a byte pattern
+	decoded as latin-1) with the byte value of its token (or with binary Ranges),
+	so that the graph matches bytes-like strings, whose tokens are ints. Returns
+	the graph.
+	"""
+
+	for node in graph._get_nodes():
+		edges = {}
+
+		for label, targets in node._edges.items():
+			if isinstance(label, fsa.Ranges):
+				label = fsa.Ranges(label, binary=True)
+			elif label != EPSILON_EDGE:
+				label = ord(label)
+
+			edges[label] = targets
+
+		node._edges = edges
+		node._ranges = [label for label in edges if isinstance(label, fsa.Ranges)]
+
+	return graph
+
+def _eliminate_epsilons(graph):
+	"""
+	Returns an NFA graph without epsilon edges which accepts precisely the same
+	strings as the given NFA graph. Only the start of the graph and the targets of
+	its consuming edges can be occupied once epsilon edges are followed, so each
+	of them is replaced by a node with every consuming edge of its epsilon
+	closure (which accepts if any node of its closure does). Simulating the new
+	graph (or determinising it) only ever follows consuming edges, and its sets
+	of states are far smaller.
+
+	If the new graph would be more than EPSILON_FREE_GROWTH times the size of the
+	given graph, the given graph is returned as it is.
+	"""
+
+	nodes = graph._get_nodes()
+	budget = EPSILON_FREE_GROWTH * sum(len(targets) + 1 for node in nodes for targets in node._edges.values())
+
+	kept = {graph: NFANode(tag=graph._tag, accept=False)}
+
+	for node in nodes:
+		for label, targets in node._edges.items():
+			if label == EPSILON_EDGE:
+				continue
+
+			for target in targets:
+				if target not in kept:
+					kept[target] = NFANode(tag=target._tag, accept=False)
+
+	size = 0
+
+	for node, mirror in kept.items():
+		for state in node._epsilon_closure():
+			if state._accept:
+				mirror._accept = True
+
+			for label, targets in state._edges.items():
+				if label == EPSILON_EDGE:
+					continue
+
+				for target in targets:
+					mirror.add_edge(label, kept[target])
+
+				size += len(targets)
+
+		if size > budget:
+			return graph
+
+	return kept[graph]
+
+def _binary(graph):
+	"""
+	Returns whether the given NFA graph matches bytes-like strings (its edges are
+	labelled with byte values). Either every edge which consumes a token is
+	labelled with byte values or none is, so only the first one is checked.
+	"""
+
+	nodes = [graph]
+	seen = {graph}
+
+	for node in nodes:
+		for label, targets in node._edges.items():
+			if label != EPSILON_EDGE:
+				return isinstance(label, int) or getattr(label, "binary", False)
+
+			nodes.extend(targets - seen)
+			seen.update(targets)
+
+	return False
+
+def _classes(graph, nodes=None):
+	"""
+	Partitions the tokens used by the given NFA graph into classes of tokens which
+	the graph cannot tell apart (they label edges from precisely the same nodes to
+	precisely the same nodes), returning the corresponding TokenClasses. Automata
+	built from the graph only need one edge per class rather than per token.
+
+	Edge labels are sets of ranges of ordinals (single tokens are a range of one
+	ordinal), so the alphabet is split at the bounds of every range into disjoint
+	segments, and segments covered by precisely the same edges are in the same
+	class. This only takes time in the number of edges, however many tokens the
+	ranges hold. The nodes of the graph (see NFANode._get_nodes) can be given if
+	they are already known.
+	"""
+
+	if nodes is None:
+		nodes = graph._get_nodes()
+
+	# Each edge adds its (node, targets) to the signature of every token it covers.
+	# Edges are numbered, so signatures are sets of small ints.
+	bounds = collections.defaultdict(list)
+	numbers = {}
+
+	for index, node in enumerate(nodes):
+		for label, targets in node._edges.items():
+			if label == EPSILON_EDGE:
+				continue
+
+			# Most edges have a single target, which doesn't need a frozenset.
+			if len(targets) == 1:
+				target, = targets
+			else:
+				target = frozenset(targets)
+
+			edge = numbers.setdefault((index, target), len(numbers))
+
+			if isinstance(label, fsa.Ranges):
+				ranges = label
+			else:
+				ordinal = fsa._ordinal(label)
+				ranges = [(ordinal, ordinal)]
+
+			for first, last in ranges:
+				bounds[first].append((edge, 1))
+				bounds[last + 1].append((edge, -1))
+
+	# Number the classes by their smallest token, so they are stable.
+	ids = {frozenset(): 0}
+	representatives = [None]
+	starts = []
+	classes = []
+
+	edges = {}
+	binary = _binary(graph)
+
+	for ordinal in sorted(set(bounds) | {0}):
+		for edge, change in bounds[ordinal]:
+			count = edges.get(edge, 0) + change
+
+			if count:
+				edges[edge] = count
+			else:
+				del edges[edge]
+
+		signature = frozenset(edges)
+
+		if signature not in ids:
+			ids[signature] = len(ids)
+			representatives.append(fsa._token(ordinal, binary))
+
+		# Adjacent segments in the same class are merged.
+		if not classes or classes[-1] != ids[signature]:
+			starts.append(ordinal)
+			classes.append(ids[signature])
+
+	return fsa.TokenClasses(starts, classes, representatives)
+
 
 class NFAException(Exception):
 	pass
@@ -63,15 +451,8 @@ class NFANode(fsa.FSANode):
 		self._accept = accept
 		self._edges = {}
 
-		# Used to check for cache invalidation.
-		self._canary = {
-			CACHE_MOVE: {},
-		}
-
-		# The actual cache.
-		self._cache = {
-			CACHE_MOVE: {},
-		}
+		# Labels of the edges which match ranges of tokens.
+		self._ranges = []
 
 	def __repr__(self):
 		return "<NFANode(tag=%r, accept=%r) at 0x%x>" % (self._tag, self._accept, id(self))
@@ -82,59 +463,19 @@ class NFANode(fsa.FSANode):
 		state (as well as including the current state).
 		"""
 
-		# Basically a breadth-first search because it removes the overhead of recursive
-		# calls. But we aren't searching, just storing all nodes found in the path.
-
-		states = {self}
-		todo = collections.deque([self])
-
-		# Still more epsilons to find.
-		while todo:
-			current = todo.pop()
-
-			# Get set of epsilon transitions from current node.
-			epsilons = current._edges.get(EPSILON_EDGE)
-
-			if not epsilons:
-				continue
-
-			# Add all nodes which haven't already been seen to the list of states and
-			# to the list of nodes left to search.
-			for node in epsilons.difference(states):
-				todo.append(node)
-				states.add(node)
-
-		return states
-
-	def move(self, token):
-		"""
-		Return the set of states inhabited after transitioning from the current state
-		along all edges that accept the given token (with epsilon closures).
-		"""
-
-		# Only fetch from cache if no changes since last cache write.
-		if self._canary[CACHE_MOVE].get(token) and token in self._cache[CACHE_MOVE]:
-			return self._cache[CACHE_MOVE][token]
+		return _epsilon_closures({self})
 
-		states = self._move(token)
+	def _step(self, token):
+		# States reached by consuming the given token along the edges of the current
+		# state alone (without any epsilon closures).
+		states = set(self._edges.get(token, ()))
 
-		# Add to cache.
-		self._canary[CACHE_MOVE][token] = True
-		self._cache[CACHE_MOVE][token] = states
+		for label in self._ranges:
+			if token in label:
+				states |= self._edges[label]
 
 		return states
 
-	def _move(self, token):
-		states = set()
-
-		# Get set of states from epsilons which can consume the given token.
-		for state in self._epsilon_closure():
-			states |= state._edges.get(token, set())
-
-		# Get all epsilon closures for the given states.
-		states = _epsilon_closures(states)
-		return states
-
 	def add_edge(self, label, node):
 		"""
 		Adds an edge to the current state. It is an error to try to add an edge to
@@ -149,28 +490,24 @@ class NFANode(fsa.FSANode):
 		if label not in self._edges:
 			self._edges[label] = set()
 
-		# New epsilon edges completely break the move cache, but other edges only
-		# break the cache for that specific label.
-		if label == EPSILON_EDGE:
-			self._canary[CACHE_MOVE] = {}
-		else:
-			self._canary[CACHE_MOVE][label] = False
+			if isinstance(label, fsa.Ranges):
+				self._ranges.append(label)
 
 		# Add edge to given node with given label.
 		self._edges[label].add(node)
 
-	def accepts(self, string):
+	def accepts(self, string, pos=0):
 		"""
 		Returns the right-most index of the given string which, when consumed by the
-		NFA graph, ends on an accepting node. If no such index exists, accepts returns
-		-1.
+		NFA graph (starting from index pos), ends on an accepting node. If no such
+		index exists, accepts returns -1.
 		"""
 
 		states = self._epsilon_closure()
 		end = -1
 
-		for index, token in enumerate(string):
-			next_states = _moves(states, token)
+		for index in range(pos, len(string)):
+			next_states = _moves(states, string[index])
 
 			# Landed on an accepting set of states.
 			if _accepts(next_states):
@@ -184,48 +521,19 @@ class NFANode(fsa.FSANode):
 
 		return end
 
-	def _get_lasts(self, seen=None):
+	def _get_nodes(self):
 		"""
-		This returns all of the accepting nodes in the given NFA graph, starting at
-		the current node.
+		This returns all of the nodes in the given NFA graph, starting at the current
+		node (which is always first).
 		"""
 
-		# Basically a breadth-first search because it removes the overhead of recursive
-		# calls. But we aren't searching, just storing all nodes found in the path.
-
-		lasts = set()
-
+		nodes = [self]
 		seen = {self}
-		todo = collections.deque([self])
-
-		# Still more nodes to find.
-		while todo:
-			current = todo.pop()
 
-			if current._accept:
-				lasts.add(current)
-
-			# Get set of epsilon transitions from current node.
-			for _, nodes in current._edges.items():
-				for node in nodes.difference(seen):
-					todo.append(node)
+		for current in nodes:
+			for _, edges in current._edges.items():
+				for node in edges.difference(seen):
+					nodes.append(node)
 					seen.add(node)
 
-		return lasts
-
-	def patch(self, node, label=EPSILON_EDGE):
-		"""
-		This causes every accepting node in the given NFA graph to be changed to
-		a non-accepting node with an edge with the given label to the given node. This
-		is used when joining two NFA graphs.
-		"""
-
-		lasts = self._get_lasts()
-
-		if not lasts:
-			raise NFAException("Cannot patch an NFA graph with no accepting nodes.")
-
-		# Update all lasts.
-		for last in lasts:
-			last._accept = False
-			last.add_edge(label, node)
+		return nodes
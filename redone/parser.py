@@ -6,16 +6,11 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
-from . import nfa
 from . import constants
-
-T_ELEMENT = "element"
-T_GROUP = "group"
-T_MODIFIER = "modifier"
-T_UNION = "union"
-
-T_START = "start"
-T_END = "end"
+from . import fsa
+from . import nfa
+from . import simplify
+from . import syntax
 
 
 class RegexParseException(Exception):
@@ -27,18 +22,14 @@ class Parser(object):
 	Abstract parser class.
 	"""
 
-	ALPHABET = constants.ALPHABET
 	METACHARS = constants.METACHARS
 	SETMETA = constants.SETMETA
 
-	def __init__(self, tokens, alphabet=None, metachars=None):
+	def __init__(self, tokens, metachars=None):
 		self._tokens = tokens
 		self._pos = 0
 		self._length = len(tokens)
 
-		if alphabet:
-			self.ALPHABET = set(alphabet)
-
 		if metachars:
 			self.METACHARS = set(metachars)
 
@@ -69,541 +60,416 @@ class Parser(object):
 	def parse(self):
 		raise NotImplementedError
 
-class RegexParser(Parser):
-	"""
-	An object used internally within redone in order to parse regular expressions
-	and convert them into the equivalent NFANode graph. This is an implementation
-	of a recursive descent parser which will parse valid regex.
-	"""
-
-	# EBNF for 'redone' extended regex:
-	# <re>        ::= <simple> ( "|" <re> )?
-	# <simple>    ::= <basic>+
-	# <basic>     ::= <elem> ("*" | "+" | "?")?
-	# <elem>      ::= "(" <re> ")"
-	# <elem>      ::= "[" "^"? <set-token>+ "]"
-	# <elem>      ::= "."
-	# <elem>      ::= <token>
-	# <token>     ::= "\" ("^" | "." | "*" | "+" | "?" | "(" | ")" | "[" | "]" | "|" | "\")
-	# <token>     ::= ¬("^" | "." | "*" | "+" | "?" | "(" | ")" | "[" | "]" | "|" | "\")
-	# <set-token> ::= "\" ("[" | "]" | "\")
-	# <set-token> ::= ¬("[" | "]" | "\")
-
-	def __init__(self, *args, **kwargs):
-		super().__init__(*args, **kwargs)
-
-		# Current group "number".
-		self._group_count = 0
-
-	def _parse_set_token(self):
-		# Metacharacter Escapes
-		if self.peek() == "\\":
-			self.next()
-
-			token = self.peek()
-			self.next()
-
-			if token not in self.SETMETA:
-				raise RegexParseException("Invalid escape sequence: %s." % ('\\' + token))
-
-			return token
-
-		elif self.peek() not in self.SETMETA:
-			token = self.peek()
-			self.next()
-
-			return token
-
-	def _parse_token(self):
-		# Metacharacter Escapes
-		if self.peek() == "\\":
-			self.next()
-
-			token = self.peek()
-			self.next()
-
-			if token not in self.METACHARS:
-				raise RegexParseException("Invalid escape sequence: %s." % ('\\' + token))
-
-			return token
-
-		# All other characters.
-		elif self.peek() not in self.METACHARS:
-			token = self.peek()
-			self.next()
-
-			return token
-
-	def _parse_elem(self):
-		start = nfa.NFANode(tag=(T_ELEMENT, T_START), accept=False)
-		end = nfa.NFANode(tag=(T_ELEMENT, T_END), accept=True)
-
-		# Groups
-		if self.peek() == "(":
-			self.next()
-
-			self._group_count += 1
-			grp_count = self._group_count
-
-			graph = self._parse_re()
-
-			if self.peek() != ")":
-				raise RegexParseException("Missing closing ')' in regex group.")
-			self.next()
-
-			# Re-label groups start and end.
-			start._tag = (T_GROUP, T_START, grp_count)
-			end._tag = (T_GROUP, T_END, grp_count)
-
-			# Make graph link with the start and end.
-			start.add_edge(nfa.EPSILON_EDGE, graph)
-			graph.patch(end, label=nfa.EPSILON_EDGE)
-
-		# Sets.
-		elif self.peek() == "[":
-			inverted = False
-			self.next()
-
-			if self.peek() == "^":
-				inverted = True
-				self.next()
-
-			token = self._parse_set_token()
-
-			if token is None:
-				raise RegexParseException("Empty regex set.")
-
-			tokens = {token}
-			while not self.end() and self.peek() != "]":
-				token = self._parse_set_token()
-
-				if token is None:
-					break
-
-				tokens.add(token)
-
-			if self.peek() != "]":
-				raise RegexParseException("Missing closing ']' in regex set.")
-			self.next()
-
-			# We want the inverse of the given character set.
-			# Just XOR with the alphabet.
-			if inverted:
-				tokens = self.ALPHABET ^ tokens
-
-			# Add all given tokens as edges to the end.
-			for token in tokens:
-				start.add_edge(token, end)
-
-		# Wildcard.
-		elif self.peek() == ".":
+	def _parse_number(self):
+		# Special case: leading zero is only the number 0.
+		if self.peek() == "0":
 			self.next()
+			return 0
 
-			for token in self.ALPHABET:
-				start.add_edge(token, end)
-
-		# All other characters.
-		else:
-			token = self._parse_token()
-
-			if token is None:
-				return None
-
-			# Connect start and end with an edge with label=token.
-			start.add_edge(token, end)
-
-		return start
-
-	def _parse_basic(self):
-		node = self._parse_elem()
-
-		if self.peek() in ["*", "+", "?"]:
-			if node is None:
-				raise RegexParseException("Modifier applied to a non-element.")
+		# No digit => not a number.
+		if self.end() or self.peek() not in "0123456789":
+			return None
 
-			modifier = self.peek()
+		out = 0
+		while not self.end() and self.peek() in "0123456789":
+			digit = self.peek()
 			self.next()
 
-			# Set up new start and end nodes.
-			start = nfa.NFANode(tag=(T_MODIFIER, T_START), accept=False)
-			end = nfa.NFANode(tag=(T_MODIFIER, T_END), accept=True)
+			# Shift rest up one place and add digit.
+			out *= 10
+			out += int(digit)
 
-			# Attach element to start and end.
-			start.add_edge(nfa.EPSILON_EDGE, node)
-			node.patch(end, label=nfa.EPSILON_EDGE)
+		return out
 
-			# Kleene Star
-			# Connect the start and end node with epsilon edges (bidirectional).
-			if modifier == "*":
-				start.add_edge(nfa.EPSILON_EDGE, end)
-				end.add_edge(nfa.EPSILON_EDGE, start)
+class _Group(object):
+	"""
+	State of a group (or of the whole pattern) while it is being parsed: the
+	completed sides of its union, and the items of the side being parsed. The
+	last element parsed is kept pending, since a modifier can still apply to it.
+	"""
 
-			# Kleene Plus
-			# Connect the end node to the start node with an epsilon edge.
-			elif modifier == "+":
-				end.add_edge(nfa.EPSILON_EDGE, start)
+	__slots__ = ("sides", "items", "tokens", "pending")
 
-			# Optional
-			# Connect the start node to the end node with an epsilon edge.
-			elif modifier == "?":
-				start.add_edge(nfa.EPSILON_EDGE, end)
+	def __init__(self):
+		self.sides = []
+		self.items = []
+		self.tokens = []
+		self.pending = None
 
-			# Shouldn't ever reach this.
-			else:
-				raise RegexParseException("Unknown modifier.")
+	def _commit(self):
+		tree, self.pending = self.pending, None
 
-			# Update node to point to the start of the modifier.
-			node = start
+		if tree is None:
+			return
 
-		if node is None:
-			return None
+		# Runs of tokens are a single literal.
+		if isinstance(tree, syntax.Literal):
+			self.tokens.append(tree.text)
+			return
 
-		return node
+		self._flush()
+		self.items.append(tree)
 
-	def _parse_simple(self):
-		node = self._parse_basic()
+	def _flush(self):
+		if self.tokens:
+			self.items.append(syntax.Literal("".join(self.tokens)))
+			self.tokens = []
 
-		if node is None:
-			return None
+	def add(self, tree, modifiable=True):
+		"""
+		Adds the given tree to the end of the side being parsed. Only modifiable trees
+		can have a modifier applied to them.
+		"""
 
-		while not self.end():
-			right = self._parse_basic()
+		self._commit()
+		self.pending = tree
 
-			if right is None:
-				break
+		if not modifiable:
+			self._commit()
 
-			# Concatinate nodes.
-			node.patch(right, label=nfa.EPSILON_EDGE)
+	def side(self):
+		"""
+		Finishes the side being parsed, returning its tree (or None if it is empty).
+		"""
 
-		return node
+		self._commit()
+		self._flush()
 
-	def _parse_re(self):
-		node = self._parse_simple()
+		items, self.items = self.items, []
 
-		if node is None:
+		if not items:
 			return None
 
-		if self.peek() == "|":
-			self.next()
-
-			left = node
-			right = self._parse_re()
-
-			if right is None:
-				raise RegexParseException("Union without right side in expression.")
-
-			# Create new starting and accepting nodes.
-			start = nfa.NFANode(tag=(T_UNION, T_START), accept=False)
-			end = nfa.NFANode(tag=(T_UNION, T_END), accept=True)
-
-			# Add links to left and right.
-			start.add_edge(nfa.EPSILON_EDGE, left)
-			start.add_edge(nfa.EPSILON_EDGE, right)
-
-			# Update left and right to point to the new end.
-			left.patch(end, label=nfa.EPSILON_EDGE)
-			right.patch(end, label=nfa.EPSILON_EDGE)
-
-			# Update node to point to the new start node.
-			node = start
+		if len(items) == 1:
+			return items[0]
 
-		return node
-
-	def parse(self):
-		"""
-		Parses a regular expression and produces an NFANode graph that represents that
-		will match text according to the given regex rules.
-		"""
+		return syntax.Concat(*items)
 
-		# Special case -- empty patterns produce a graph which will only match ""
-		if not self._tokens:
-			return nfa.NFANode(tag="empty_graph", accept=True)
 
-		graph = self._parse_re()
+class RegexParser(Parser):
+	"""
+	An object used internally within redone in order to parse regular expressions
+	into the equivalent syntax tree (see redone.syntax), which is then built into
+	an NFANode graph. Rather than recursing into every group (and through every
+	level of the grammar for every element), this parser keeps an explicit stack
+	of the groups which are still open, so huge and deeply nested patterns can be
+	parsed without hitting the recursion limit.
+	"""
 
-		if graph is None:
-			raise RegexParseException("Unknown error occurred.")
+	# EBNF for 'redone' extended regex:
+	# <re>        ::= <simple> ( "|" <simple> )*
+	# <simple>    ::= <basic>+
+	# <basic>     ::= <elem> ("*" | "+" | "?" | <iter>)?
+	# <iter>      ::= "{" <number> ("," <number>?)? "}"
+	# <elem>      ::= "(" <re> ")"
+	# <elem>      ::= "[" "^"? <set-item>+ "]"
+	# <elem>      ::= "."
+	# <elem>      ::= <token>
+	# <token>     ::= "\" ("^" | "." | "*" | "+" | "?" | "(" | ")" | "[" | "]" | "{" | "}" | "|" | "\")
+	# <token>     ::= ¬("^" | "." | "*" | "+" | "?" | "(" | ")" | "[" | "]" | "{" | "}" | "|" | "\")
+	# <set-item>  ::= <set-token> ("-" <set-token>)?
+	# <set-token> ::= "\" ("[" | "]" | "\")
+	# <set-token> ::= ¬("[" | "]" | "\")
 
-		return graph
+	def _parse_escape(self, metachars):
+		# Only metacharacters can be escaped.
+		self.next()
 
+		token = self.peek()
+		self.next()
 
-class SimplifyParser(Parser):
-	"""
-	Parser used to simplify regex expressions to a format which can be understood
-	by the RegexParser.
-	"""
+		if token is None:
+			raise RegexParseException("Missing escaped character in regex.")
 
-	# Repetition types.
-	ITER_SET = 0       # <simple>{<n>}
-	ITER_UNLIMITED = 1 # <simple>{<n>,}
-	ITER_FULL = 2      # <simple>{<n>,<m>}
+		if token not in metachars:
+			raise RegexParseException("Invalid escape sequence: %s." % ('\\' + token))
 
-	# EBNF for Simplify Parser
-	# <re>     ::= <full> ("|" <re>)?
-	# <full>   ::= <basic>+
-	# <basic>  ::= <simple> ("*" | "+" | "?" | <iter>)?
-	# <iter>   ::= "{" <number> ("," <number>?)? "}"
-	# <simple> ::= "(" <re> ")"
-	# <simple> ::= "[" "^"? <set-token>+ "]"
-	# <simple> ::= <token>
+		return token
 
 	def _parse_set_token(self):
-		# Metacharacter escapes.
+		# Metacharacter Escapes
 		if self.peek() == "\\":
-			self.next()
+			return self._parse_escape(self.SETMETA)
 
+		elif not self.end() and self.peek() not in self.SETMETA:
 			token = self.peek()
 			self.next()
 
-			if token not in self.SETMETA:
-				raise RegexParseException("Invalid escape sequence: %s." % ('\\' + token))
+			return token
 
-			return "\\" + token
+	def _parse_set_item(self):
+		first = self._parse_set_token()
 
-		# All other characters.
-		elif self.peek() not in self.SETMETA:
-			token = self.peek()
+		if first is None:
+			return None
+
+		# Range of tokens -- unless the "-" is the last token in the set.
+		if self.peek() == "-" and self._pos + 1 < self._length and self._tokens[self._pos + 1] != "]":
 			self.next()
 
-			return token
+			last = self._parse_set_token()
 
-	def _parse_token(self):
-		# Metacharacter escapes.
-		if self.peek() == "\\":
-			self.next()
+			if last is None or ord(last) < ord(first):
+				raise RegexParseException("Invalid range in regex set.")
 
-			token = self.peek()
-			self.next()
+			return ord(first), ord(last)
 
-			if token not in self.METACHARS:
-				raise RegexParseException("Invalid escape sequence: %s." % ('\\' + token))
+		return ord(first), ord(first)
 
-			return "\\" + token
+	def _parse_token(self):
+		# Metacharacter Escapes
+		if self.peek() == "\\":
+			return self._parse_escape(self.METACHARS)
 
 		# All other characters.
-		elif self.peek() not in self.METACHARS:
+		elif not self.end() and self.peek() not in self.METACHARS:
 			token = self.peek()
 			self.next()
 
 			return token
 
-	def _parse_simple(self):
-		# Groups.
-		if self.peek() == "(":
-			item = self.peek()
-			self.next()
+	def _parse_literal(self):
+		# Runs of tokens which aren't metacharacters are parsed at once.
+		start = end = self._pos
+		while end < self._length and self._tokens[end] not in self.METACHARS:
+			end += 1
 
-			item += self._parse_full()
+		# Modifiers only apply to the last token of the run.
+		if end < self._length and end - start > 1 and self._tokens[end] in ["*", "+", "?", "{"]:
+			end -= 1
 
-			if self.peek() != ")":
-				raise RegexParseException("Missing closing ')' in regex group.")
-			item += self.peek()
-			self.next()
-
-			return item
+		self._pos = end
+		return syntax.Literal("".join(self._tokens[start:end]))
 
+	def _parse_elem(self):
 		# Sets.
-		elif self.peek() == "[":
-			item = self.peek()
+		if self.peek() == "[":
+			inverted = False
 			self.next()
 
 			if self.peek() == "^":
-				item += self.peek()
+				inverted = True
 				self.next()
 
-			token = self._parse_set_token()
+			item = self._parse_set_item()
 
-			if token is None:
+			if item is None:
 				raise RegexParseException("Empty regex set.")
 
-			item += token
+			items = [item]
 			while not self.end() and self.peek() != "]":
-				token = self._parse_set_token()
+				item = self._parse_set_item()
 
-				if token is None:
+				if item is None:
 					break
 
-				item += token
+				items.append(item)
 
 			if self.peek() != "]":
 				raise RegexParseException("Missing closing ']' in regex set.")
-			item += self.peek()
 			self.next()
 
-			return item
+			return syntax.Set(items, negated=inverted)
 
-		# Wildcards.
+		# Wildcard -- the inverse of the empty set.
 		elif self.peek() == ".":
-			item = self.peek()
 			self.next()
 
-			return item
+			return syntax.Set(negated=True)
 
-		# Other.
-		else:
-			token = self._parse_token()
+		# All other characters.
+		token = self._parse_token()
 
-			if token is None:
-				return None
+		if token is None:
+			raise RegexParseException("Trailing characters in regular expression.")
 
-			return token
+		return syntax.Literal(token)
 
-	def _parse_number(self):
-		# Special case: leading zero is only the number 0.
-		if self.peek() == "0":
-			self.next()
-			return 0
+	def _parse_iter(self):
+		# Counted repetition.
+		self.next()
 
-		# No digit => not a number.
-		if self.peek() not in "0123456789":
-			return None
+		minimum = self._parse_number()
+		maximum = minimum
 
-		out = 0
-		while self.peek() in "0123456789":
-			digit = self.peek()
+		if minimum is None:
+			raise RegexParseException("Invalid counted repitition format.")
+
+		# Different form -- {n,} or {n,m}.
+		if self.peek() == ",":
 			self.next()
 
-			# Shift rest up one place and add digit.
-			out *= 10
-			out += int(digit)
+			maximum = self._parse_number()
 
-		return out
+			# Ensure values make sense.
+			if maximum is not None and maximum < minimum:
+				raise RegexParseException("Invalid values for {n,m} counted repetition.")
+
+		if self.peek() != "}":
+			raise RegexParseException("Missing in closing '}' in counted repetition.")
+		self.next()
+
+		return minimum, maximum
+
+	def _parse_modifier(self, tree):
+		modifier = self.peek()
 
-	def _parse_iter(self):
 		# Counted repetition.
-		if self.peek() == "{":
-			self.next()
+		if modifier == "{":
+			minimum, maximum = self._parse_iter()
+			return syntax.Repeat(tree, minimum, maximum)
 
-			_type = None
-			n = self._parse_number()
-			m = None
+		self.next()
 
-			if n is not None:
-				_type = self.ITER_SET
+		# Kleene Star
+		if modifier == "*":
+			return syntax.Repeat(tree, 0)
 
-			# Different form -- {n,m}.
-			if self.peek() == ",":
-				self.next()
+		# Kleene Plus
+		elif modifier == "+":
+			return syntax.Repeat(tree, 1)
 
-				m = self._parse_number()
+		# Optional
+		return syntax.Repeat(tree, 0, 1)
 
-				if n is not None:
-					_type = self.ITER_FULL
+	def _finish(self, group, empty):
+		# Returns the tree of a group which has been completely parsed.
+		side = group.side()
 
-				if m is None:
-					_type = self.ITER_UNLIMITED
+		if side is None:
+			if group.sides:
+				raise RegexParseException("Union without right side in expression.")
 
-				# Ensure values make sense.
-				if _type == self.ITER_FULL and m < n:
-					raise RegexParseException("Invalid values for {n,m} counted repetition.")
+			raise RegexParseException(empty)
 
-			if _type is None:
-				raise RegexParseException("Invalid counted repitition format.")
+		sides = group.sides + [side]
 
-			if self.peek() != "}":
-				raise RegexParseException("Missing in closing '}' in counted repetition.")
-			self.next()
+		if len(sides) == 1:
+			return side
 
-			# Give the type data and {min,max} data.
-			return (_type, n or 0, m or 0)
+		return syntax.Union(*sides)
 
-	def _parse_basic(self):
-		item = self._parse_simple()
+	def parse(self):
+		"""
+		Parses a regular expression and produces the syntax tree of the pattern.
+		"""
 
-		if item is None:
-			return None
+		# Special case -- empty patterns only match "".
+		if not self._tokens:
+			return syntax.Empty()
 
-		# Standard modifiers.
-		if self.peek() in ["*", "+", "?"]:
-			item += self.peek()
-			self.next()
+		# The groups which are still open, innermost last.
+		groups = [_Group()]
 
-			return item
+		while not self.end():
+			group = groups[-1]
+			token = self.peek()
 
-		_iter = self._parse_iter()
+			# Groups
+			if token == "(":
+				self.next()
+				groups.append(_Group())
 
-		if _iter is None:
-			return item
+			elif token == ")":
+				if len(groups) == 1:
+					raise RegexParseException("Trailing characters in regular expression.")
+				self.next()
 
-		repeat = ""
-		_type, n, m = _iter
+				tree = self._finish(groups.pop(), "Empty regex group.")
+				groups[-1].add(tree)
 
-		# Repeat "minimum".
-		for _ in range(n):
-			repeat += item
+			# Unions
+			elif token == "|":
+				self.next()
 
-		# No limit -- just add plus.
-		if _type == self.ITER_UNLIMITED:
-			return repeat + "+"
+				side = group.side()
 
-		# Repeat "optional" maximum.
-		for _ in range(m - n):
-			repeat += item + "?"
+				if side is None:
+					if not group.sides:
+						raise RegexParseException("Union without left side in expression.")
 
-		return repeat
+					raise RegexParseException("Union without right side in expression.")
 
-	def _parse_re(self):
-		basics = self._parse_basic()
+				group.sides.append(side)
 
-		if basics is None:
-			return None
+			# Modifiers only apply to the element right before them.
+			elif token in ["*", "+", "?", "{"]:
+				if group.pending is None:
+					raise RegexParseException("Modifier applied to a non-element.")
 
-		# Get basics.
-		while not self.end():
-			basic = self._parse_basic()
+				tree, group.pending = group.pending, None
+				group.add(self._parse_modifier(tree), modifiable=False)
 
-			if basic is None:
-				break
+			elif token not in self.METACHARS:
+				group.add(self._parse_literal())
 
-			basics += basic
+			else:
+				group.add(self._parse_elem())
 
-		return basics
+		if len(groups) > 1:
+			raise RegexParseException("Missing closing ')' in regex group.")
 
-	def _parse_full(self):
-		item = self._parse_re()
+		return self._finish(groups[0], "Unknown error occurred.")
 
-		# Unions.
-		if self.peek() == "|":
-			item += self.peek()
-			self.next()
+def _binary(pattern):
+	"""
+	Returns whether the given pattern is a byte pattern (bytes, bytearray or
+	memoryview) rather than a text pattern (str or syntax tree). Anything else
+	isn't a pattern at all, and raises a TypeError.
+	"""
 
-			right = self._parse_full()
-			if right is None:
-				raise RegexParseException("Union without right side in expression.")
+	if isinstance(pattern, (str, syntax.Node)):
+		return False
 
-			item += right
+	if isinstance(pattern, (bytes, bytearray, memoryview)):
+		return True
 
-		return item
+	raise TypeError("Cannot use %r as a regex pattern." % (pattern,))
 
-	def parse(self):
-		"""
-		Parses a regular expression and produces a "simplified" version which can be
-		understood by RegexParser.
-		"""
+def parse(pattern):
+	"""
+	Parses the given pattern into its syntax tree (see redone.syntax). Byte
+	patterns are parsed as text with one character per byte.
+	"""
 
-		if not self._tokens:
-			return ""
+	if _binary(pattern):
+		pattern = str(pattern, "latin-1")
 
-		pattern = self._parse_full()
+	return RegexParser(pattern).parse()
 
-		if pattern is None:
-			raise RegexParseException("Unknown error occurred when simplifying regular expression.")
+def _tree(pattern):
+	"""
+	Returns the simplified (see redone.simplify) syntax tree of the given pattern
+	or syntax tree.
+	"""
 
-		# Pattern *must* be consumed.
-		if not self.end():
-			raise RegexParseException("Trailing characters in regular expression.")
+	if isinstance(pattern, syntax.Node):
+		return simplify.simplify(pattern)
 
-		return pattern
+	return simplify.simplify(parse(pattern))
 
-def _parse(pattern):
+def _build(tree, binary=False):
 	"""
-	Compile a given pattern into an NFA which represents the pattern's state
-	machine. The return statement is an NFANode graph which will match according
-	to the pattern's rules. The pattern is first "simplified" in order to all for
-	pre-parse checks and optimisations to patterns.
+	Builds the NFA graph of the given simplified syntax tree, eliminating the
+	epsilon edges of the graph after.
 	"""
 
-	pattern = SimplifyParser(list(pattern)).parse()
-	tokens = list(pattern)
+	if not binary:
+		graph = nfa._build(tree, fsa.Ranges(constants.ALPHABET))
+		return nfa._eliminate_epsilons(graph)
+
+	# Byte patterns are parsed as text with one character per byte, and the edges
+	# of the graph are then relabelled with the byte values.
+	graph = nfa._build(tree, fsa.Ranges(constants.BYTE_ALPHABET))
+	return nfa._eliminate_epsilons(nfa._encode(graph))
+
+def _parse(pattern):
+	"""
+	Compile a given pattern (or syntax tree) into an NFA which represents the
+	pattern's state machine. The return statement is an NFANode graph which will
+	match according to the pattern's rules. The syntax tree is simplified (see
+	redone.simplify) before it is built, and the epsilon edges of the graph are
+	eliminated after.
+	"""
 
-	return RegexParser(tokens).parse()
+	return _build(_tree(pattern), _binary(pattern))
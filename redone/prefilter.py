@@ -0,0 +1,432 @@
+#!/usr/bin/env python3
+# redone: A correct regex implementation in Python
+# Copyright (C) 2014 Aleksa Sarai
+
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import collections
+import difflib
+
+from . import fsa
+from . import nfa
+from . import syntax
+
+# Longest literal prefix (or required literal) extracted from a pattern.
+MAX_PREFIX = 256
+
+# Most required literals tracked for each node while analysing a pattern.
+MAX_REQUIRED = 4
+
+# Largest set of first tokens extracted from a pattern.
+MAX_PREFIXES = 1 << 12
+
+# Longest prefix in a set of literal prefixes. Longer prefixes hardly skip more
+# of the string.
+MAX_PREFIXES_LENGTH = 16
+
+# Largest set of first tokens (or literal prefixes) which is still worth scanning
+# for. Every prefix in the set needs its own pass over the string, so large sets
+# are slower than just running the automaton.
+MAX_FIRST_TOKENS = 4
+
+
+def _empty(graph):
+	# Literals of byte patterns are bytes.
+	if nfa._binary(graph):
+		return b""
+
+	return ""
+
+
+def _literal(token):
+	# Tokens of byte patterns are ints.
+	if isinstance(token, int):
+		return bytes((token,))
+
+	return token
+
+
+def _width(label):
+	# Number of tokens matched by an edge label.
+	if isinstance(label, fsa.Ranges):
+		return label.size()
+
+	return 1
+
+
+def _tokens(label):
+	# Tokens matched by a (non-epsilon) edge label.
+	if isinstance(label, fsa.Ranges):
+		return label.tokens()
+
+	return (label,)
+
+
+def _first_tokens(states):
+	"""
+	Returns the set of tokens which label an edge out of the given set of (epsilon
+	closed) NFA node states, or None if there are more than MAX_PREFIXES of them
+	(since edges labelled with ranges of tokens can match all of Unicode).
+	"""
+
+	labels = set()
+
+	for state in states:
+		labels.update(label for label in state._edges if label != nfa.EPSILON_EDGE)
+
+	if sum(_width(label) for label in labels) > MAX_PREFIXES:
+		return None
+
+	tokens = set()
+
+	for label in labels:
+		tokens.update(_tokens(label))
+
+	return tokens
+
+
+def _transitions(states):
+	"""
+	Returns a mapping from each token labelling an edge out of the given set of
+	(epsilon closed) NFA node states to the (epsilon closed) set of states
+	occupied after transitioning across it. This is nfa._moves for every token
+	at once, without re-computing the closures of the given states.
+	"""
+
+	targets = collections.defaultdict(set)
+
+	for state in states:
+		for label, nodes in state._edges.items():
+			if label != nfa.EPSILON_EDGE:
+				for token in _tokens(label):
+					targets[token].update(nodes)
+
+	return {token: nfa._epsilon_closures(nodes) for token, nodes in targets.items()}
+
+
+def literal_prefix(graph):
+	"""
+	Returns the longest literal string which every non-empty match of the given NFA
+	graph must start with (which may be empty).
+	"""
+
+	prefix = _empty(graph)
+	states = graph._epsilon_closure()
+
+	while len(prefix) < MAX_PREFIX:
+		tokens = _first_tokens(states)
+
+		if tokens is None or len(tokens) != 1:
+			break
+
+		token = tokens.pop()
+		prefix += _literal(token)
+		states = nfa._moves(states, token)
+
+		# A match could end here, so the prefix can't be extended.
+		if not states or nfa._accepts(states):
+			break
+
+	return prefix
+
+
+def first_tokens(graph):
+	"""
+	Returns the set of tokens which every non-empty match of the given NFA graph
+	must start with, or None if there are too many of them.
+	"""
+
+	return _first_tokens(graph._epsilon_closure())
+
+
+def literal_prefixes(graph, limit):
+	"""
+	Returns a tuple of at most limit literal strings such that every non-empty
+	match of the given NFA graph starts with one of them. Prefixes are extended
+	until a match could end, until they are MAX_PREFIXES_LENGTH long or until
+	extending them would give more than limit of them. If there would be more
+	than limit prefixes of a single token, or some match could start with an
+	empty prefix, returns an empty tuple.
+	"""
+
+	branches = [(_empty(graph), graph._epsilon_closure())]
+	prefixes = []
+
+	while branches:
+		extended = []
+
+		for prefix, states in branches:
+			tokens = _first_tokens(states)
+
+			# A match could end here, so the prefix can't be extended.
+			if (prefix and nfa._accepts(states)) or not tokens or len(prefix) >= MAX_PREFIXES_LENGTH:
+				prefixes.append(prefix)
+			else:
+				extended.append((prefix, states, tokens))
+
+		# Too many prefixes, so stop at the current ones.
+		if len(prefixes) + sum(len(tokens) for _, _, tokens in extended) > limit:
+			prefixes.extend(prefix for prefix, _, _ in extended)
+			break
+
+		branches = [(prefix + _literal(token), next_states) for prefix, states, _ in extended for token, next_states in _transitions(states).items()]
+
+	if not all(prefixes):
+		return ()
+
+	return tuple(sorted(set(prefixes)))
+
+
+def union_words(tree, binary=False):
+	"""
+	Returns the set of words matched by the given (unsimplified) syntax tree, if it
+	is a literal or a union of literals (such as "foo|bar|baz"). Otherwise,
+	returns None. The words are read off the tree rather than enumerated from an
+	automaton, so there can be any number of them. Words of byte patterns are
+	bytes.
+	"""
+
+	words = set()
+	todo = [tree]
+
+	while todo:
+		node = todo.pop()
+
+		if isinstance(node, syntax.Union):
+			todo.extend(node.items)
+		elif isinstance(node, syntax.Literal):
+			words.add(node.text)
+		else:
+			return None
+
+	# Byte patterns are parsed as text with one character per byte.
+	if binary:
+		return frozenset(word.encode("latin-1") for word in words)
+
+	return frozenset(words)
+
+
+def _common_suffix(first, second):
+	size = 0
+
+	while size < min(len(first), len(second)) and first[-size - 1] == second[-size - 1]:
+		size += 1
+
+	return first[len(first) - size:]
+
+
+def _common_substring(first, second):
+	# Literals are usually parts of the same paths, so one of them often contains
+	# the other (which is far cheaper to check than finding the longest match).
+	shorter, longer = sorted((first, second), key=len)
+
+	if shorter in longer:
+		return shorter
+
+	matcher = difflib.SequenceMatcher(None, first, second, autojunk=False)
+	match = matcher.find_longest_match(0, len(first), 0, len(second))
+
+	return first[match.a:match.a + match.size]
+
+
+def _reduce(literals):
+	# Drop literals implied by longer ones, keeping the longest literals.
+	literals = sorted(set(literals), key=lambda literal: (-len(literal), literal))
+	kept = []
+
+	for literal in literals:
+		if literal and not any(literal in other for other in kept):
+			kept.append(literal)
+
+	return tuple(kept[:MAX_REQUIRED])
+
+
+def _meet(first, second):
+	"""
+	Combines the analyses of two sets of paths, giving the analysis of their
+	union. Any literal common to a required literal of each set is required by
+	every path in the union.
+	"""
+
+	if first is None:
+		return second
+
+	suffix = _common_suffix(first[0], second[0])
+	literals = [_common_substring(one, other) for one in first[1] for other in second[1]]
+
+	return suffix, _reduce(literals)
+
+
+def required_literals(graph):
+	"""
+	Returns a tuple of literal strings which must all appear in every non-empty
+	match of the given NFA graph (which may be empty). This is a data-flow
+	analysis computing, for every node, the longest suffix and a few literals
+	common to every path from the start of the graph to that node.
+	"""
+
+	# Keys are (node, consumed), so that paths which haven't consumed any tokens
+	# (and thus only give empty matches) are kept separate.
+	start = (graph, False)
+	analyses = {start: (_empty(graph), ())}
+	todo = collections.deque([start])
+
+	while todo:
+		key = todo.popleft()
+		node, consumed = key
+		suffix, literals = analyses[key]
+
+		for label, targets in node._edges.items():
+			if label == nfa.EPSILON_EDGE:
+				analysis = suffix, literals
+				next_consumed = consumed
+			elif isinstance(label, fsa.Ranges):
+				# No literal spans an edge matching several tokens.
+				analysis = suffix[:0], _reduce(literals + (suffix,))
+				next_consumed = True
+			else:
+				next_suffix = (suffix + _literal(label))[-MAX_PREFIX:]
+				analysis = next_suffix, _reduce(literals + (next_suffix,))
+				next_consumed = True
+
+			for target in targets:
+				next_key = (target, next_consumed)
+				old = analyses.get(next_key)
+				new = _meet(old, analysis)
+
+				if new != old:
+					analyses[next_key] = new
+					todo.append(next_key)
+
+	result = None
+
+	for (node, consumed), analysis in analyses.items():
+		if consumed and node._accept:
+			result = _meet(result, analysis)
+
+	if result is None:
+		return ()
+
+	return result[1]
+
+
+def common_literals(words):
+	"""
+	Returns a tuple of a literal string which appears in every one of the given
+	words (or an empty tuple if there is no such literal), as required_literals
+	does for the union of the words.
+	"""
+
+	words = sorted(words, key=lambda word: (len(word), word))
+	common = words[0]
+
+	for word in words[1:]:
+		common = _common_substring(common, word)
+
+		if not common:
+			return ()
+
+	return (common,)
+
+
+class LiteralPrefilter(object):
+	"""
+	Finds the indices where a match could start by searching for a literal prefix
+	which every match starts with.
+	"""
+
+	def __init__(self, prefix):
+		self._prefix = prefix
+
+	def __repr__(self):
+		return "<LiteralPrefilter(%r)>" % (self._prefix,)
+
+	def scanner(self, string):
+		"""
+		Returns a function which, given an index of the given string, returns the
+		first index at or after it where a match could start (or -1 if there is no
+		such index). Returns None if the string cannot be scanned.
+		"""
+
+		# Memory views can't be searched without copying them.
+		if isinstance(string, memoryview):
+			return None
+
+		prefix = self._prefix
+		candidate = string.find(prefix)
+
+		def scan(pos):
+			nonlocal candidate
+
+			# Only search again once we've gone past the last candidate.
+			if 0 <= candidate < pos:
+				candidate = string.find(prefix, pos)
+
+			return candidate
+
+		return scan
+
+
+class SetPrefilter(object):
+	"""
+	Finds the indices where a match could start by searching for the (small) set of
+	tokens (or longer literal prefixes) which every match starts with.
+	"""
+
+	def __init__(self, tokens):
+		self._tokens = frozenset(tokens)
+
+	def __repr__(self):
+		return "<SetPrefilter(%r)>" % (sorted(self._tokens),)
+
+	def scanner(self, string):
+		"""
+		Returns a function which, given an index of the given string, returns the
+		first index at or after it where a match could start (or -1 if there is no
+		such index). Returns None if the string cannot be scanned.
+		"""
+
+		# Memory views can't be searched without copying them.
+		if isinstance(string, memoryview):
+			return None
+
+		# The next occurrence of each token, so that each token's occurrences are
+		# only searched for once over the whole string.
+		candidates = {token: string.find(token) for token in self._tokens}
+
+		def scan(pos):
+			found = -1
+
+			for token, candidate in candidates.items():
+				if 0 <= candidate < pos:
+					candidate = candidates[token] = string.find(token, pos)
+
+				if candidate >= 0 and (found < 0 or candidate < found):
+					found = candidate
+
+			return found
+
+		return scan
+
+
+def prefilter(graph):
+	"""
+	Returns a prefilter which can skip over the parts of a string where no match
+	of the given NFA graph can start, or None if no useful prefilter exists.
+	"""
+
+	prefix = literal_prefix(graph)
+
+	if len(prefix) > 1:
+		return LiteralPrefilter(prefix)
+
+	# Every match starts with one of a few tokens -- or better still, one of a few
+	# longer prefixes (which are rarer).
+	prefixes = literal_prefixes(graph, MAX_FIRST_TOKENS)
+
+	if prefixes:
+		return SetPrefilter(prefixes)
+
+	return None
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+# redone: A correct regex implementation in Python
+# Copyright (C) 2014 Aleksa Sarai
+
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import bisect
+
+from . import fsa
+from . import nfa
+
+
+class _SparseSet(object):
+	"""
+	Set of the states of a Program, which can be cleared (and have states added to
+	it) in constant time without allocating anything -- Briggs and Torczon's
+	sparse set. The states in the set are dense[:size], in the order they were
+	added, and a state is in the set if and only if dense[sparse[state]] is that
+	state (whatever garbage the rest of the arrays hold).
+	"""
+
+	__slots__ = ("dense", "sparse", "size")
+
+	def __init__(self, capacity):
+		self.dense = [0] * capacity
+		self.sparse = [0] * capacity
+		self.size = 0
+
+
+class Program(fsa.FSA):
+	"""
+	A frozen NFA, compiled from an NFANode graph into flat arrays of integers.
+	States are numbered in the order of graph._get_nodes() (so the start of the
+	graph is 0), and the edges of each state are the slice
+	[edge_first[state], edge_first[state + 1]) of the parallel edge_classes and
+	edge_targets arrays, sorted by the TokenClasses class they consume. Any
+	epsilon edges left in the graph (see nfa._eliminate_epsilons) are stored the
+	same way.
+
+	The program is simulated with a pair of preallocated sparse sets, so
+	matching allocates nothing per token, and holds no cyclic graph of nodes
+	(which is both smaller and cheaper for the garbage collector). Sets of
+	states are given to (and returned by) step as frozensets of integers, so
+	they can be the keys of the states of lazily determinised automata.
+	"""
+
+	__slots__ = ("classes", "start", "_accept", "_edge_first", "_edge_classes", "_edge_targets", "_epsilon_first", "_epsilon_targets", "_scratch")
+
+	def __init__(self, graph, classes=None, nodes=None):
+		if not isinstance(graph, nfa.NFANode):
+			raise TypeError("Invalid graph type for an NFA program.")
+
+		if nodes is None:
+			nodes = graph._get_nodes()
+
+		if classes is None:
+			classes = nfa._classes(graph, nodes)
+
+		states = {node: state for state, node in enumerate(nodes)}
+
+		self.classes = classes
+		self._accept = bytearray(node._accept for node in nodes)
+
+		self._edge_first = [0]
+		self._edge_classes = []
+		self._edge_targets = []
+
+		self._epsilon_first = [0]
+		self._epsilon_targets = []
+
+		for node in nodes:
+			edges = set()
+
+			for label, targets in node._edges.items():
+				targets = [states[target] for target in targets]
+
+				if label == nfa.EPSILON_EDGE:
+					self._epsilon_targets.extend(sorted(targets))
+					continue
+
+				for cls in classes.label_classes(label):
+					edges.update((cls, target) for target in targets)
+
+			for cls, target in sorted(edges):
+				self._edge_classes.append(cls)
+				self._edge_targets.append(target)
+
+			self._edge_first.append(len(self._edge_classes))
+			self._epsilon_first.append(len(self._epsilon_targets))
+
+		# Spare pairs of sparse sets, so simulations don't allocate their own (and
+		# concurrent simulations don't share them).
+		self._scratch = []
+
+		current, following = self._take()
+		self._load(following, [0])
+		self.start = frozenset(following.dense[:following.size])
+		self._give(current, following)
+
+	def __repr__(self):
+		return "<Program(states=%d, edges=%d) at 0x%x>" % (len(self._accept), len(self._edge_targets), id(self))
+
+	def _take(self):
+		try:
+			return self._scratch.pop()
+		except IndexError:
+			return _SparseSet(len(self._accept)), _SparseSet(len(self._accept))
+
+	def _give(self, current, following):
+		self._scratch.append((current, following))
+
+	def _close(self, states, start):
+		"""
+		Adds the epsilon closures of the states of the given sparse set from index
+		start onwards to it, returning whether any state added to the set accepts.
+		The dense array of the set doubles as the work list.
+		"""
+
+		dense = states.dense
+		sparse = states.sparse
+		size = states.size
+
+		accept = self._accept
+		epsilon_first = self._epsilon_first
+		epsilon_targets = self._epsilon_targets
+
+		accepted = False
+		index = start
+
+		while index < size:
+			state = dense[index]
+			index += 1
+
+			if accept[state]:
+				accepted = True
+
+			for edge in range(epsilon_first[state], epsilon_first[state + 1]):
+				target = epsilon_targets[edge]
+				slot = sparse[target]
+
+				if slot < size and dense[slot] == target:
+					continue
+
+				sparse[target] = size
+				dense[size] = target
+				size += 1
+
+		states.size = size
+		return accepted
+
+	def _load(self, states, source):
+		# Fills the given sparse set with the epsilon closure of the given states.
+		dense = states.dense
+		sparse = states.sparse
+		size = 0
+
+		for state in source:
+			slot = sparse[state]
+
+			if slot < size and dense[slot] == state:
+				continue
+
+			sparse[state] = size
+			dense[size] = state
+			size += 1
+
+		states.size = size
+		self._close(states, 0)
+
+	def _advance(self, current, following, cls):
+		"""
+		Fills the following sparse set with the (epsilon closed) states occupied after
+		consuming a token of the given class from the (epsilon closed) states of the
+		current sparse set. Returns whether any of the following states accepts.
+		"""
+
+		dense = following.dense
+		sparse = following.sparse
+		size = 0
+
+		edge_first = self._edge_first
+		edge_classes = self._edge_classes
+		edge_targets = self._edge_targets
+
+		source = current.dense
+
+		for index in range(current.size):
+			state = source[index]
+			last = edge_first[state + 1]
+			edge = bisect.bisect_left(edge_classes, cls, edge_first[state], last)
+
+			while edge < last and edge_classes[edge] == cls:
+				target = edge_targets[edge]
+				edge += 1
+
+				slot = sparse[target]
+				if slot < size and dense[slot] == target:
+					continue
+
+				sparse[target] = size
+				dense[size] = target
+				size += 1
+
+		following.size = size
+		return self._close(following, 0)
+
+	def step(self, states, cls):
+		"""
+		Returns the (epsilon closed) frozenset of states occupied after consuming a
+		token of the given class from the given (epsilon closed) set of states.
+		"""
+
+		current, following = self._take()
+
+		self._load(current, states)
+		self._advance(current, following, cls)
+		result = frozenset(following.dense[:following.size])
+
+		self._give(current, following)
+		return result
+
+	def accepting(self, states):
+		"""
+		Returns whether any of the given states accepts.
+		"""
+
+		accept = self._accept
+		return any(accept[state] for state in states)
+
+	def _run(self, states, blocks, index, step):
+		"""
+		Simulates the program from the given set of (epsilon closed) states,
+		consuming the given blocks of classes and moving index by step after every
+		token. Returns the last index at which the simulation was in an accepting
+		set of states, or -1 if there is no such index.
+		"""
+
+		current, following = self._take()
+		self._load(current, states)
+
+		found = -1
+
+		try:
+			for block in blocks:
+				for cls in block:
+					accepted = self._advance(current, following, cls)
+					index += step
+
+					# Landed on an accepting set of states.
+					if accepted:
+						found = index
+
+					# If there are no next states, we cannot proceed further.
+					if not following.size:
+						return found
+
+					current, following = following, current
+
+			return found
+		finally:
+			self._give(current, following)
+
+	def accepts(self, string, pos=0):
+		"""
+		Returns the right-most index of the given string which, when consumed by the
+		program (starting from index pos), ends on an accepting state. If no such
+		index exists, accepts returns -1.
+		"""
+
+		return self._run(self.start, self.classes.blocks(string, pos), pos, 1)
+
+	def accepts_reversed(self, string, end, pos=0):
+		"""
+		Returns the left-most index of the given string which, when the tokens of
+		string[index:end] are consumed from right to left by the program, ends on an
+		accepting state. If no such index (no smaller than pos) exists,
+		accepts_reversed returns -1.
+		"""
+
+		tokens = reversed(self.classes.translate(string[pos:end]))
+		return self._run(self.start, [tokens], end, -1)
@@ -7,6 +7,8 @@
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
 from . import fsa
+from . import stream
+from . import unanchored
 import types
 
 def is_callable(obj):
@@ -35,17 +37,66 @@ class RegexMatcher(object):
 	finite state automata.
 	"""
 
-	def __init__(self, graph):
-		if not issubclass(type(graph), fsa.FSANode):
+	def __init__(self, graph, reverse=None, prefilter=None, required=(), binary=False, engine=None):
+		if not isinstance(graph, fsa.FSA):
 			raise ValueError("Cannot use non-automata node graph as matcher graph.")
 
+		if reverse is not None and not isinstance(reverse, fsa.FSA):
+			raise ValueError("Cannot use non-automata node graph as reverse matcher graph.")
+
 		self._graph = graph
+		self._reverse = reverse
+		self._prefilter = prefilter
+		self._required = tuple(required)
+		self._binary = binary
+		self._search = None
+
+		# The engine which was picked to match the pattern.
+		self.engine = engine
+
+	def _searcher(self):
+		# Only build the searcher if the matcher is actually used to search.
+		if self._search is None:
+			self._search = unanchored.searcher(self._graph, reverse=self._reverse, prefilter=self._prefilter)
+
+		return self._search
+
+	def _check(self, string):
+		"""
+		Ensures that the given string can be matched by the pattern (byte patterns
+		only match bytes-like strings, and text patterns only match text), returning
+		the string to match. Memory views are viewed as unsigned bytes.
+		"""
+
+		if isinstance(string, str) == self._binary:
+			if self._binary:
+				raise TypeError("Cannot use a byte pattern on a text string.")
+
+			raise TypeError("Cannot use a text pattern on a bytes-like string.")
+
+		if isinstance(string, memoryview) and string.format != "B":
+			string = string.cast("B")
+
+		return string
+
+	def _rejects(self, string):
+		# Memory views can't be searched for literals without copying them.
+		if isinstance(string, memoryview):
+			return False
+
+		# Strings missing any literal required by every match cannot match.
+		return any(literal not in string for literal in self._required)
 
 	def match(self, string):
 		"""
 		Wraps the internal structure's matching methods.
 		"""
 
+		string = self._check(string)
+
+		if self._rejects(string):
+			return None
+
 		end = self._graph.accepts(string)
 
 		# No match.
@@ -59,6 +110,11 @@ class RegexMatcher(object):
 		Wraps the internal structure's full matching methods.
 		"""
 
+		string = self._check(string)
+
+		if self._rejects(string):
+			return None
+
 		end = self._graph.accepts(string)
 
 		# Incomplete match.
@@ -72,66 +128,94 @@ class RegexMatcher(object):
 		Wraps the internal structure's searching methods.
 		"""
 
-		start = delta = -1
+		string = self._check(string)
 
-		while delta < 0 and len(string) > start:
-			start += 1
-			delta = self._graph.accepts(string[start:])
+		if self._rejects(string):
+			return None
 
-		if delta < 0:
+		span = self._searcher().search(string)
+
+		if span is None:
 			return None
 
-		return RegexMatch(string, start, start + delta)
+		start, end = span
+		return RegexMatch(string, start, end)
 
 	def finditer(self, string):
 		"""
 		Wraps the internal structure's finditer methods.
 		"""
 
-		start = -1
+		string = self._check(string)
+
+		if self._rejects(string):
+			return
 
-		while start < len(string):
-			delta = -1
+		for start, end in self._searcher().finditer(string):
+			yield RegexMatch(string, start, end)
 
-			while delta < 0:
-				start += 1
+	def findall(self, string):
+		"""
+		Wraps the internal structure's findall methods.
+		"""
 
-				if start >= len(string):
-					break
+		return list(self.finditer(string))
 
-				delta = self._graph.accepts(string[start:])
+	def scan_file(self, path, encoding="utf-8", chunk_size=stream.CHUNK_SIZE):
+		"""
+		Yields the (line, start, end) of every match in the file at the given path,
+		which is memory mapped and decoded in chunks rather than read into a string.
+		Indices are of the decoded text, and lines are numbered from 1. Byte
+		patterns match the bytes of the file, which aren't decoded at all.
+		"""
 
-			if delta < 0:
-				break
+		if self._binary:
+			encoding = None
 
-			yield RegexMatch(string, start, start + delta)
-			start += delta - 1
+		return stream.scan_file(self._graph, path, encoding, chunk_size)
 
-	def findall(self, string):
+	def finditer_file(self, path, encoding="utf-8", chunk_size=stream.CHUNK_SIZE):
 		"""
-		Wraps the internal structure's findall methods.
+		Yields the (start, end) indices of every match in the file at the given path,
+		which is memory mapped and decoded in chunks rather than read into a string.
 		"""
 
-		return list(self.finditer(string))
+		for _, start, end in self.scan_file(path, encoding, chunk_size):
+			yield start, end
+
+	def stream(self):
+		"""
+		Returns a StreamMatcher which finds the matches in an input which is fed to it
+		in pieces, rather than all at once.
+		"""
+
+		return stream.StreamMatcher(self._graph, binary=self._binary)
 
 	def sub(self, replace, string):
 		"""
 		Wraps the internal structure's substitution methods.
 		"""
 
+		string = self._check(string)
+
 		last = 0
-		out = ""
+		out = []
 
 		repl = replace
 		for match in self.finditer(string):
-			out += string[last:match._start]
+			out.append(string[last:match._start])
 
 			# Callable replaces based on match.
 			if is_callable(replace):
 				repl = replace(match)
 
-			out += repl
+			out.append(repl)
 			last = match._end
 
-		out += string[last:]
-		return out
+		out.append(string[last:])
+
+		# Substituting into any bytes-like string gives bytes.
+		if self._binary:
+			return b"".join(out)
+
+		return "".join(out)
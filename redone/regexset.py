@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# redone: A correct regex implementation in Python
+# Copyright (C) 2014 Aleksa Sarai
+
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+from . import lazy
+from . import nfa
+from . import parser
+from . import program
+
+
+class RegexSet(lazy.LazyAutomaton):
+	"""
+	Matches a string against many regular expressions at once, reporting which of
+	them have a (non-empty) match anywhere in the string from a single scan over
+	it. The NFA graphs of the patterns are joined under one start node and
+	compiled into a single Program, and every accepting state is tagged with the
+	indices of its patterns. The union is then determinised lazily (since the DFA
+	of hundreds of patterns would be huge) with the start state injected at every
+	index of the string, and each state of the DFA records the indices of the
+	patterns whose accepting states it holds.
+	"""
+
+	def __init__(self, patterns, max_states=lazy.DEFAULT_MAX_STATES):
+		self.patterns = list(patterns)
+
+		# Byte patterns only match bytes-like strings, and text patterns only match
+		# text, so a set can't have both.
+		kinds = {parser._binary(pattern) for pattern in self.patterns}
+
+		if len(kinds) > 1:
+			raise TypeError("Cannot mix text and byte patterns in a regex set.")
+
+		self._binary = True in kinds
+
+		graph = nfa.NFANode(tag="regex_set", accept=False)
+		lasts = {}
+
+		for index, pattern in enumerate(self.patterns):
+			subgraph = parser._parse(pattern)
+			graph.add_edge(nfa.EPSILON_EDGE, subgraph)
+
+			for node in subgraph._get_nodes():
+				if node._accept:
+					lasts.setdefault(node, set()).add(index)
+
+		self._program = program.Program(graph)
+
+		# The program numbers its states in the order of the nodes of the graph.
+		self._ids = {}
+		for state, node in enumerate(graph._get_nodes()):
+			if node in lasts:
+				self._ids[state] = frozenset(lasts[node])
+
+		super().__init__(self._program.classes, frozenset(), max_states)
+
+	def __len__(self):
+		return len(self.patterns)
+
+	def _matched(self, key):
+		# Indices of the patterns accepted by the given state (None if there are none).
+		ids = set()
+
+		for state in key:
+			ids.update(self._ids.get(state, ()))
+
+		return frozenset(ids) or None
+
+	def _transition(self, key, cls):
+		# Class 0 tokens aren't used by any pattern at all.
+		if not cls:
+			return frozenset(), None
+
+		# Start a new match at this index, as well as continuing the current ones.
+		next_key = self._program.step(key | self._program.start, cls)
+		return next_key, self._matched(next_key)
+
+	def _accepting(self, key):
+		return self._matched(key) is not None
+
+	def _stopping(self, key):
+		# New matches can start at any index.
+		return False
+
+	def matches(self, string):
+		"""
+		Returns the set of indices of the patterns which match (a non-empty substring
+		of) the given string.
+		"""
+
+		if isinstance(string, str) == self._binary:
+			if self._binary:
+				raise TypeError("Cannot use a set of byte patterns on a text string.")
+
+			raise TypeError("Cannot use a set of text patterns on a bytes-like string.")
+
+		if isinstance(string, memoryview) and string.format != "B":
+			string = string.cast("B")
+
+		classes = self._classes
+		nclasses = classes.nclasses
+
+		cache = self._cache
+		table = cache.table
+		data = cache.data
+
+		found = set()
+		state = 0
+		index = 0
+
+		for block in classes.blocks(string):
+			for cls in block:
+				transition = state * nclasses + cls
+				next_state = table[transition]
+				ids = data[transition]
+
+				if next_state == lazy.UNKNOWN_STATE:
+					old_cache = cache
+					cache, next_state, ids = self._next(cache, state, cls)
+
+					# The cache was flushed, so refresh our view of it.
+					if cache is not old_cache:
+						table = cache.table
+						data = cache.data
+
+						# Determinising isn't paying off, so stop caching.
+						if self._thrashing(index):
+							self._consumed += index
+							return self._matches_uncached(string, index, cache.keys[next_state], found | (ids or set()))
+
+				index += 1
+
+				if ids:
+					found |= ids
+
+					# Every pattern has matched, nothing left to find.
+					if len(found) == len(self.patterns):
+						self._consumed += index
+						return found
+
+				state = next_state
+
+		self._consumed += index
+		return found
+
+	def _matches_uncached(self, string, index, key, found):
+		"""
+		Continues a scan which has just transitioned into the state with the given
+		key (across the token at the given index), computing every transition from
+		then on without caching it.
+		"""
+
+		for token in string[index + 1:]:
+			if len(found) == len(self.patterns):
+				break
+
+			cls = self._classes.token_class(token)
+			key, ids = self._transition(key, cls)
+
+			if ids:
+				found |= ids
+
+		return found
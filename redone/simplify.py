@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+# redone: A correct regex implementation in Python
+# Copyright (C) 2014 Aleksa Sarai
+
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import collections
+import os
+
+from . import fsa
+from . import syntax
+
+# Deepest nesting of unions created by factoring the common prefixes (or
+# suffixes) out of the sides of a union.
+MAX_FACTOR_DEPTH = 32
+
+
+def _fuse(inner, outer):
+	"""
+	Returns the (minimum, maximum) of the repetition equivalent to repeating x
+	inner times, outer times -- x{a,b}{c,d} -- or None if there is no such
+	repetition. Repeating x{a,b} k times repeats x between k*a and k*b times, so
+	the repetitions only fuse if those ranges leave no gaps for every k in [c,d].
+	A maximum of None is unbounded.
+	"""
+
+	a, b = inner
+	c, d = outer
+
+	# Only one k, so there can't be any gaps.
+	if c == d:
+		return a * c, None if b is None else b * d
+
+	# Gap between repeating x{a,b} zero times and once.
+	if c == 0 and a > 1:
+		return None
+
+	# Gap between repeating x{a,b} k and k+1 times (the gap only shrinks as k grows).
+	if b is not None and max(c, 1) * (b - a) < a - 1:
+		return None
+
+	return a * c, None if b is None or d is None else b * d
+
+
+def _repeat(item, minimum, maximum):
+	# Simplified tree of Repeat(item, minimum, maximum).
+	if maximum == 0 or isinstance(item, syntax.Empty):
+		return syntax.Empty()
+
+	if minimum == maximum == 1:
+		return item
+
+	# Nested repetitions, such as (x*)* or (x+a+)+, are a single repetition.
+	if isinstance(item, syntax.Repeat):
+		fused = _fuse((item.minimum, item.maximum), (minimum, maximum))
+
+		if fused is not None:
+			return _repeat(item.item, *fused)
+
+	return syntax.Repeat(item, minimum, maximum)
+
+
+def _add(first, second):
+	# Sum of two maximums of repetitions, where None is unbounded.
+	if first is None or second is None:
+		return None
+
+	return first + second
+
+
+def _count(item):
+	# The item repeated by a tree, with the bounds of the repetition.
+	if isinstance(item, syntax.Repeat):
+		return item.item, item.minimum, item.maximum
+
+	return item, 1, 1
+
+
+def _join(first, second):
+	"""
+	Returns the list of items equivalent to the given two adjacent items of a
+	concatenation, joining repetitions of the same item (x x* is x+, and x{a,b}
+	x{c,d} is x{a+c,b+d}).
+	"""
+
+	# The tokens at the edges of literals can be joined too (aa*b is a+b).
+	if isinstance(first, syntax.Literal) and isinstance(second, syntax.Repeat) and second.item == syntax.Literal(first.text[-1]):
+		text = first.text
+		while text and second.item == syntax.Literal(text[-1]):
+			second = _repeat(second.item, second.minimum + 1, _add(second.maximum, 1))
+			text = text[:-1]
+
+		if not text:
+			return [second]
+
+		return [syntax.Literal(text), second]
+
+	if isinstance(first, syntax.Repeat) and isinstance(second, syntax.Literal) and first.item == syntax.Literal(second.text[0]):
+		text = second.text
+		while text and first.item == syntax.Literal(text[0]):
+			first = _repeat(first.item, first.minimum + 1, _add(first.maximum, 1))
+			text = text[1:]
+
+		if not text:
+			return [first]
+
+		return [first, syntax.Literal(text)]
+
+	item, a, b = _count(first)
+	other, c, d = _count(second)
+
+	if (isinstance(first, syntax.Repeat) or isinstance(second, syntax.Repeat)) and item == other:
+		joined = _repeat(item, a + c, _add(b, d))
+		return [] if isinstance(joined, syntax.Empty) else [joined]
+
+	return [first, second]
+
+
+def _concat(items):
+	# Simplified tree of Concat(*items), where the items are already simplified.
+	flat = []
+
+	for item in items:
+		if isinstance(item, syntax.Concat):
+			flat.extend(item.items)
+		elif not isinstance(item, syntax.Empty):
+			flat.append(item)
+
+	joined = []
+
+	for item in flat:
+		if not joined:
+			joined.append(item)
+		elif isinstance(joined[-1], syntax.Literal) and isinstance(item, syntax.Literal):
+			joined[-1] = syntax.Literal(joined[-1].text + item.text)
+		else:
+			joined.extend(_join(joined.pop(), item))
+
+	if not joined:
+		return syntax.Empty()
+
+	if len(joined) == 1:
+		return joined[0]
+
+	return syntax.Concat(*joined)
+
+
+def _head(item):
+	# The literal text which every match of the item starts with.
+	if isinstance(item, syntax.Concat):
+		item = item.items[0]
+
+	if isinstance(item, syntax.Literal):
+		return item.text
+
+	return ""
+
+
+def _tail(item):
+	# The literal text which every match of the item ends with.
+	if isinstance(item, syntax.Concat):
+		item = item.items[-1]
+
+	if isinstance(item, syntax.Literal):
+		return item.text
+
+	return ""
+
+
+def _strip_head(item, size):
+	# The item without the first size tokens of its head.
+	items = list(item.items) if isinstance(item, syntax.Concat) else [item]
+	text = items[0].text[size:]
+
+	items[0] = syntax.Literal(text) if text else syntax.Empty()
+	return _concat(items)
+
+
+def _strip_tail(item, size):
+	# The item without the last size tokens of its tail.
+	items = list(item.items) if isinstance(item, syntax.Concat) else [item]
+	text = items[-1].text[:len(items[-1].text) - size]
+
+	items[-1] = syntax.Literal(text) if text else syntax.Empty()
+	return _concat(items)
+
+
+def _factor(items, depth, suffix=False):
+	"""
+	Factors the common literal prefixes (or suffixes) out of the given sides of a
+	union, so (abc|abd|x) becomes (ab(c|d)|x). Sides are grouped by their first
+	(or last) token, and the longest prefix (or suffix) common to each group is
+	factored out of it. The sides which are left form a new union (which is then
+	factored in turn).
+	"""
+
+	groups = collections.OrderedDict()
+
+	for index, item in enumerate(items):
+		text = _tail(item)[-1:] if suffix else _head(item)[:1]
+
+		# Sides without a literal prefix can't be grouped.
+		groups.setdefault(text or index, []).append(item)
+
+	if len(groups) == len(items):
+		return items
+
+	factored = []
+
+	for group in groups.values():
+		if len(group) == 1:
+			factored.extend(group)
+			continue
+
+		if suffix:
+			texts = [_tail(item)[::-1] for item in group]
+			common = os.path.commonprefix(texts)[::-1]
+			rest = _union([_strip_tail(item, len(common)) for item in group], depth + 1)
+
+			factored.append(_concat([rest, syntax.Literal(common)]))
+
+		else:
+			texts = [_head(item) for item in group]
+			common = os.path.commonprefix(texts)
+			rest = _union([_strip_head(item, len(common)) for item in group], depth + 1)
+
+			factored.append(_concat([syntax.Literal(common), rest]))
+
+	return factored
+
+
+def _merge_sets(items):
+	"""
+	Merges the sides of a union which match a single token into one set (in the
+	place of the first of them), so (a|b|[xy]) becomes [abxy].
+	"""
+
+	singles = [item for item in items if isinstance(item, syntax.Set) or (isinstance(item, syntax.Literal) and len(item.text) == 1)]
+
+	if len(singles) < 2:
+		return items
+
+	ranges = fsa.Ranges()
+	excluded = None
+
+	for item in singles:
+		if isinstance(item, syntax.Literal):
+			ranges = fsa.Ranges(ranges + fsa.Ranges.from_tokens(item.text))
+		elif not item.negated:
+			ranges = fsa.Ranges(ranges + item.ranges)
+
+		# The union of negated sets is the negation of the intersection of their ranges.
+		elif excluded is None:
+			excluded = item.ranges
+		else:
+			excluded = excluded.difference(excluded.difference(item.ranges))
+
+	merged = syntax.Set(ranges)
+
+	if excluded is not None:
+		merged = syntax.Set(excluded.difference(ranges), negated=True)
+
+	merged_ids = {id(item) for item in singles}
+	first = items.index(singles[0])
+	rest = [item for item in items[first:] if id(item) not in merged_ids]
+
+	return items[:first] + [merged] + rest
+
+
+def _union(items, depth=0):
+	# Simplified tree of Union(*items), where the items are already simplified.
+	flat = []
+
+	for item in items:
+		if isinstance(item, syntax.Union):
+			flat.extend(item.items)
+		else:
+			flat.append(item)
+
+	# Drop repeated sides, keeping the first of them.
+	flat = list(collections.OrderedDict.fromkeys(flat))
+
+	if depth < MAX_FACTOR_DEPTH:
+		flat = _factor(flat, depth)
+		flat = _factor(flat, depth, suffix=True)
+
+	flat = _merge_sets(flat)
+
+	# Sides which only match "" make the rest of the union optional.
+	empty = syntax.Empty()
+	optional = empty in flat
+
+	flat = [item for item in flat if item != empty]
+
+	if not flat:
+		return empty
+
+	tree = flat[0] if len(flat) == 1 else syntax.Union(*flat)
+
+	if optional:
+		return _repeat(tree, 0, 1)
+
+	return tree
+
+
+def _simplify(tree, children):
+	# Simplified tree of the given node, given its simplified children.
+	if isinstance(tree, syntax.Concat):
+		return _concat(children)
+
+	if isinstance(tree, syntax.Union):
+		return _union(children)
+
+	if isinstance(tree, syntax.Repeat):
+		child, = children
+		return _repeat(child, tree.minimum, tree.maximum)
+
+	return tree
+
+
+def simplify(tree):
+	"""
+	Returns a simpler syntax tree which matches precisely the same strings as the
+	given syntax tree. Nested repetitions are fused ((x*)* is x*, and (x+x+)+ is
+	x{2,}), adjacent literals and repetitions of the same item are joined, and
+	the sides of unions are deduplicated, have their common literal prefixes and
+	suffixes factored out and are merged into a set if they match single tokens.
+	Smaller trees give smaller NFA graphs, with fewer epsilon cycles, which are
+	cheaper to simulate and to determinise.
+	"""
+
+	simplified = []
+	todo = [(tree, False)]
+
+	# Simplify the children of every node before the node itself (without
+	# recursing, so deep trees don't hit the recursion limit).
+	while todo:
+		node, ready = todo.pop()
+		children = node._children()
+
+		if children and not ready:
+			todo.append((node, True))
+			todo.extend((child, False) for child in reversed(children))
+			continue
+
+		parts = simplified[len(simplified) - len(children):]
+		del simplified[len(simplified) - len(children):]
+
+		simplified.append(_simplify(node, parts))
+
+	return simplified.pop()
@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+# redone: A correct regex implementation in Python
+# Copyright (C) 2014 Aleksa Sarai
+
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import codecs
+import mmap
+import os
+
+from . import ahocorasick
+from . import lazy
+from . import unanchored
+
+# Number of bytes of a mapped file decoded and fed to a stream at a time.
+CHUNK_SIZE = 1 << 16
+
+
+class _SearcherScan(object):
+	"""
+	Resumable left-to-right scan of a Searcher, which keeps the state of the
+	searcher (and the start index of every thread) between pieces of the input.
+	"""
+
+	def __init__(self, searcher):
+		self._searcher = searcher
+		self.reset()
+
+	def reset(self):
+		self._key = self._searcher._start_key
+		self._starts = []
+		self.found = None
+
+	def prepare(self, text):
+		"""
+		Returns the sequence of tokens of the given text which is given to resume.
+		"""
+
+		return memoryview(self._searcher._classes.translate(text))
+
+	def resume(self, tokens, offset, pos, final):
+		"""
+		Continues the scan over tokens[pos:], where the tokens start at index offset
+		of the input. Returns the (start, end) indices of the left-most longest match
+		if it can no longer change (which resets the scan), otherwise returns None.
+		Once the final piece of the input has been scanned, any match found so far
+		is returned.
+		"""
+
+		searcher = self._searcher
+		nclasses = searcher._classes.nclasses
+
+		cache, state = searcher._lookup(self._key)
+		table = cache.table
+		data = cache.data
+		flags = cache.flags
+
+		starts = self._starts
+		found = self.found
+		index = offset + pos
+
+		for cls in tokens[pos:]:
+			transition = state * nclasses + cls
+			next_state = table[transition]
+			kept = data[transition]
+
+			if next_state == lazy.UNKNOWN_STATE:
+				old_cache = cache
+				cache, next_state, kept = searcher._next(cache, state, cls)
+
+				# The cache was flushed, so refresh our view of it.
+				if cache is not old_cache:
+					table = cache.table
+					data = cache.data
+					flags = cache.flags
+
+			# Update the start indices of the threads.
+			if kept is not None:
+				starts.append(index)
+				starts = [starts[thread] for thread in kept]
+
+			index += 1
+			flag = flags[next_state]
+
+			if flag:
+				# The last thread just accepted.
+				if flag & lazy.FLAG_ACCEPT:
+					found = (starts[-1], index)
+
+				# The match cannot be extended any further.
+				if flag & lazy.FLAG_STOP:
+					self.reset()
+					return found
+
+			state = next_state
+
+		if final:
+			self.reset()
+			return found
+
+		self._key = cache.keys[state]
+		self._starts = starts
+		self.found = found
+
+		return None
+
+	def pending(self, index):
+		"""
+		Returns the left-most index where a match still in progress (once the input
+		has been scanned up to the given index) could start.
+		"""
+
+		starts = list(self._starts)
+
+		if self.found is not None:
+			starts.append(self.found[0])
+
+		return min(starts, default=index)
+
+
+class _LiteralScan(object):
+	"""
+	Resumable left-to-right scan of an AhoCorasick automaton, which keeps the
+	state of the automaton between pieces of the input.
+	"""
+
+	def __init__(self, graph):
+		self._graph = graph
+		self.reset()
+
+	def reset(self):
+		self._state = ahocorasick.ROOT_STATE
+		self.found = None
+
+	def prepare(self, text):
+		"""
+		Returns the sequence of tokens of the given text which is given to resume.
+		"""
+
+		return text
+
+	def resume(self, tokens, offset, pos, final):
+		"""
+		Continues the scan over tokens[pos:], where the tokens start at index offset
+		of the input. Returns the (start, end) indices of the left-most longest match
+		if it can no longer change (which resets the scan), otherwise returns None.
+		Once the final piece of the input has been scanned, any match found so far
+		is returned.
+		"""
+
+		goto = self._graph._goto
+		fail = self._graph._fail
+		longest = self._graph._longest
+		maxlen = self._graph._maxlen
+
+		state = self._state
+		found = self.found
+
+		for position in range(pos, len(tokens)):
+			token = tokens[position]
+
+			while state != ahocorasick.ROOT_STATE and token not in goto[state]:
+				state = fail[state]
+
+			state = goto[state].get(token, ahocorasick.ROOT_STATE)
+			index = offset + position + 1
+			size = longest[state]
+
+			# The longest literal ending here starts further left than any other.
+			if size and (found is None or index - size <= found[0]):
+				found = (index - size, index)
+
+			# Nothing which starts at (or before) the match can end this far right.
+			if found is not None and index >= found[0] + maxlen:
+				self.reset()
+				return found
+
+		if final:
+			self.reset()
+			return found
+
+		self._state = state
+		self.found = found
+
+		return None
+
+	def pending(self, index):
+		"""
+		Returns the left-most index where a match still in progress (once the input
+		has been scanned up to the given index) could start.
+		"""
+
+		start = index
+
+		# The literal being matched is no longer than the longest literal.
+		if self._state != ahocorasick.ROOT_STATE:
+			start = index - self._graph._maxlen + 1
+
+		if self.found is not None:
+			start = min(start, self.found[0])
+
+		return start
+
+
+class StreamMatcher(object):
+	"""
+	Finds every non-overlapping left-most longest match in an input which is fed to
+	the matcher in pieces (for instance, chunks read from a socket or file). The
+	state of the automaton is kept between pieces, so matches can span several
+	pieces. Only the input after the end of a match which could still be extended
+	is kept in memory, so memory use is bounded by the longest match in progress
+	rather than by the size of the input. Matches are given as (start, end)
+	indices of the whole input. Streams of byte patterns are fed bytes-like
+	pieces rather than text.
+	"""
+
+	def __init__(self, graph, binary=False):
+		searcher = unanchored.searcher(graph)
+
+		if isinstance(searcher, unanchored.Searcher):
+			self._scan = _SearcherScan(searcher)
+		elif isinstance(searcher, ahocorasick.AhoCorasick):
+			self._scan = _LiteralScan(searcher)
+		else:
+			raise TypeError("Cannot stream matches of automaton %r." % (graph,))
+
+		# The unmatched input kept in memory, which starts at index offset of the
+		# input and has been scanned up to index scanned of the buffer.
+		self._buffer = b"" if binary else ""
+		self._offset = 0
+		self._scanned = 0
+		self._finished = False
+
+	def feed(self, chunk):
+		"""
+		Feeds the next piece of the input to the matcher, returning a list of the
+		(start, end) indices of every match which has been completed.
+		"""
+
+		if self._finished:
+			raise ValueError("Cannot feed a finished stream.")
+
+		self._buffer += chunk
+		return self._run(final=False)
+
+	def finish(self):
+		"""
+		Marks the end of the input, returning a list of the (start, end) indices of
+		every remaining match.
+		"""
+
+		if self._finished:
+			raise ValueError("Cannot finish a finished stream.")
+
+		spans = self._run(final=True)
+
+		self._finished = True
+		self._buffer = self._buffer[:0]
+
+		return spans
+
+	def _pending(self):
+		# Left-most index where a later match could start.
+		return min(self._offset, self._scan.pending(self._offset + len(self._buffer)))
+
+	def _run(self, final):
+		spans = []
+		tokens = self._scan.prepare(self._buffer)
+
+		while self._scanned < len(self._buffer) or final:
+			found = self._scan.resume(tokens, self._offset, self._scanned, final)
+
+			if found is None:
+				break
+
+			spans.append(found)
+
+			# Search again from the end of the match.
+			_, end = found
+			self._scanned = end - self._offset
+
+			if self._scanned >= len(self._buffer):
+				break
+
+		# Everything before the end of a match in progress can be dropped, since the
+		# next search will start there.
+		if self._scan.found is not None:
+			_, keep = self._scan.found
+		else:
+			keep = self._offset + len(self._buffer)
+
+		self._buffer = self._buffer[keep - self._offset:]
+		self._scanned = len(self._buffer)
+		self._offset = keep
+
+		return spans
+
+
+def _mapped_chunks(path, encoding, chunk_size):
+	"""
+	Yields the decoded text of the file at the given path in pieces, decoding the
+	file through a read-only memory map one chunk of bytes at a time (so only one
+	chunk of the file is ever copied out of the page cache at once). If encoding
+	is None, the chunks of bytes are yielded as they are.
+	"""
+
+	with open(path, "rb") as file:
+		# Empty files can't be mapped.
+		if not os.fstat(file.fileno()).st_size:
+			return
+
+		with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+			if encoding is None:
+				for index in range(0, len(mapped), chunk_size):
+					yield mapped[index:index + chunk_size]
+
+				return
+
+			decoder = codecs.getincrementaldecoder(encoding)()
+
+			for index in range(0, len(mapped), chunk_size):
+				yield decoder.decode(mapped[index:index + chunk_size])
+
+			yield decoder.decode(b"", final=True)
+
+
+def scan_file(graph, path, encoding="utf-8", chunk_size=CHUNK_SIZE):
+	"""
+	Yields the (line, start, end) of every non-overlapping left-most longest match
+	of the given automaton in the file at the given path, where start and end are
+	indices of the decoded text of the whole file and line is the (1-based)
+	number of the line the match starts on. The file is streamed through a memory
+	map rather than being read into memory. If encoding is None, the bytes of
+	the file are matched without decoding them (for byte patterns).
+	"""
+
+	binary = encoding is None
+	matcher = StreamMatcher(graph, binary=binary)
+
+	# The decoded text which may still contain the start of a match, which starts
+	# at index base of the file. Newlines before index counted are in line.
+	text = b"" if binary else ""
+	newline = b"\n" if binary else "\n"
+	base = 0
+	counted = 0
+	line = 1
+
+	def _lines(spans):
+		nonlocal counted, line
+
+		for start, end in spans:
+			line += text.count(newline, counted - base, start - base)
+			counted = start
+
+			yield line, start, end
+
+	for chunk in _mapped_chunks(path, encoding, chunk_size):
+		text += chunk
+		yield from _lines(matcher.feed(chunk))
+
+		# Later matches can't start before any match in progress (or before the
+		# matches which were just found).
+		keep = max(counted, matcher._pending())
+		line += text.count(newline, counted - base, keep - base)
+		text = text[keep - base:]
+		base = counted = keep
+
+	yield from _lines(matcher.finish())
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# redone: A correct regex implementation in Python
+# Copyright (C) 2014 Aleksa Sarai
+
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+from . import constants
+from . import fsa
+
+
+class Node(object):
+	"""
+	Base class for the nodes of a syntax tree, which describes a pattern without
+	any of the syntax of its text. Patterns are parsed into syntax trees before
+	being built into automata, and trees can also be built directly (and given
+	to redone.compile and friends in place of a pattern), so generated patterns
+	don't need to be escaped and parsed. Trees are immutable and hashable, so
+	they can be cached like any other pattern.
+	"""
+
+	__slots__ = ("_hash",)
+
+	def _key(self):
+		# Tuple of the fields of the node, which describes the node completely.
+		raise NotImplementedError
+
+	def _children(self):
+		return ()
+
+	def _freeze(self):
+		# The hash of a node only depends on the (already computed) hashes of its
+		# children, so hashing deep trees doesn't recurse.
+		self._hash = hash((type(self), self._key()))
+
+	def __hash__(self):
+		return self._hash
+
+	def __eq__(self, other):
+		# Compare the trees iteratively, so deep trees don't recurse.
+		todo = [(self, other)]
+
+		while todo:
+			first, second = todo.pop()
+
+			if first is second:
+				continue
+
+			if type(first) is not type(second) or hash(first) != hash(second):
+				return False
+
+			first_children = first._children()
+			second_children = second._children()
+
+			if len(first_children) != len(second_children):
+				return False
+
+			# The fields which aren't children must be equal.
+			if first._key()[len(first_children):] != second._key()[len(second_children):]:
+				return False
+
+			todo.extend(zip(first_children, second_children))
+
+		return True
+
+	def __ne__(self, other):
+		return not self == other
+
+	def __repr__(self):
+		return "%s(%s)" % (type(self).__name__, ", ".join(repr(field) for field in self._key()))
+
+
+def _check(item):
+	if not isinstance(item, Node):
+		raise TypeError("Cannot use %r as a node of a syntax tree." % (item,))
+
+	return item
+
+
+class Empty(Node):
+	"""
+	Matches only the empty string.
+	"""
+
+	__slots__ = ()
+
+	def __init__(self):
+		self._freeze()
+
+	def _key(self):
+		return ()
+
+
+class Literal(Node):
+	"""
+	Matches the given (non-empty) text exactly.
+	"""
+
+	__slots__ = ("text",)
+
+	def __init__(self, text):
+		if not isinstance(text, str) or not text:
+			raise ValueError("Literals must be non-empty text.")
+
+		self.text = text
+		self._freeze()
+
+	def _key(self):
+		return (self.text,)
+
+
+class Set(Node):
+	"""
+	Matches any one token in the given ranges or, if negated, any one token not in
+	them (so the negated empty set matches any token, like "."). Each item of
+	ranges is either a token or an inclusive (first, last) pair of tokens, so
+	Set("aeiou") and Set([("a", "z")]) are both valid.
+	"""
+
+	__slots__ = ("ranges", "negated")
+
+	def __init__(self, ranges=(), negated=False):
+		items = []
+		_, maximum = constants.ALPHABET[0]
+
+		for item in ranges:
+			first, last = (item, item) if isinstance(item, str) else item
+			first, last = fsa._ordinal(first), fsa._ordinal(last)
+
+			if not 0 <= first <= last <= maximum:
+				raise ValueError("Invalid range %r in a set." % (item,))
+
+			items.append((first, last))
+
+		self.ranges = fsa.Ranges(items)
+		self.negated = bool(negated)
+		self._freeze()
+
+	def _key(self):
+		return (self.ranges, self.negated)
+
+
+class Concat(Node):
+	"""
+	Matches each of the given items, one after the other.
+	"""
+
+	__slots__ = ("items",)
+
+	def __init__(self, *items):
+		self.items = tuple(_check(item) for item in items)
+		self._freeze()
+
+	def _key(self):
+		return self.items
+
+	def _children(self):
+		return self.items
+
+
+class Union(Node):
+	"""
+	Matches any one of the given (one or more) items.
+	"""
+
+	__slots__ = ("items",)
+
+	def __init__(self, *items):
+		if not items:
+			raise ValueError("Unions must have at least one item.")
+
+		self.items = tuple(_check(item) for item in items)
+		self._freeze()
+
+	def _key(self):
+		return self.items
+
+	def _children(self):
+		return self.items
+
+
+class Repeat(Node):
+	"""
+	Matches between minimum and maximum (or, if maximum is None, any number of)
+	repetitions of the given item. The modifiers "*", "+" and "?" are
+	Repeat(item, 0), Repeat(item, 1) and Repeat(item, 0, 1).
+	"""
+
+	__slots__ = ("item", "minimum", "maximum")
+
+	def __init__(self, item, minimum=0, maximum=None):
+		if minimum < 0 or (maximum is not None and maximum < minimum):
+			raise ValueError("Invalid values for {%r,%r} counted repetition." % (minimum, maximum))
+
+		self.item = _check(item)
+		self.minimum = minimum
+		self.maximum = maximum
+		self._freeze()
+
+	def _key(self):
+		return (self.item, self.minimum, self.maximum)
+
+	def _children(self):
+		return (self.item,)
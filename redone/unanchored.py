@@ -0,0 +1,442 @@
+#!/usr/bin/env python3
+# redone: A correct regex implementation in Python
+# Copyright (C) 2014 Aleksa Sarai
+
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import itertools
+
+from . import ahocorasick
+from . import bitparallel
+from . import dfa
+from . import fsa
+from . import lazy
+from . import nfa
+from . import program
+
+# Every candidate found by a prefilter stops the automaton and restarts it, which
+# costs more than running the automaton over a few tokens. Once a prefilter has
+# found MIN_CANDIDATES candidates, it is turned off for the rest of the search
+# unless it skipped an average of at least MIN_SKIP tokens per candidate.
+MIN_CANDIDATES = 16
+MIN_SKIP = 16
+
+
+class _TableView(object):
+	"""
+	Describes a DFATable as an anchored DFA for a Searcher.
+	"""
+
+	def __init__(self, table):
+		self._graph = table
+		self.classes = table._classes
+		self.start = table._start
+		self.dead = dfa.SINK_STATE
+
+	def step(self, key, cls):
+		return self._graph._table[key * self.classes.nclasses + cls]
+
+	def accepting(self, key):
+		return bool(self._graph._accept[key])
+
+
+class _NFAView(object):
+	"""
+	Describes an NFA program (see redone.program) as an anchored DFA (whose states
+	are sets of program states) for a Searcher.
+	"""
+
+	def __init__(self, graph):
+		self._program = graph
+		self.classes = graph.classes
+		self.start = graph.start
+		self.dead = frozenset()
+
+	def step(self, key, cls):
+		# Class 0 tokens aren't used by the graph at all.
+		if not cls:
+			return self.dead
+
+		return self._program.step(key, cls)
+
+	def accepting(self, key):
+		return self._program.accepting(key)
+
+
+class _BitView(object):
+	"""
+	Describes a BitParallel automaton as an anchored DFA (whose states are sets of
+	positions) for a Searcher.
+	"""
+
+	def __init__(self, graph):
+		self._graph = graph
+		self.classes = graph.classes
+		self.start = graph.start
+		self.dead = 0
+
+	def step(self, key, cls):
+		return self._graph.step(key, cls)
+
+	def accepting(self, key):
+		return self._graph.accepting(key)
+
+
+class _LazyView(_NFAView):
+	"""
+	Describes a LazyDFA as an anchored DFA for a Searcher, re-using the states the
+	LazyDFA has already determinised.
+	"""
+
+	def __init__(self, graph):
+		self._graph = graph
+		self._program = graph._program
+		self.classes = graph._classes
+		self.start = graph._start_key
+		self.dead = frozenset()
+
+	def step(self, key, cls):
+		cache = self._graph._cache
+		state = cache.ids.get(key)
+
+		if state is None:
+			return super().step(key, cls)
+
+		next_state = cache.table[state * self.classes.nclasses + cls]
+		if next_state == lazy.UNKNOWN_STATE:
+			cache, next_state, _ = self._graph._next(cache, state, cls)
+
+		return cache.keys[next_state]
+
+
+class _Scan(object):
+	"""
+	Scanner of a prefilter over one string, which keeps track of how far it skips
+	ahead. If the candidates it finds are too close together to be worth stopping
+	the automaton for, it stops being active.
+	"""
+
+	__slots__ = ("_scan", "_candidates", "_skipped", "active")
+
+	def __init__(self, scan):
+		self._scan = scan
+		self._candidates = 0
+		self._skipped = 0
+		self.active = True
+
+	def __call__(self, pos):
+		found = self._scan(pos)
+
+		if found < 0:
+			return found
+
+		self._candidates += 1
+		self._skipped += found - pos
+
+		if self._candidates >= MIN_CANDIDATES and self._skipped < MIN_SKIP * self._candidates:
+			self.active = False
+
+		return found
+
+
+class Searcher(lazy.LazyAutomaton):
+	"""
+	Finds the left-most longest match of an anchored DFA in a single left-to-right
+	pass over a string, rather than restarting the anchored DFA at every index.
+	This is a lazily determinised DFA which runs the anchored DFA from every index
+	at once (a new "thread" is injected at each index), where each state is an
+	ordered tuple of the anchored states of the live threads (earliest start
+	first). Threads which land on the same anchored state as an earlier thread are
+	dropped, since the earlier thread will match anything they can. Once a thread
+	accepts no new threads are injected and all later threads are dropped, so the
+	search stops as soon as the left-most match cannot be extended any further.
+
+	Each transition also records which threads it kept, so that the start index of
+	every thread (and thus of the match) can be tracked while searching. If an
+	automaton which accepts the reverse language is given, the searcher instead
+	only looks for the end of the match and then runs the reversed automaton
+	backwards from there to find the left-most start of the match, which keeps
+	the bookkeeping out of the left-to-right pass.
+
+	If a prefilter is given, the searcher uses it to jump straight to the next
+	index where a match could start whenever it has no live threads, rather than
+	running the automaton over every token in between.
+	"""
+
+	def __init__(self, view, reverse=None, prefilter=None, max_states=lazy.DEFAULT_MAX_STATES):
+		self._view = view
+		self._reverse = reverse
+		self._prefilter = prefilter
+
+		# (matched, threads)
+		super().__init__(view.classes, (False, ()), max_states)
+
+	def _transition(self, key, cls):
+		matched, threads = key
+		view = self._view
+
+		# Inject a new thread at this index.
+		if not matched:
+			threads += (view.start,)
+
+		seen = set()
+		kept = []
+		next_threads = []
+
+		for index, thread in enumerate(threads):
+			thread = view.step(thread, cls)
+
+			# Dead threads and duplicates of earlier threads are dropped.
+			if thread == view.dead or thread in seen:
+				continue
+
+			seen.add(thread)
+			kept.append(index)
+			next_threads.append(thread)
+
+			# Left-most accepting thread -- drop all later threads.
+			if view.accepting(thread):
+				matched = True
+				break
+
+		# The transition keeps every existing thread (as is).
+		kept = tuple(kept)
+		if kept == tuple(range(len(key[1]))):
+			kept = None
+
+		return (matched, tuple(next_threads)), kept
+
+	def _accepting(self, key):
+		# The accepting thread (if any) is always the last thread.
+		_, threads = key
+		return bool(threads) and self._view.accepting(threads[-1])
+
+	def _stopping(self, key):
+		# The match cannot be extended any further.
+		return key == (True, ())
+
+	def _scanner(self, string):
+		if self._prefilter is None:
+			return None
+
+		scan = self._prefilter.scanner(string)
+
+		if scan is None:
+			return None
+
+		return _Scan(scan)
+
+	def search(self, string, pos=0):
+		"""
+		Returns the (start, end) indices of the left-most longest match in the given
+		string starting at or after index pos, or None if there is no such match.
+		"""
+
+		return self._find(string, pos, self._scanner(string))
+
+	def finditer(self, string, pos=0):
+		"""
+		Yields the (start, end) indices of every non-overlapping left-most longest
+		match in the given string, starting at index pos.
+		"""
+
+		# Translate the string once, rather than once per match.
+		tokens = memoryview(self._classes.translate(string))
+		scan = self._scanner(string)
+
+		while pos < len(string):
+			found = self._find(string, pos, scan, tokens)
+
+			if found is None:
+				break
+
+			yield found
+			_, pos = found
+
+	def _find(self, string, pos, scan, tokens=None):
+		classes = self._classes
+		window = None
+
+		# The prefilter was turned off by an earlier search of the string.
+		if scan is not None and not scan.active:
+			scan = None
+
+		# Without a scanner, there's no point stopping when there are no live threads.
+		idle = scan is not None
+
+		# The search stops early (without a match) whenever it runs out of live
+		# threads, in which case it resumes from the next candidate index.
+		while pos < len(string):
+			if scan is not None:
+				pos = scan(pos)
+
+				if pos < 0:
+					return None
+
+				# The prefilter isn't skipping enough to pay for itself.
+				if not scan.active:
+					scan = None
+					idle = False
+
+			if tokens is not None:
+				blocks = [tokens[pos:]]
+			else:
+				# Resuming inside the last translated block shouldn't translate it again.
+				if window is None or not window[0] <= pos < window[0] + len(window[1]):
+					window = pos, memoryview(classes.translate(string[pos:pos + fsa.BLOCK_SIZE]))
+
+				start, block = window
+				blocks = itertools.chain([block[pos - start:]], classes.blocks(string, start + len(block)))
+
+			if self._reverse is None:
+				found, index = self._search(string, pos, blocks, idle, [])
+			else:
+				found, index = self._search(string, pos, blocks, idle, None)
+
+				# Nothing can match further left than the left-most match, so the
+				# longest reversed match ending at end must start where it does.
+				if found is not None:
+					_, end = found
+					found = self._reverse.accepts_reversed(string, end, pos), end
+
+			self._consumed += index - pos
+
+			if found is not None or index >= len(string):
+				return found
+
+			pos = index
+
+		return None
+
+	def _search(self, string, pos, blocks, idle, starts):
+		"""
+		Runs the cached automaton over the given blocks of classes (starting at index
+		pos), returning the (start, end) of the longest left-most match found (or
+		None) and the index it stopped at. The start indices of the threads are only
+		tracked if starts is a list (otherwise the start of the match is None).
+		"""
+
+		classes = self._classes
+		nclasses = classes.nclasses
+
+		cache = self._cache
+		table = cache.table
+		data = cache.data
+		flags = cache.flags
+
+		state = 0
+		found = None
+		index = pos
+
+		for block in blocks:
+			for cls in block:
+				transition = state * nclasses + cls
+				next_state = table[transition]
+				kept = data[transition]
+
+				if next_state == lazy.UNKNOWN_STATE:
+					old_cache = cache
+					cache, next_state, kept = self._next(cache, state, cls)
+
+					# The cache was flushed, so refresh our view of it.
+					if cache is not old_cache:
+						table = cache.table
+						data = cache.data
+						flags = cache.flags
+
+						# Determinising isn't paying off, so stop caching.
+						if self._thrashing(index - pos):
+							key = cache.keys[next_state]
+							return self._search_uncached(string, index, key, kept, starts, found), len(string)
+
+				# Update the start indices of the threads.
+				if kept is not None and starts is not None:
+					starts.append(index)
+					starts = [starts[thread] for thread in kept]
+
+				index += 1
+				flag = flags[next_state]
+
+				if flag:
+					# The last thread just accepted.
+					if flag & lazy.FLAG_ACCEPT:
+						found = (starts[-1] if starts is not None else None, index)
+
+					# The match cannot be extended any further.
+					if flag & lazy.FLAG_STOP:
+						return found, index
+
+				# No match has started yet (the searcher is back in its start state),
+				# so the prefilter can skip ahead.
+				elif idle and not next_state:
+					return found, index
+
+				state = next_state
+
+		return found, index
+
+	def _search_uncached(self, string, index, key, kept, starts, found):
+		"""
+		Continues a search which has just transitioned into the state with the given
+		key (across the token at the given index, keeping the given threads),
+		computing every transition from then on without caching it.
+		"""
+
+		while True:
+			# Only track the start indices if there are any.
+			if kept is not None and starts is not None:
+				starts.append(index)
+				starts = [starts[thread] for thread in kept]
+
+			index += 1
+
+			if self._accepting(key):
+				found = (starts[-1] if starts is not None else None, index)
+
+			if self._stopping(key) or index >= len(string):
+				return found
+
+			cls = self._classes.token_class(string[index])
+			key, kept = self._transition(key, cls)
+
+
+def _determinise(reverse, classes=None):
+	# Reverse NFA graphs are only determinised (lazily) once they are searched with,
+	# over the same classes as the automaton where they can share them.
+	if isinstance(reverse, nfa.NFANode):
+		return lazy.LazyDFA(reverse, classes=classes)
+
+	return reverse
+
+def searcher(graph, reverse=None, prefilter=None):
+	"""
+	Returns an object which can search for matches of the given automaton in a
+	single pass (a Searcher, unless the automaton searches for itself). The
+	reverse automaton (if given) must accept the reverse of the language accepted
+	by the given automaton, and the prefilter (if given) must find every index
+	where a match could start.
+	"""
+
+	# Aho-Corasick automata can already search for themselves.
+	if isinstance(graph, ahocorasick.AhoCorasick):
+		return graph
+
+	if isinstance(graph, dfa.DFATable):
+		return Searcher(_TableView(graph), reverse=_determinise(reverse, graph._classes), prefilter=prefilter)
+
+	if isinstance(graph, lazy.LazyDFA):
+		return Searcher(_LazyView(graph), reverse=_determinise(reverse, graph._classes), prefilter=prefilter)
+
+	# The classes of bit-parallel automata don't come from the graph.
+	if isinstance(graph, bitparallel.BitParallel):
+		return Searcher(_BitView(graph), reverse=_determinise(reverse), prefilter=prefilter)
+
+	if isinstance(graph, nfa.NFANode):
+		graph = program.Program(graph)
+
+	if isinstance(graph, program.Program):
+		return Searcher(_NFAView(graph), reverse=_determinise(reverse, graph.classes), prefilter=prefilter)
+
+	raise TypeError("Cannot search with %r." % (graph,))
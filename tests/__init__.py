@@ -21,6 +21,16 @@ from .test import greedy
 from .test import all as _all
 from .test import sub
 from .test import iter as _iter
+from .test import cache
+from .test import engines
+from .test import prefilter
+from .test import regexset
+from .test import stream
+from .test import binary
+from .test import unicode as _unicode
+from .test import syntax
+from .test import simplify
+from .test import search
 
 def run_test():
 	simple.test()
@@ -29,3 +39,13 @@ def run_test():
 	_all.test()
 	sub.test()
 	_iter.test()
+	cache.test()
+	engines.test()
+	prefilter.test()
+	regexset.test()
+	stream.test()
+	binary.test()
+	_unicode.test()
+	syntax.test()
+	simplify.test()
+	search.test()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# redone: A correct regex implementation in Python
+# Copyright (C) 2014 Aleksa Sarai
+
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import os
+import tempfile
+
+import redone
+
+from . import engines
+
+# Byte patterns cover every byte value, not just printable text.
+TESTS = [
+	{
+		"pattern": b"\x00\xff(ab|\x80)*c",
+		"cases": {
+			"search": {
+				b"xx\x00\xffabab\x80cyy": b"\x00\xffabab\x80c",
+				b"\x00\xfe\x00\xffc": b"\x00\xffc",
+				b"\x00\xffab": None,
+			},
+		},
+	},
+	{
+		"pattern": b"GET [^ ]+ ",
+		"cases": {
+			"search": {
+				b"\x16\x03GET /\xe2\x82\xac HTTP/1.1": b"GET /\xe2\x82\xac ",
+				b"GET  ": None,
+			},
+		},
+	},
+	{
+		"pattern": b"\x01.\x02",
+		"cases": {
+			"fullmatch": {
+				b"\x01\xff\x02": b"\x01\xff\x02",
+				b"\x01\n\x02": b"\x01\n\x02",
+				b"\x01\x02": None,
+			},
+		},
+	},
+]
+
+def _encode(suite):
+	# Encodes a suite of text patterns and strings as latin-1 bytes.
+	cases = {}
+
+	for method, tests in suite["cases"].items():
+		cases[method] = {test.encode("latin-1"): expected and expected.encode("latin-1") for test, expected in tests.items()}
+
+	return {"pattern": suite["pattern"].encode("latin-1"), "cases": cases}
+
+# Text suites have to hold for their byte patterns as well.
+SUITES = TESTS + [_encode(suite) for suite in engines.SUITES]
+
+STRINGS = [("bytes", bytes), ("bytearray", bytearray), ("memoryview", memoryview)]
+
+def _test_suites(name, engine):
+	for suite in SUITES:
+		pattern = suite["pattern"]
+		r = redone.compile(pattern, engine=engine)
+
+		for method, cases in suite["cases"].items():
+			for test, expected in cases.items():
+				for kind, convert in STRINGS:
+					result = getattr(r, method)(convert(test))
+
+					if result:
+						result = bytes(result.group())
+
+					if result != expected:
+						print("[-] Failed %s '%s' against '%s' [%s, %s]" % (method, test, pattern, name, kind))
+						print("[-]   Expected: '%s'" % (expected,))
+						print("[-]        Got: '%s'" % (result,))
+
+def _test_types():
+	for pattern, string in [(b"abc", "abc"), ("abc", b"abc"), ("abc", memoryview(b"abc"))]:
+		try:
+			redone.search(pattern, string)
+		except TypeError:
+			continue
+
+		print("[-] Failed to reject '%s' against '%s'" % (string, pattern))
+
+	# Only bytes-like objects are byte patterns.
+	for pattern in [3, [97, 98]]:
+		try:
+			redone.compile(pattern)
+		except TypeError:
+			continue
+
+		print("[-] Failed to reject %r as a pattern" % (pattern,))
+
+def _test_sub():
+	result = redone.sub(b"a+", b"-", memoryview(b"baab\xffa"))
+	expected = b"b-b\xff-"
+
+	if result != expected:
+		print("[-] Failed substituting bytes")
+		print("[-]   Expected: '%s'" % (expected,))
+		print("[-]        Got: '%s'" % (result,))
+
+def _test_file():
+	data = b"\x00\xffab\n\x80\x00\xff\xffab\nc\x00\xff"
+	expected = [(1, 0, 4), (2, 6, 11), (3, 13, 15)]
+
+	with tempfile.NamedTemporaryFile(delete=False) as file:
+		file.write(data)
+
+	try:
+		result = list(redone.compile(b"\x00\xff+(ab)?").scan_file(file.name, chunk_size=3))
+	finally:
+		os.unlink(file.name)
+
+	if result != expected:
+		print("[-] Failed scanning binary file")
+		print("[-]   Expected: '%s'" % (expected,))
+		print("[-]        Got: '%s'" % (result,))
+
+def test():
+	for engine in engines.ENGINES:
+		print("[*] test: binary [%s]" % (engine,))
+		_test_suites(engine, engine)
+
+	print("[*] test: binary types")
+	_test_types()
+
+	print("[*] test: binary sub")
+	_test_sub()
+
+	print("[*] test: binary file")
+	_test_file()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# redone: A correct regex implementation in Python
+# Copyright (C) 2014 Aleksa Sarai
+
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import redone
+
+PATTERNS = [r"a?b+c*", r"x|y|z", r"(ab){2,3}", r"[^abc]+"]
+
+def _check(name, result, expected):
+	if result != expected:
+		print("[-] Failed cache check '%s'" % (name,))
+		print("[-]   Expected: '%s'" % (expected,))
+		print("[-]        Got: '%s'" % (result,))
+
+def _test_cache_hits():
+	redone.purge()
+
+	for pattern in PATTERNS:
+		redone.search(pattern, "xxabbcc")
+		redone.search(pattern, "xxabbcc")
+
+	info = redone.cache_info()
+	_check("hits", info.hits, len(PATTERNS))
+	_check("misses", info.misses, len(PATTERNS))
+	_check("currsize", info.currsize, len(PATTERNS))
+
+	# compile shares the cache with the on-the-fly functions (keyed by the pattern
+	# and its engine), so it hands back the same matcher for the same pattern.
+	_check("compile", redone.compile(PATTERNS[0]) is redone.compile(PATTERNS[0]), True)
+
+	redone.purge()
+	_check("purge", redone.cache_info(), (0, 0, info.maxsize, 0))
+
+def _test_cache_bound():
+	maxsize = redone.cache_info().maxsize
+
+	try:
+		redone.set_cache_size(2)
+
+		for pattern in PATTERNS:
+			redone.match(pattern, "abc")
+
+		_check("bounded currsize", redone.cache_info().currsize, 2)
+
+		# The most recently used pattern must have survived.
+		hits = redone.cache_info().hits
+		redone.match(PATTERNS[-1], "abc")
+		_check("lru hit", redone.cache_info().hits, hits + 1)
+
+		# Disabled cache still has to match correctly.
+		redone.set_cache_size(0)
+		_check("disabled match", redone.match(PATTERNS[0], "abbc").group(), "abbc")
+		_check("disabled currsize", redone.cache_info().currsize, 0)
+	finally:
+		redone.set_cache_size(maxsize)
+		redone.purge()
+
+def test():
+	print("[*] test: cache [hits]")
+	_test_cache_hits()
+
+	print("[*] test: cache [bounded]")
+	_test_cache_bound()
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+# redone: A correct regex implementation in Python
+# Copyright (C) 2014 Aleksa Sarai
+
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import redone
+
+from . import simple
+from . import sets
+from . import greedy
+from . import iter as _iter
+
+# Re-use the cases from the other suites, they have to hold for every engine.
+SUITES = [{"pattern": mod.PATTERN, "cases": mod.CASES} for mod in (simple, sets, _iter)] + greedy.TESTS
+
+ENGINES = [redone.ENGINE_AUTO, redone.ENGINE_NFA, redone.ENGINE_DFA, redone.ENGINE_LAZY, redone.ENGINE_BITPARALLEL]
+
+def _tiny_lazy(pattern):
+	# Small enough that the state cache is constantly flushed (and thrashes).
+	graph = redone.lazy.LazyDFA(redone.parser._parse(pattern), max_states=4)
+	return redone.regex.RegexMatcher(graph)
+
+# Number of states (including the sink) in the minimal DFA for each pattern.
+MINIMAL = {
+	r"(a|b)*abb": 5,
+	r"a?(b|bc|[de]*)*f+": 5,
+	r"(abc|def){3}": 17,
+	r"x*|x+": 2,
+	r"(a|b)*a(a|b){9}": 1025,
+}
+
+def _test_minimise():
+	for pattern, expected in MINIMAL.items():
+		graph = redone.conv.minimise(redone.conv.nfa2dfa(redone.parser._parse(pattern)))
+		result = len(redone.conv._dfa_states(graph))
+
+		if result != expected:
+			print("[-] Failed minimising '%s'" % (pattern,))
+			print("[-]   Expected: '%s' states" % (expected,))
+			print("[-]        Got: '%s' states" % (result,))
+
+	# Determinising stops as soon as there are too many states.
+	try:
+		redone.conv.nfa2dfa(redone.parser._parse(r"(a|b)*a(a|b){9}"), max_states=1000)
+		print("[-] Failed limiting the states of the DFA for '(a|b)*a(a|b){9}'")
+	except redone.dfa.DFAStateLimitException:
+		pass
+
+# Number of token classes (including class 0, the tokens no edge uses) of each
+# pattern.
+CLASSES = {
+	r"[a-c]x": 3,
+	r"(a|b)*abb": 3,
+	r".": 2,
+	r"a[^a]": 3,
+	r"[a-z]+[0-9]": 3,
+	r"hello": 5,
+}
+
+def _test_classes():
+	for pattern, expected in CLASSES.items():
+		classes = redone.nfa._classes(redone.parser._parse(pattern))
+
+		if classes.nclasses != expected:
+			print("[-] Failed partitioning the tokens of '%s'" % (pattern,))
+			print("[-]   Expected: '%s' classes" % (expected,))
+			print("[-]        Got: '%s' classes" % (classes.nclasses,))
+
+		# Each class has a representative, and strings translate token by token.
+		for cls in range(1, classes.nclasses):
+			if classes.token_class(classes.representatives[cls]) != cls:
+				print("[-] Failed picking a representative of class %d of '%s'" % (cls, pattern))
+
+		string = "abcxz09h\u00e9"
+		if list(classes.translate(string)) != [classes.token_class(token) for token in string]:
+			print("[-] Failed translating '%s' into the classes of '%s'" % (string, pattern))
+
+	# Tokens which no pattern tells apart share a class.
+	classes = redone.nfa._classes(redone.parser._parse(r"[a-y]z"))
+	if len({classes.token_class(token) for token in "abcdy"}) != 1 or classes.token_class("z") == classes.token_class("a"):
+		print("[-] Failed merging the tokens of '[a-y]' into one class")
+
+def _test_table():
+	for suite in SUITES:
+		pattern = suite["pattern"]
+		graph = redone.parser._parse(pattern)
+		table = redone.conv.nfa2table(graph)
+		nclasses = table._classes.nclasses
+
+		# One row of nclasses transitions per state, with the sink as state 0.
+		if len(table._table) != len(table._accept) * nclasses:
+			print("[-] Failed flattening the DFA of '%s' into one row per state" % (pattern,))
+
+		if any(table._table[:nclasses]) or table._accept[0]:
+			print("[-] Failed keeping state 0 of the DFA of '%s' as the sink" % (pattern,))
+
+		for cases in suite["cases"].values():
+			for test in cases:
+				for pos in range(len(test)):
+					if table.accepts(test, pos) != graph.accepts(test, pos):
+						print("[-] Failed accepting '%s' from %d against the DFA table of '%s'" % (test, pos, pattern))
+
+	# Matching with the DFA engine only keeps the tables, not the graphs.
+	r = redone.compile("(a|b)*c", engine=redone.ENGINE_DFA)
+	if not isinstance(r._graph, redone.dfa.DFATable) or not isinstance(r._reverse, redone.dfa.DFATable):
+		print("[-] Failed compiling '(a|b)*c' into DFA tables")
+
+def _epsilon_edges(graph):
+	return sum(redone.nfa.EPSILON_EDGE in node._edges for node in graph._get_nodes())
+
+def _test_epsilon_free():
+	for suite in SUITES:
+		pattern = suite["pattern"]
+		graph = redone.parser._parse(pattern)
+		thompson = redone.nfa._build(redone.simplify.simplify(redone.parse(pattern)), redone.fsa.Ranges(redone.constants.ALPHABET))
+
+		if _epsilon_edges(graph):
+			print("[-] Failed eliminating the epsilon edges of '%s'" % (pattern,))
+
+		for cases in suite["cases"].values():
+			for test in cases:
+				for pos in range(len(test)):
+					if graph.accepts(test, pos) != thompson.accepts(test, pos):
+						print("[-] Failed accepting '%s' from %d against epsilon-free '%s'" % (test, pos, pattern))
+
+	# Eliminating the epsilon edges of a repeated union of n literals gives n^2
+	# edges, so a large enough one is kept as it is.
+	words = [chr(0x100 + index) + chr(0x200 + index) for index in range(64)]
+	graph = redone.parser._parse(redone.syntax.Repeat(redone.syntax.Union(*[redone.syntax.Literal(word) for word in words]), 1))
+
+	if not _epsilon_edges(graph) or graph.accepts(words[0] + words[-1]) != 4:
+		print("[-] Failed keeping the epsilon edges of a union of %d literals" % (len(words),))
+
+def _test_program():
+	for suite in SUITES:
+		pattern = suite["pattern"]
+		graph = redone.parser._parse(pattern)
+		reverse = redone.nfa._reverse(graph)
+
+		program = redone.program.Program(graph)
+		reverse_program = redone.program.Program(reverse)
+
+		for cases in suite["cases"].values():
+			for test in cases:
+				for pos in range(len(test)):
+					if program.accepts(test, pos) != graph.accepts(test, pos):
+						print("[-] Failed accepting '%s' from %d against the program of '%s'" % (test, pos, pattern))
+
+					# Consuming test[pos:] from right to left is consuming its reverse.
+					end = reverse.accepts(test[pos:][::-1])
+					if end >= 0:
+						end = len(test) - end
+
+					if reverse_program.accepts_reversed(test, len(test), pos) != end:
+						print("[-] Failed accepting '%s' from %d in reverse against the program of '%s'" % (test, pos, pattern))
+
+	# Matching with the NFA engine only keeps the program, not the graph.
+	r = redone.compile("(a|b)*c", engine=redone.ENGINE_NFA)
+	if not isinstance(r._graph, redone.program.Program):
+		print("[-] Failed compiling '(a|b)*c' into an NFA program")
+
+	# Anything which isn't one of the engines' automata can't be searched with.
+	try:
+		redone.unanchored.searcher(redone.fsa.FSA())
+		print("[-] Failed rejecting a searcher for an unknown automaton")
+	except TypeError:
+		pass
+
+# Patterns with the number of positions of their bit-parallel automata (counted
+# repetitions get one copy of their item per repetition, and (a|b) is simplified
+# to the single position [ab]).
+POSITIONS = {
+	r"abc": 3,
+	r"(a|b)*abb": 4,
+	r"x{2,4}y": 5,
+	r"(ab){3,}": 6,
+}
+
+def _test_bitparallel():
+	for pattern, expected in POSITIONS.items():
+		graph = redone.bitparallel.BitParallel(redone.parser._tree(pattern))
+		result = graph._accept.bit_length() - 1
+
+		if result != expected:
+			print("[-] Failed numbering the positions of '%s'" % (pattern,))
+			print("[-]   Expected: '%s' positions" % (expected,))
+			print("[-]        Got: '%s' positions" % (result,))
+
+	# Literals only ever shift their positions along.
+	if redone.bitparallel.BitParallel(redone.parse("abc"))._tables:
+		print("[-] Failed simulating 'abc' with shifts alone")
+
+	for suite in SUITES:
+		pattern = suite["pattern"]
+		graph = redone.parser._parse(pattern)
+		bits = redone.bitparallel.BitParallel(redone.parser._tree(pattern))
+
+		for cases in suite["cases"].values():
+			for test in cases:
+				for pos in range(len(test)):
+					if bits.accepts(test, pos) != graph.accepts(test, pos):
+						print("[-] Failed accepting '%s' from %d against the bit-parallel automaton of '%s'" % (test, pos, pattern))
+
+# Patterns with the engine picked for them by ENGINE_AUTO.
+AUTO = {
+	r"hello": redone.ENGINE_LITERAL,
+	r"abc|abd": redone.ENGINE_LITERAL,
+	r"(a|b)*abb": redone.ENGINE_DFA,
+	r"(a|b)*a(a|b){12}": redone.ENGINE_BITPARALLEL,
+	r"x{300}y*": redone.ENGINE_LAZY,
+	r"x{9000}y*": redone.ENGINE_NFA,
+	r"[0-9]{4}": redone.ENGINE_DFA,
+	r"(a|b){14}": redone.ENGINE_DFA,
+}
+
+def _test_auto():
+	for pattern, expected in AUTO.items():
+		r = redone.compile(pattern)
+
+		if r.engine != expected:
+			print("[-] Failed picking the engine for '%s'" % (pattern,))
+			print("[-]   Expected: '%s'" % (expected,))
+			print("[-]        Got: '%s'" % (r.engine,))
+
+	# An engine given by hand always wins, even for unions of literals.
+	for engine in ENGINES[1:]:
+		if redone.compile("hello|world", engine=engine).engine != engine:
+			print("[-] Failed using the %s engine for 'hello|world'" % (engine,))
+
+	if redone.compile("x{9000}y*").fullmatch("x" * 9000 + "yy") is None:
+		print("[-] Failed full matching against 'x{9000}y*' [auto]")
+
+	# Single literals are found with the string's own methods, except in memory
+	# views (which don't have them).
+	r = redone.compile(b"wor")
+	for string in [b"hello world", bytearray(b"hello world"), memoryview(b"hello world")]:
+		if [match.group() for match in r.finditer(string)] != [b"wor"]:
+			print("[-] Failed finding 'wor' in %r [literal]" % (string,))
+
+		if r.match(string[6:]) is None or r.match(string) is not None:
+			print("[-] Failed matching 'wor' against %r [literal]" % (string,))
+
+def _run_suites(name, compile):
+	for suite in SUITES:
+		pattern = suite["pattern"]
+		r = compile(pattern)
+
+		for method, cases in suite["cases"].items():
+			for test, expected in cases.items():
+				result = getattr(r, method)(test)
+
+				if result:
+					result = result.group()
+
+				if result != expected:
+					print("[-] Failed %s '%s' against '%s' [%s]" % (method, test, pattern, name))
+					print("[-]   Expected: '%s'" % (expected,))
+					print("[-]        Got: '%s'" % (result,))
+
+def test():
+	for engine in ENGINES:
+		print("[*] test: engines [%s]" % (engine,))
+		_run_suites(engine, lambda pattern: redone.compile(pattern, engine=engine))
+
+	print("[*] test: engines [minimal dfa]")
+	_test_minimise()
+
+	print("[*] test: engines [token classes]")
+	_test_classes()
+
+	print("[*] test: engines [dfa table]")
+	_test_table()
+
+	print("[*] test: engines [epsilon-free nfa]")
+	_test_epsilon_free()
+
+	print("[*] test: engines [nfa program]")
+	_test_program()
+
+	print("[*] test: engines [bit-parallel positions]")
+	_test_bitparallel()
+
+	print("[*] test: engines [auto selection]")
+	_test_auto()
+
+	print("[*] test: engines [lazy, flushing]")
+	_run_suites("lazy, flushing", _tiny_lazy)
@@ -163,9 +163,58 @@ def _test_iter_otf():
 			print("[-]   Expected: '%s'" % (expected,))
 			print("[-]        Got: '%s'" % (result,))
 
+# Edge cases of counted repetition, as (pattern, string, expected fullmatch).
+EDGES = [
+	("a{0,}b", "aaab", "aaab"),
+	("a{0,}b", "b", "b"),
+	("x{0}y", "y", "y"),
+	("x{0}y", "xy", None),
+	("(ab){0,2}c", "ababc", "ababc"),
+	("(ab){0,2}c", "abababc", None),
+	("(a|bc){2}", "bca", "bca"),
+	("(a*){2,3}", "aaaa", "aaaa"),
+]
+
+def _test_iter_edges():
+	for pattern, test, expected in EDGES:
+		result = redone.fullmatch(pattern, test)
+
+		if result:
+			result = result.group()
+
+		if result != expected:
+			print("[-] Failed fullmatching '%s' against '%s'" % (test, pattern))
+			print("[-]   Expected: '%s'" % (expected,))
+			print("[-]        Got: '%s'" % (result,))
+
+def _test_iter_large():
+	# Large counts are built from copies of the repeated graph, rather than by
+	# re-parsing a pattern repeating it that many times.
+	pattern = "(abc|def){1000}"
+	r = redone.compile(pattern, engine=redone.ENGINE_LAZY)
+
+	for test, expected in [("abc" * 1000, True), ("abcdef" * 500, True), ("abc" * 999, False), ("abc" * 1001, False)]:
+		if (r.fullmatch(test) is not None) != expected:
+			print("[-] Failed fullmatching %d tokens against '%s'" % (len(test), pattern))
+			print("[-]   Expected: %r" % (expected,))
+
+	pattern = "x[a-z]{5,500}x"
+	r = redone.compile(pattern, engine=redone.ENGINE_LAZY)
+	test = "x" + "q" * 600 + "x" + "abcde" * 10 + "x"
+
+	result = r.search(test)
+	if result is None or result.group() != test[601:]:
+		print("[-] Failed searching '%s' against '%s'" % (test, pattern))
+
 def test():
 	print("[*] test: iters [compiled]")
 	_test_iter_compile()
 
 	print("[*] test: iters [on-the-fly]")
 	_test_iter_otf()
+
+	print("[*] test: iters [edge cases]")
+	_test_iter_edges()
+
+	print("[*] test: iters [large counts]")
+	_test_iter_large()
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+# redone: A correct regex implementation in Python
+# Copyright (C) 2014 Aleksa Sarai
+
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import redone
+
+# The literal prefix and first tokens of each pattern.
+PREFIXES = {
+	r"ERROR: .*": ("ERROR: ", {"E"}),
+	r"GET /(api|v2)": ("GET /", {"G"}),
+	r"ab|ac": ("a", {"a"}),
+	r"(ab)+c": ("ab", {"a"}),
+	r"a*b": ("", {"a", "b"}),
+	r"x?yz": ("", {"x", "y"}),
+	r"ab?c": ("a", {"a"}),
+}
+
+# The literals which every match of each pattern must contain.
+REQUIRED = {
+	r"[abc]+@example\.com": ("@example.com",),
+	r"x(ab)*yz": ("yz", "x"),
+	r"(hello|yellow)": ("ello",),
+	r"foo(bar)+baz": ("barbaz", "foob"),
+	r".*ERROR.*": ("ERROR",),
+	r"a*": ("a",),
+	r"(a|b)c*": (),
+}
+
+# The words of each pattern which is a union of literals (None for any other).
+WORDS = {
+	r"foo|bar|foobar": {"foo", "bar", "foobar"},
+	r"((GET)|PUT|(HEAD|POST))": {"GET", "PUT", "HEAD", "POST"},
+	r"hello": {"hello"},
+	r"(GET|PUT) /": None,
+	r"ab?c?": None,
+	r"[0-9]{4}": None,
+	r"foo|bar?": None,
+}
+
+# Searches which have to skip over plenty of candidates.
+TESTS = [
+	{
+		"pattern": r"ERROR: [abc]+!",
+		"cases": {
+			"search": {
+				"ERROR: ERROR: ab ERROR: abc!": "ERROR: abc!",
+				"ERROR: ERROR ERROR": None,
+				"xxERROR: a!": "ERROR: a!",
+			},
+			"findall": {
+				"ERROR: a! ERROR: ERROR: b!": ["ERROR: a!", "ERROR: b!"],
+			},
+		},
+	},
+	{
+		"pattern": r"(x|y)zz",
+		"cases": {
+			"search": {
+				"xzyzxzzz": "xzz",
+				"xyxyxy": None,
+			},
+			"findall": {
+				"yzz xz xzzyzz": ["yzz", "xzz", "yzz"],
+			},
+		},
+	},
+	{
+		"pattern": r"she|he|hers|his",
+		"cases": {
+			"match": {
+				"hershey": "hers",
+				"ushers": None,
+			},
+			"fullmatch": {
+				"his": "his",
+				"hi": None,
+			},
+			"search": {
+				"ushers": "she",
+				"ahishers": "his",
+				"hxs": None,
+			},
+			"findall": {
+				"ushers his shehe": ["she", "his", "she", "he"],
+			},
+		},
+	},
+	{
+		"pattern": r"(abc|bcd|cde|def|efg)+x",
+		"cases": {
+			"search": {
+				"abcdefgx": "bcdefgx",
+				"abcdefx": "abcdefx",
+				"bcdabcx": "bcdabcx",
+			},
+			"findall": {
+				"abx cdex deabcx": ["cdex", "abcx"],
+			},
+		},
+	},
+	{
+		"pattern": r"[abc]+@example\.com",
+		"cases": {
+			"match": {
+				"abc@example.com": "abc@example.com",
+				"abc@example.org": None,
+			},
+			"fullmatch": {
+				"c@example.com": "c@example.com",
+				"c@example.co": None,
+			},
+			"search": {
+				"to: cab@example.com": "cab@example.com",
+				"to: cab@example.net": None,
+			},
+			"findall": {
+				"a@example.com, b@example.com": ["a@example.com", "b@example.com"],
+				"a@example.co, b@example.co": [],
+			},
+		},
+	},
+]
+
+ENGINES = [redone.ENGINE_NFA, redone.ENGINE_DFA, redone.ENGINE_LAZY, redone.ENGINE_BITPARALLEL]
+
+def _test_extract():
+	for pattern, (prefix, tokens) in PREFIXES.items():
+		graph = redone.parser._parse(pattern)
+		result = (redone.prefilter.literal_prefix(graph), redone.prefilter.first_tokens(graph))
+
+		if result != (prefix, tokens):
+			print("[-] Failed extracting prefilter of '%s'" % (pattern,))
+			print("[-]   Expected: '%s'" % ((prefix, tokens),))
+			print("[-]        Got: '%s'" % (result,))
+
+# The literals scanned for by the prefilter of each pattern (None if there is no
+# prefilter). Sets of literal prefixes are only used if there are a few of them.
+PREFILTERS = {
+	r"(alpha|beta|gamma|delta)[0-9]+": ["alph", "beta", "delt", "gamm"],
+	r"[st][0-9]+": ["s", "t"],
+	r"(ab|cd)*e": ["ab", "cd", "e"],
+	r"([0-9]{1,3}\.){3}[0-9]{1,3}": None,
+	r"(abc|bcd|cde|def|efg)+x": None,
+}
+
+def _test_prefilter():
+	for pattern, expected in PREFILTERS.items():
+		result = redone.prefilter.prefilter(redone.parser._parse(pattern))
+
+		if result is not None:
+			result = sorted(result._tokens)
+
+		if result != expected:
+			print("[-] Failed picking the prefilter of '%s'" % (pattern,))
+			print("[-]   Expected: '%s'" % (expected,))
+			print("[-]        Got: '%s'" % (result,))
+
+def _test_required():
+	for pattern, expected in REQUIRED.items():
+		result = redone.prefilter.required_literals(redone.parser._parse(pattern))
+
+		if result != expected:
+			print("[-] Failed extracting required literals of '%s'" % (pattern,))
+			print("[-]   Expected: '%s'" % (expected,))
+			print("[-]        Got: '%s'" % (result,))
+
+def _test_words():
+	for pattern, expected in WORDS.items():
+		result = redone.prefilter.union_words(redone.parse(pattern))
+
+		if result != expected:
+			print("[-] Failed reading the literal union of '%s'" % (pattern,))
+			print("[-]   Expected: '%s'" % (expected,))
+			print("[-]        Got: '%s'" % (result,))
+
+def _test_search(engine):
+	for suite in TESTS:
+		pattern = suite["pattern"]
+		r = redone.compile(pattern, engine=engine)
+
+		for method, cases in suite["cases"].items():
+			for test, expected in cases.items():
+				result = getattr(r, method)(test)
+
+				if isinstance(result, list):
+					result = [match.group() for match in result]
+				elif result:
+					result = result.group()
+
+				if result != expected:
+					print("[-] Failed %s '%s' against '%s' [%s]" % (method, test, pattern, engine))
+					print("[-]   Expected: '%s'" % (expected,))
+					print("[-]        Got: '%s'" % (result,))
+
+def _test_disabled():
+	# Candidates on every other token don't skip anything, so the prefilter is
+	# turned off (without changing what is found).
+	string = "e " * 100 + "e12 e e3"
+
+	for engine in ENGINES:
+		searcher = redone.compile("e[0-9]+", engine=engine)._searcher()
+		scan = searcher._scanner(string)
+
+		result = [string[start:end] for start, end in searcher.finditer(string)]
+		if result != ["e12", "e3"]:
+			print("[-] Failed finding 'e[0-9]+' with a prefilter turned off [%s]" % (engine,))
+			print("[-]   Expected: '%s'" % (["e12", "e3"],))
+			print("[-]        Got: '%s'" % (result,))
+
+		if searcher._find(string, 0, scan) != (200, 203) or scan.active:
+			print("[-] Failed turning off a prefilter which doesn't skip [%s]" % (engine,))
+
+	# Rare candidates keep the prefilter on.
+	string = "x" * 1000 + "e1" + "x" * 1000 + "e2"
+	scan = redone.compile("e[0-9]+")._searcher()._scanner(string)
+
+	if redone.compile("e[0-9]+")._searcher()._find(string, 0, scan) != (1000, 1002) or not scan.active:
+		print("[-] Failed keeping a prefilter which skips on")
+
+def test():
+	print("[*] test: prefilter [extract]")
+	_test_extract()
+
+	print("[*] test: prefilter [literal prefixes]")
+	_test_prefilter()
+
+	print("[*] test: prefilter [required]")
+	_test_required()
+
+	print("[*] test: prefilter [literal unions]")
+	_test_words()
+
+	for engine in ENGINES:
+		print("[*] test: prefilter [%s]" % (engine,))
+		_test_search(engine)
+
+	print("[*] test: prefilter [turned off]")
+	_test_disabled()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# redone: A correct regex implementation in Python
+# Copyright (C) 2014 Aleksa Sarai
+
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import redone
+
+PATTERNS = [r"ERROR: [abc]+", r"a*b", r"x{2,}", r"(ab|cd)+e", r"c?"]
+
+CASES = {
+	"": set(),
+	"c": {4},
+	"xb": {1},
+	"ERROR: abc": {0, 1, 4},
+	"xx": {2},
+	"xxx abab de": {1, 2},
+	"ERROR: ERROR: cab xx cdabe": {0, 1, 2, 3, 4},
+	"nothing": set(),
+}
+
+def _test_matches(name, regex_set):
+	for test, expected in CASES.items():
+		result = regex_set.matches(test)
+
+		if result != expected:
+			print("[-] Failed regex set matches '%s' [%s]" % (test, name))
+			print("[-]   Expected: '%s'" % (expected,))
+			print("[-]        Got: '%s'" % (result,))
+
+		# Has to agree with searching for each pattern.
+		searched = {index for index, pattern in enumerate(PATTERNS) if redone.search(pattern, test)}
+
+		if result != searched:
+			print("[-] Failed regex set matches '%s' against searches [%s]" % (test, name))
+			print("[-]   Expected: '%s'" % (searched,))
+			print("[-]        Got: '%s'" % (result,))
+
+def _test_types():
+	# Byte patterns match bytes-like strings.
+	regex_set = redone.RegexSet([pattern.encode("ascii") for pattern in PATTERNS])
+
+	for test, expected in CASES.items():
+		for string in [test.encode("ascii"), memoryview(test.encode("ascii"))]:
+			result = regex_set.matches(string)
+
+			if result != expected:
+				print("[-] Failed regex set matches %r [bytes]" % (string,))
+				print("[-]   Expected: '%s'" % (expected,))
+				print("[-]        Got: '%s'" % (result,))
+
+	# Text and byte patterns can't be mixed, in the set or with the string.
+	for patterns, string in [(["abc", b"abc"], "abc"), (["abc"], b"abc"), ([b"abc"], "abc")]:
+		try:
+			redone.RegexSet(patterns).matches(string)
+			print("[-] Failed rejecting %r in a regex set of %r" % (string, patterns))
+		except TypeError:
+			pass
+
+def test():
+	print("[*] test: regexset [lazy]")
+	_test_matches("lazy", redone.RegexSet(PATTERNS))
+
+	print("[*] test: regexset [lazy, flushing]")
+	_test_matches("lazy, flushing", redone.RegexSet(PATTERNS, max_states=4))
+
+	print("[*] test: regexset [types]")
+	_test_types()
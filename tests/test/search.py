@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# redone: A correct regex implementation in Python
+# Copyright (C) 2014 Aleksa Sarai
+
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import redone
+
+from .engines import ENGINES
+
+# (pattern, string, pos) with the span found by search and the spans found by
+# finditer, starting from index pos.
+SEARCHES = [
+	# Empty matches are never found.
+	(r"a*", "bbb", 0, None, []),
+	(r"a*", "baab", 0, (1, 3), [(1, 3)]),
+	(r"x?", "", 0, None, []),
+
+	# Starting part of the way into (or past the end of) the string.
+	(r"ab", "abab", 1, (2, 4), [(2, 4)]),
+	(r"ab", "abab", 4, None, []),
+	(r"ab", "abab", 9, None, []),
+	(r"abc|bcd", "abcd", 1, (1, 4), [(1, 4)]),
+
+	# Overlapping candidates give the left-most longest match, and matches don't
+	# overlap each other.
+	(r"ab|aab|aaab", "xaaab", 0, (1, 5), [(1, 5)]),
+	(r"abc|bcd", "abcd", 0, (0, 3), [(0, 3)]),
+	(r"ab|b", "aab", 0, (1, 3), [(1, 3)]),
+	(r"a+b", "aaaab", 0, (0, 5), [(0, 5)]),
+	(r"aaa", "aaaaaaa", 0, (0, 3), [(0, 3), (3, 6)]),
+	(r"aba", "ababa", 0, (0, 3), [(0, 3)]),
+	(r"(a|ab)(c|bcd)", "xabcd", 0, (1, 5), [(1, 5)]),
+
+	# Long runs without a match.
+	(r"(a|b)*abb", "ab" * 500 + "b", 0, (0, 1001), [(0, 1001)]),
+	(r"x[0-9]", "x" * 1000, 0, None, []),
+]
+
+def _test_searches(name, searcher):
+	for pattern, string, pos, expected, spans in SEARCHES:
+		search = searcher(pattern)
+		result = search.search(string, pos)
+
+		if result != expected:
+			print("[-] Failed searching '%s' from %d against '%s' [%s]" % (string[:20], pos, pattern, name))
+			print("[-]   Expected: '%s'" % (expected,))
+			print("[-]        Got: '%s'" % (result,))
+
+		result = list(search.finditer(string, pos))
+
+		if result != spans:
+			print("[-] Failed finding '%s' from %d against '%s' [%s]" % (string[:20], pos, pattern, name))
+			print("[-]   Expected: '%s'" % (spans,))
+			print("[-]        Got: '%s'" % (result,))
+
+def _tracking(engine):
+	# Without a reverse automaton, the searcher tracks where each thread started.
+	def searcher(pattern):
+		r = redone.compile(pattern, engine=engine)
+		return redone.unanchored.searcher(r._graph, prefilter=r._prefilter)
+
+	return searcher
+
+def _reversing(kind):
+	# Finds the start of each match by running the reverse automaton backwards
+	# from its end.
+	def searcher(pattern):
+		graph = redone.parser._parse(pattern)
+		reverse = redone.nfa._reverse(graph)
+
+		if kind == "table":
+			reverse = redone.conv.nfa2table(reverse)
+		elif kind == "lazy":
+			reverse = redone.lazy.LazyDFA(reverse)
+
+		return redone.unanchored.searcher(redone.program.Program(graph), reverse=reverse)
+
+	return searcher
+
+def _test_reverse():
+	# The reverse graph accepts precisely the reversed strings.
+	for pattern, string, expected in [(r"abc", "cba", 3), (r"a+b", "baaa", 4), (r"ab|abcd", "dcba", 4), (r"abc", "abc", -1)]:
+		result = redone.nfa._reverse(redone.parser._parse(pattern)).accepts(string)
+
+		if result != expected:
+			print("[-] Failed accepting '%s' against the reverse of '%s'" % (string, pattern))
+			print("[-]   Expected: '%s'" % (expected,))
+			print("[-]        Got: '%s'" % (result,))
+
+	for kind in ["nfa", "table", "lazy"]:
+		_test_searches("reverse " + kind, _reversing(kind))
+
+	# Compiled patterns search with a reverse automaton.
+	for engine in ENGINES[1:]:
+		if redone.compile(r"(a|ab)(c|bcd)", engine=engine)._reverse is None:
+			print("[-] Failed compiling the reverse automaton of '(a|ab)(c|bcd)' [%s]" % (engine,))
+
+def test():
+	for engine in ENGINES:
+		print("[*] test: search [%s]" % (engine,))
+		_test_searches(engine, lambda pattern: redone.compile(pattern, engine=engine)._searcher())
+
+		print("[*] test: search [%s, tracking starts]" % (engine,))
+		_test_searches(engine + ", tracking starts", _tracking(engine))
+
+	print("[*] test: search [reverse automata]")
+	_test_reverse()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# redone: A correct regex implementation in Python
+# Copyright (C) 2014 Aleksa Sarai
+
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import redone
+from redone import syntax
+from redone.simplify import simplify
+
+SIMPLIFIED = {
+	"(x*)*": syntax.Repeat(syntax.Literal("x")),
+	"(x+)+": syntax.Repeat(syntax.Literal("x"), 1),
+	"((a+)*)?": syntax.Repeat(syntax.Literal("a")),
+	"(a{2}){3}": syntax.Repeat(syntax.Literal("a"), 6, 6),
+	"(a+a+)+b": syntax.Concat(syntax.Repeat(syntax.Literal("a"), 2), syntax.Literal("b")),
+	"a*aab": syntax.Concat(syntax.Repeat(syntax.Literal("a"), 2), syntax.Literal("b")),
+	"abc|abd": syntax.Concat(syntax.Literal("ab"), syntax.Set("cd")),
+	"ab|abc": syntax.Concat(syntax.Literal("ab"), syntax.Repeat(syntax.Literal("c"), 0, 1)),
+	"xa|ya|za": syntax.Concat(syntax.Set("xyz"), syntax.Literal("a")),
+	"a|b|[cd]|a": syntax.Set([("a", "d")]),
+	"a|[^ab]": syntax.Set("b", negated=True),
+	"(a|b)(a|b)*": syntax.Repeat(syntax.Set("ab"), 1),
+}
+
+# Trees which are already as simple as they get ((x{2})* can't be fused, since it
+# doesn't match "xxx").
+UNCHANGED = ["(x{2})*", "(x{3,4}){0,2}", "(ab)*c", "ab|cd"]
+
+# Patterns which are simplified, with (string, expected search) cases.
+SEARCHES = {
+	"(a|ab)(c|bcd)(d*)": {"abcd": "abcd", "abcdd": "abcdd", "xabcbcdx": "abc"},
+	"(x{2})*y|xy": {"xy": "xy", "xxxy": "xxy", "xxxxy": "xxxxy"},
+	"(foo|foobar|bar)+": {"foobarfoo": "foobarfoo", "barfoobarba": "barfoobar", "fo": None},
+	"([^a]|a|b)c": {"ac": "ac", "\nc": "\nc", "c": None},
+}
+
+def _test_simplify():
+	for pattern, expected in SIMPLIFIED.items():
+		result = simplify(redone.parse(pattern))
+
+		if result != expected:
+			print("[-] Failed simplifying '%s'" % (pattern,))
+			print("[-]   Expected: %r" % (expected,))
+			print("[-]        Got: %r" % (result,))
+
+	for pattern in UNCHANGED:
+		tree = redone.parse(pattern)
+		result = simplify(tree)
+
+		if result != tree:
+			print("[-] Failed leaving '%s' unchanged" % (pattern,))
+			print("[-]        Got: %r" % (result,))
+
+def _test_search():
+	for pattern, cases in SEARCHES.items():
+		for engine in [redone.ENGINE_NFA, redone.ENGINE_DFA, redone.ENGINE_LAZY]:
+			r = redone.compile(pattern, engine=engine)
+
+			for test, expected in cases.items():
+				result = r.search(test)
+
+				if result:
+					result = result.group()
+
+				if result != expected:
+					print("[-] Failed searching '%s' against simplified '%s' [%s]" % (test, pattern, engine))
+					print("[-]   Expected: '%s'" % (expected,))
+					print("[-]        Got: '%s'" % (result,))
+
+def _test_empty_set():
+	# Sets which match no tokens can still be repeated (and never match).
+	tree = syntax.Concat(syntax.Literal("a"), syntax.Repeat(syntax.Union(syntax.Set(), syntax.Literal("b")), 1, 3), syntax.Set())
+
+	if redone.search(tree, "abbb") is not None:
+		print("[-] Failed searching a syntax tree ending with an empty set")
+
+def test():
+	print("[*] test: simplify [simplify]")
+	_test_simplify()
+
+	print("[*] test: simplify [search]")
+	_test_search()
+
+	print("[*] test: simplify [empty set]")
+	_test_empty_set()
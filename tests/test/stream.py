@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# redone: A correct regex implementation in Python
+# Copyright (C) 2014 Aleksa Sarai
+
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import os
+import tempfile
+
+import redone
+
+TESTS = {
+	r"ERROR: [abc]+!": ["ERROR: abc! ERROR: ERROR: cab!", "xx ERROR: a!ERROR: b!", "ERROR: !"],
+	r"(ab|cd)+e": ["ababe cdcdabe abcde", "abab", "e ab e cde"],
+	r"a*b": ["aaab b aab", "aaaa", "bbb"],
+	r"(a|b)*a(a|b)": ["abababbaba", "ba", "aaaaa"],
+	r"disk (full|error)": ["disk full, disk error, disk ful", "diskdisk full", ""],
+	r"c?": ["cxcc", "xx", ""],
+}
+
+SIZES = [1, 2, 3, 7, 100]
+
+def _chunks(string, size):
+	return [string[index:index + size] for index in range(0, len(string), size)]
+
+def _test_stream(name, engine):
+	for pattern, tests in TESTS.items():
+		regex = redone.compile(pattern, engine=engine)
+
+		for test in tests:
+			expected = [(match._start, match._end) for match in regex.finditer(test)]
+
+			for size in SIZES:
+				stream = regex.stream()
+				result = []
+
+				for chunk in _chunks(test, size):
+					result.extend(stream.feed(chunk))
+
+				result.extend(stream.finish())
+
+				if result != expected:
+					print("[-] Failed stream '%s' on '%s' in chunks of %d [%s]" % (pattern, test, size, name))
+					print("[-]   Expected: '%s'" % (expected,))
+					print("[-]        Got: '%s'" % (result,))
+
+def _test_file(name, engine):
+	for pattern, tests in TESTS.items():
+		regex = redone.compile(pattern, engine=engine)
+
+		for test in tests:
+			# Spread the matches over several lines.
+			test = test.replace(" ", "\n")
+			expected = [(test.count("\n", 0, match._start) + 1, match._start, match._end) for match in regex.finditer(test)]
+
+			with tempfile.NamedTemporaryFile("w", delete=False) as file:
+				file.write(test)
+
+			try:
+				for size in SIZES:
+					result = list(regex.scan_file(file.name, chunk_size=size))
+
+					if result != expected:
+						print("[-] Failed scanning file '%s' on '%s' in chunks of %d [%s]" % (pattern, test, size, name))
+						print("[-]   Expected: '%s'" % (expected,))
+						print("[-]        Got: '%s'" % (result,))
+			finally:
+				os.unlink(file.name)
+
+def test():
+	for name, engine in [("nfa", redone.ENGINE_NFA), ("dfa", redone.ENGINE_DFA), ("lazy", redone.ENGINE_LAZY)]:
+		print("[*] test: stream [%s]" % (name,))
+		_test_stream(name, engine)
+
+		print("[*] test: stream files [%s]" % (name,))
+		_test_file(name, engine)
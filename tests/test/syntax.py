@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# redone: A correct regex implementation in Python
+# Copyright (C) 2014 Aleksa Sarai
+
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import redone
+from redone import syntax
+
+TREES = {
+	"": syntax.Empty(),
+	"abc": syntax.Literal("abc"),
+	"a(bc)d": syntax.Literal("abcd"),
+	"ab|c": syntax.Union(syntax.Literal("ab"), syntax.Literal("c")),
+	"a*b+c?": syntax.Concat(syntax.Repeat(syntax.Literal("a")), syntax.Repeat(syntax.Literal("b"), 1), syntax.Repeat(syntax.Literal("c"), 0, 1)),
+	"x{2}y{3,}z{4,5}": syntax.Concat(syntax.Repeat(syntax.Literal("x"), 2, 2), syntax.Repeat(syntax.Literal("y"), 3), syntax.Repeat(syntax.Literal("z"), 4, 5)),
+	"[a-cx].[^y]": syntax.Concat(syntax.Set([("a", "c"), "x"]), syntax.Set(negated=True), syntax.Set("y", negated=True)),
+	r"\(\*": syntax.Literal("(*"),
+}
+
+INVALID = ["()", "|a", "a|", "a\\", "a{", "a{,3}", "a{3,2}", "*a", "a**", "[]", "[a", "a{2}*", "(a", "a)"]
+
+# Trees built directly, with (string, expected search) cases.
+BUILT = [
+	(syntax.Concat(syntax.Union(syntax.Literal("GET"), syntax.Literal("POST")), syntax.Literal(" /"), syntax.Repeat(syntax.Set(" ", negated=True))), {
+		"POST /index.html HTTP/1.1": "POST /index.html",
+		"> GET / HTTP/1.1": "GET /",
+		"PUT /": None,
+	}),
+	(syntax.Repeat(syntax.Literal("a.b"), 2, 3), {
+		"a.ba.ba.ba.b": "a.ba.ba.b",
+		"a.bacb": None,
+	}),
+	(syntax.Concat(syntax.Literal("x"), syntax.Empty(), syntax.Repeat(syntax.Set([("0", "9")]), 1)), {
+		"ax123y": "x123",
+		"x": None,
+	}),
+]
+
+def _test_parse():
+	for pattern, expected in TREES.items():
+		result = redone.parse(pattern)
+
+		if result != expected or hash(result) != hash(expected):
+			print("[-] Failed parsing '%s'" % (pattern,))
+			print("[-]   Expected: %r" % (expected,))
+			print("[-]        Got: %r" % (result,))
+
+	# Nodes of different types with the same fields are different trees.
+	if syntax.Concat(syntax.Literal("a"), syntax.Literal("b")) == syntax.Union(syntax.Literal("a"), syntax.Literal("b")):
+		print("[-] Failed comparing a concatenation with a union")
+
+def _test_invalid():
+	for pattern in INVALID:
+		try:
+			redone.parse(pattern)
+		except redone.parser.RegexParseException:
+			continue
+
+		print("[-] Failed rejecting '%s'" % (pattern,))
+
+	for build in [lambda: syntax.Literal(""), lambda: syntax.Repeat(syntax.Literal("a"), 2, 1), lambda: syntax.Set([("b", "a")]), lambda: syntax.Union()]:
+		try:
+			build()
+		except ValueError:
+			continue
+
+		print("[-] Failed rejecting an invalid syntax tree")
+
+def _test_built():
+	for tree, cases in BUILT:
+		for engine in [redone.ENGINE_NFA, redone.ENGINE_DFA, redone.ENGINE_LAZY]:
+			r = redone.compile(tree, engine=engine)
+
+			for test, expected in cases.items():
+				result = r.search(test)
+
+				if result:
+					result = result.group()
+
+				if result != expected:
+					print("[-] Failed searching '%s' against %r [%s]" % (test, tree, engine))
+					print("[-]   Expected: '%s'" % (expected,))
+					print("[-]        Got: '%s'" % (result,))
+
+	# Trees can be used anywhere a pattern can.
+	tree, cases = BUILT[0]
+	regex_set = redone.RegexSet([tree, "HTTP"])
+
+	for test, expected in cases.items():
+		result = regex_set.matches(test)
+		expected = {index for index, found in enumerate([expected, "HTTP" in test]) if found}
+
+		if result != expected:
+			print("[-] Failed regex set matches '%s' with a syntax tree" % (test,))
+			print("[-]   Expected: '%s'" % (expected,))
+			print("[-]        Got: '%s'" % (result,))
+
+def _test_large():
+	# Long generated patterns are built in linear time.
+	pattern = "(a|bc)x*" * 2000
+	test = "abcxx" * 1000
+
+	result = redone.fullmatch(pattern, test)
+	if result is None or result.group() != test:
+		print("[-] Failed fullmatching a generated pattern of %d tokens" % (len(pattern),))
+
+	tree = syntax.Concat(*[syntax.Union(syntax.Literal("a"), syntax.Repeat(syntax.Set("bc"), 2, 3))] * 2000)
+	if redone.compile(tree, engine=redone.ENGINE_LAZY).fullmatch("abcb" * 1000) is None:
+		print("[-] Failed fullmatching a generated syntax tree of %d nodes" % (len(tree.items),))
+
+def _test_huge():
+	# Huge and deeply nested patterns are parsed without recursing.
+	words = ["w%05d" % index for index in range(20000)]
+	tree = redone.parse("|".join(words))
+
+	if tree != syntax.Union(*[syntax.Literal(word) for word in words]):
+		print("[-] Failed parsing a union of %d literals" % (len(words),))
+
+	depth = 5000
+	tree = redone.parse("(a|" * depth + "b" + ")*" * depth)
+
+	for _ in range(depth):
+		if not isinstance(tree, syntax.Repeat) or not isinstance(tree.item, syntax.Union):
+			break
+
+		tree = tree.item.items[1]
+
+	if tree != syntax.Literal("b"):
+		print("[-] Failed parsing a pattern nested %d groups deep" % (depth,))
+
+	pattern = "(" * depth + "x(y)" + ")" * depth
+	if redone.search(pattern, "wxyz") is None:
+		print("[-] Failed searching a pattern nested %d groups deep" % (depth,))
+
+def test():
+	print("[*] test: syntax [parse]")
+	_test_parse()
+
+	print("[*] test: syntax [invalid]")
+	_test_invalid()
+
+	print("[*] test: syntax [built]")
+	_test_built()
+
+	print("[*] test: syntax [large]")
+	_test_large()
+
+	print("[*] test: syntax [huge]")
+	_test_huge()
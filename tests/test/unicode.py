@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# redone: A correct regex implementation in Python
+# Copyright (C) 2014 Aleksa Sarai
+
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import redone
+
+from . import engines
+
+# Sets with ranges, and wildcards and negated sets over all of Unicode.
+TESTS = [
+	{
+		"pattern": r"[a-z0-9_]+@[a-z]+",
+		"cases": {
+			"search": {
+				"mail: jo_42@example!": "jo_42@example",
+				"JO@EXAMPLE": None,
+			},
+		},
+	},
+	{
+		"pattern": r"[-a]+|[b-]+",
+		"cases": {
+			"findall": {
+				"a-a b-b": ["a-a", "b-b"],
+			},
+		},
+	},
+	{
+		"pattern": "名前: [^\n]+",
+		"cases": {
+			"search": {
+				"id: 1\n名前: 山田 太郎 😀\n": "名前: 山田 太郎 😀",
+				"名前: \n": None,
+			},
+		},
+	},
+	{
+		"pattern": r".é.",
+		"cases": {
+			"fullmatch": {
+				"😀é\n": "😀é\n",
+				"\x00é\U0010ffff": "\x00é\U0010ffff",
+				"éé": None,
+			},
+		},
+	},
+	{
+		"pattern": r"[α-ω]+[^α-ω]",
+		"cases": {
+			"findall": {
+				"λόγος αβγ!δ": ["λό", "γος ", "αβγ!"],
+			},
+		},
+	},
+]
+
+INVALID = [r"[z-a]", r"[a-\]"]
+
+# Wildcards need one edge (and one class), not one per token.
+CLASSES = {
+	r".": 2,
+	r"(.)*x.{20}": 3,
+	"[^\n]*ERROR": 5,
+}
+
+def _test_suites(name, engine):
+	for suite in TESTS:
+		pattern = suite["pattern"]
+		r = redone.compile(pattern, engine=engine)
+
+		for method, cases in suite["cases"].items():
+			for test, expected in cases.items():
+				result = getattr(r, method)(test)
+
+				if isinstance(result, list):
+					result = [match.group() for match in result]
+				elif result:
+					result = result.group()
+
+				if result != expected:
+					print("[-] Failed %s '%s' against '%s' [%s]" % (method, test, pattern, name))
+					print("[-]   Expected: '%s'" % (expected,))
+					print("[-]        Got: '%s'" % (result,))
+
+def _test_invalid():
+	for pattern in INVALID:
+		try:
+			redone.compile(pattern)
+		except redone.parser.RegexParseException:
+			continue
+
+		print("[-] Failed to reject invalid set '%s'" % (pattern,))
+
+def _test_classes():
+	for pattern, expected in CLASSES.items():
+		result = redone.nfa._classes(redone.parser._parse(pattern)).nclasses
+
+		if result != expected:
+			print("[-] Failed partitioning '%s' into classes" % (pattern,))
+			print("[-]   Expected: '%s'" % (expected,))
+			print("[-]        Got: '%s'" % (result,))
+
+def test():
+	for engine in engines.ENGINES:
+		print("[*] test: unicode [%s]" % (engine,))
+		_test_suites(engine, engine)
+
+	print("[*] test: unicode [invalid sets]")
+	_test_invalid()
+
+	print("[*] test: unicode [classes]")
+	_test_classes()